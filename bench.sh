@@ -0,0 +1 @@
+python3 -m benchmarks.stages --output bench_output.json "$@"
@@ -0,0 +1,12 @@
+"""
+Benchmarks for the site generator. Run them from the repository root, e.g.
+	python3 -m benchmarks.stages --pages 500
+	python3 benchmarks/node_memory.py
+"""
+import os
+import sys
+
+# The generator's modules live in src/ and import each other by bare name
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+if SRC_DIR not in sys.path:
+	sys.path.insert(0, SRC_DIR)
@@ -0,0 +1,136 @@
+"""
+Reproducible synthetic sites for benchmarking. The same seed and settings always
+produce byte-for-byte the same site.
+"""
+import os
+import random
+
+# Relative weights of each kind of block in a generated page
+DEFAULT_MIX = {
+	"paragraph": 6,
+	"heading": 2,
+	"unordered_list": 1,
+	"ordered_list": 1,
+	"code": 1,
+	"quote": 1,
+}
+
+WORDS = (
+	"lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+	"incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+	"exercitation ullamco laboris nisi aliquip ex ea commodo consequat"
+).split()
+
+TEMPLATE = """<!doctype html>
+<html>
+	<head>
+		<meta charset="utf-8" />
+		<title>{{ Title }}</title>
+		<link href="/index.css" rel="stylesheet" />
+	</head>
+
+	<body>
+		<article>{{ Content }}</article>
+	</body>
+</html>"""
+
+PAGES_PER_SECTION = 50
+
+
+class CorpusSettings:
+	"""
+	Docstring for CorpusSettings constructor
+	parameters:
+	pages: how many markdown pages to generate
+	blocks: how many blocks each page has, after its title
+	mix: relative weights of each block type (see DEFAULT_MIX)
+	link_rate: chance that a sentence of a paragraph or list item contains a link
+	image_rate: chance that a paragraph contains an image
+	images: how many image files to put under static/images
+	image_bytes: the size of each image file
+	seed: seed for the random number generator
+	"""
+	def __init__(self, pages=100, blocks=40, mix=None, link_rate=0.2, image_rate=0.1, images=10, image_bytes=50000, seed=0):
+		self.pages = pages
+		self.blocks = blocks
+		self.mix = mix if mix is not None else dict(DEFAULT_MIX)
+		self.link_rate = link_rate
+		self.image_rate = image_rate
+		self.images = images
+		self.image_bytes = image_bytes
+		self.seed = seed
+
+	def to_dict(self):
+		return dict(vars(self))
+
+
+def sentence(rng, settings, length=12):
+	words = [rng.choice(WORDS) for _ in range(length)]
+	# Inline markup never overlaps, so every sentence is valid for the parser
+	index = rng.randrange(0, length - 3, 3)
+	style = rng.randrange(4)
+	if style == 1:
+		words[index] = f"**{words[index]}**"
+	elif style == 2:
+		words[index + 1] = f"_{words[index + 1]}_"
+	elif style == 3:
+		words[index + 2] = f"`{words[index + 2]}`"
+	if rng.random() < settings.link_rate:
+		words[-1] = f"[{words[-1]}](/section-0/page-{rng.randrange(settings.pages)})"
+	return " ".join(words)
+
+def block(rng, settings, kind):
+	match kind:
+		case "paragraph":
+			lines = [sentence(rng, settings) for _ in range(rng.randint(2, 5))]
+			if settings.images and rng.random() < settings.image_rate:
+				lines.append(f"![{rng.choice(WORDS)}](/images/image-{rng.randrange(settings.images)}.png)")
+			return "\n".join(lines)
+		case "heading":
+			return f"{'#' * rng.randint(2, 4)} {sentence(rng, settings, 5)}"
+		case "unordered_list":
+			return "\n".join(f"- {sentence(rng, settings, 6)}" for _ in range(rng.randint(2, 6)))
+		case "ordered_list":
+			return "\n".join(f"{i}. {sentence(rng, settings, 6)}" for i in range(1, rng.randint(3, 7)))
+		case "code":
+			lines = [f"value_{i} = compute({i})" for i in range(rng.randint(2, 8))]
+			return "```\n" + "\n".join(lines) + "\n```"
+		case "quote":
+			return "\n".join(f"> {sentence(rng, settings, 8)}" for _ in range(rng.randint(1, 4)))
+		case _:
+			raise ValueError(f"Unknown block kind: {kind}")
+
+def page_markdown(rng, settings, number):
+	kinds = list(settings.mix)
+	weights = [settings.mix[kind] for kind in kinds]
+	blocks = [f"# Page {number}: {sentence(rng, settings, 4)}"]
+	for kind in rng.choices(kinds, weights, k=settings.blocks):
+		blocks.append(block(rng, settings, kind))
+	return "\n\n".join(blocks) + "\n"
+
+"""
+Writes a synthetic site under root: root/content, root/static and root/template.html.
+Returns the list of markdown files that were written.
+"""
+def generate_site(root, settings):
+	rng = random.Random(settings.seed)
+	paths = []
+	for number in range(settings.pages):
+		section = number // PAGES_PER_SECTION
+		directory = os.path.join(root, "content", f"section-{section}", f"page-{number}")
+		os.makedirs(directory, exist_ok=True)
+		path = os.path.join(directory, "index.md")
+		with open(path, "w") as file:
+			file.write(page_markdown(rng, settings, number))
+		paths.append(path)
+
+	images_dir = os.path.join(root, "static", "images")
+	os.makedirs(images_dir, exist_ok=True)
+	for number in range(settings.images):
+		with open(os.path.join(images_dir, f"image-{number}.png"), "wb") as file:
+			file.write(rng.randbytes(settings.image_bytes))
+	with open(os.path.join(root, "static", "index.css"), "w") as file:
+		file.write("body { font-family: sans-serif; }\n" * 50)
+	with open(os.path.join(root, "template.html"), "w") as file:
+		file.write(TEMPLATE)
+	return paths
@@ -0,0 +1,93 @@
+"""
+Measures how many bytes each node costs, comparing the slotted node classes with
+equivalent classes that keep their attributes in a per-instance __dict__ (the layout
+the node classes had before they gained __slots__).
+
+usage: python3 benchmarks/node_memory.py [paragraphs]
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from leafnode import LeafNode
+from parentnode import ParentNode
+from text_converter import markdown_to_html_node
+from textnode import TextNode, TextType, convert_line_to_textnodes
+
+
+class DictTextNode:
+	def __init__(self, text, text_type, url=None):
+		self.text = text
+		self.text_type = text_type
+		self.url = url
+
+
+class DictLeafNode:
+	def __init__(self, tag, value, props=None):
+		self.tag = tag
+		self.value = value
+		self.children = None
+		self.props = props
+
+
+class DictParentNode:
+	def __init__(self, tag, children, props=None):
+		self.tag = tag
+		self.value = None
+		self.children = children
+		self.props = props
+
+
+PARAGRAPH = "Some **bold** words, some _italic_ words, a `code` span and a [link](/somewhere) to follow."
+
+def synthetic_document(paragraphs):
+	return "\n\n".join(f"{PARAGRAPH} Paragraph {i}." for i in range(paragraphs))
+
+def measure(build):
+	"""Returns (result, bytes allocated by build() and still alive afterwards)"""
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	result = build()
+	after = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	return result, after - before
+
+def bytes_per_node(make, count):
+	# The node contents are created up front so only the nodes themselves are measured
+	text = "shared text"
+	_, used = measure(lambda: [make(text) for _ in range(count)])
+	return used / count
+
+def main():
+	paragraphs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+	count = 100000
+
+	print(f"Bytes per node ({count} nodes each):")
+	print(f"{'class':<12}{'__dict__':>12}{'__slots__':>12}")
+	rows = [
+		("TextNode", lambda t: DictTextNode(t, TextType.BOLD), lambda t: TextNode(t, TextType.BOLD)),
+		("LeafNode", lambda t: DictLeafNode("b", t), lambda t: LeafNode("b", t)),
+		("ParentNode", lambda t: DictParentNode("p", None), lambda t: ParentNode("p", None)),
+	]
+	for name, before, after in rows:
+		print(f"{name:<12}{bytes_per_node(before, count):>12.1f}{bytes_per_node(after, count):>12.1f}")
+
+	markdown = synthetic_document(paragraphs)
+	text_nodes, used = measure(lambda: [convert_line_to_textnodes(block) for block in markdown.split("\n\n")])
+	total = sum(len(nodes) for nodes in text_nodes)
+	print(f"\nSynthetic document: {paragraphs} paragraphs, {len(markdown)} characters")
+	print(f"TextNodes: {total} nodes, {used} bytes, {used / total:.1f} bytes per node (including text)")
+	del text_nodes
+	tree, used = measure(lambda: markdown_to_html_node(markdown))
+	total = count_nodes(tree)
+	print(f"HTML tree: {total} nodes, {used} bytes, {used / total:.1f} bytes per node (including text)")
+
+def count_nodes(node):
+	if not node.children:
+		return 1
+	return 1 + sum(count_nodes(child) for child in node.children)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,151 @@
+"""
+Times each stage of the build on a synthetic site and writes the results as JSON.
+
+usage: python3 -m benchmarks.stages [--pages N] [--blocks N] [--repeat N] [--output results.json] [--compare old.json]
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import benchmarks  # noqa: F401 (puts src/ on sys.path)
+from benchmarks.corpus import CorpusSettings, generate_site
+
+from filemanager import PIPELINE_DEPTH, copy_static_to_public, generate_page, generate_pages_recursive
+from template import Template
+from text_converter import BlockType, clear_block_cache, identify_block_type, markdown_to_blocks, markdown_to_html_node
+from textnode import convert_line_to_textnodes
+
+RESULTS_VERSION = 1
+
+
+def time_stage(func, repeat):
+	runs = []
+	for _ in range(repeat):
+		# Every run converts every block, rather than reusing the blocks of the run before
+		clear_block_cache()
+		start = time.perf_counter()
+		# The generator logs every file it touches; keep that out of the timings
+		with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+			func()
+		runs.append(time.perf_counter() - start)
+	return runs
+
+def summarize(runs, items):
+	median = statistics.median(runs)
+	return {
+		"runs": runs,
+		"min": min(runs),
+		"median": median,
+		"mean": statistics.fmean(runs),
+		"items": items,
+		"per_item": median / items if items else None,
+	}
+
+def run_benchmarks(root, settings, repeat):
+	paths = generate_site(root, settings)
+	documents = []
+	for path in paths:
+		with open(path) as file:
+			documents.append(file.read())
+	blocks = [block for document in documents for block in markdown_to_blocks(document)]
+	lines = [" ".join(block.split("\n")) for block in blocks if identify_block_type(block) == BlockType.PARAGRAPH]
+	trees = [markdown_to_html_node(document) for document in documents]
+	content_dir = os.path.join(root, "content")
+	template_path = os.path.join(root, "template.html")
+	out_dir = os.path.join(root, "out")
+	pages = [(path, os.path.join(out_dir, f"{i}.html")) for i, path in enumerate(paths)]
+
+	def generate_all_pages():
+		template = Template.load(template_path, "/")
+		for source_path, dest_path in pages:
+			generate_page(source_path, template, dest_path, "/")
+
+	def full_build():
+		copy_static_to_public(clean=True)
+		generate_pages_recursive(content_dir, template_path, "./docs", "/")
+
+	def pipelined_build():
+		copy_static_to_public(clean=True)
+		generate_pages_recursive(content_dir, template_path, "./docs", "/", pipeline_depth=PIPELINE_DEPTH)
+
+	stages = [
+		("markdown_to_blocks", lambda: [markdown_to_blocks(document) for document in documents], len(documents)),
+		("identify_block_type", lambda: [identify_block_type(block) for block in blocks], len(blocks)),
+		("convert_line_to_textnodes", lambda: [convert_line_to_textnodes(line) for line in lines], len(lines)),
+		("markdown_to_html_node", lambda: [markdown_to_html_node(document) for document in documents], len(documents)),
+		("to_html", lambda: [tree.to_html() for tree in trees], len(trees)),
+		("generate_page", generate_all_pages, len(pages)),
+		("copy_static_to_public", lambda: copy_static_to_public(clean=True), settings.images + 1),
+		("copy_static_to_public (sync)", lambda: copy_static_to_public(clean=False), settings.images + 1),
+		("full_build", full_build, len(pages)),
+		("full_build (pipeline)", pipelined_build, len(pages)),
+	]
+
+	results = {}
+	previous_dir = os.getcwd()
+	# copy_static_to_public works relative to the current directory
+	os.chdir(root)
+	try:
+		for name, func, items in stages:
+			results[name] = summarize(time_stage(func, repeat), items)
+	finally:
+		os.chdir(previous_dir)
+	return results
+
+def compare(results, baseline):
+	print(f"{'stage':<32}{'baseline':>12}{'current':>12}{'change':>10}")
+	for name, stage in results["stages"].items():
+		current = stage["median"]
+		old = baseline["stages"].get(name)
+		if old is None:
+			print(f"{name:<32}{'-':>12}{current * 1000:>10.1f}ms{'':>10}")
+			continue
+		change = (current - old["median"]) / old["median"] * 100
+		print(f"{name:<32}{old['median'] * 1000:>10.1f}ms{current * 1000:>10.1f}ms{change:>+9.1f}%")
+
+def parse_args():
+	parser = argparse.ArgumentParser(description="Time each build stage on a synthetic site.")
+	parser.add_argument("--pages", type=int, default=200, help="number of pages to generate")
+	parser.add_argument("--blocks", type=int, default=40, help="blocks per page")
+	parser.add_argument("--images", type=int, default=10, help="number of static images")
+	parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic site")
+	parser.add_argument("--repeat", type=int, default=5, help="timed runs per stage")
+	parser.add_argument("--output", help="write the JSON results here instead of stdout")
+	parser.add_argument("--compare", help="a previous results file to compare against")
+	return parser.parse_args()
+
+def main():
+	args = parse_args()
+	settings = CorpusSettings(pages=args.pages, blocks=args.blocks, images=args.images, seed=args.seed)
+	with tempfile.TemporaryDirectory() as root:
+		stages = run_benchmarks(root, settings, args.repeat)
+	results = {
+		"version": RESULTS_VERSION,
+		"timestamp": time.time(),
+		"python": platform.python_version(),
+		"platform": platform.platform(),
+		"corpus": settings.to_dict(),
+		"repeat": args.repeat,
+		"stages": stages,
+	}
+
+	if args.output:
+		with open(args.output, "w") as file:
+			json.dump(results, file, indent=1)
+	else:
+		json.dump(results, sys.stdout, indent=1)
+		print()
+
+	if args.compare:
+		with open(args.compare) as file:
+			baseline = json.load(file)
+		compare(results, baseline)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import urllib.parse
+
+from manifest import BUILD_VERSION, temp_path_for
+
+
+class BuildCache:
+	"""
+	Docstring for BuildCache constructor
+	parameters:
+	backend: where entries are kept; any object with get(key) and put(key, data) methods
+		(see DirectoryBackend)
+
+	A content-addressed cache of build outputs that can be shared between machines. A rendered
+	page is stored under a key made from everything that determines its html: the hash of its
+	markdown source, the hash of the template, the basepath and the generator and parser
+	versions. Any build with the same inputs, on any machine, can copy the page instead of
+	rendering it.
+
+	The cache never fails a build: an entry that can't be read is a miss, and an entry that
+	can't be stored is skipped, with a warning either way.
+	"""
+	def __init__(self, backend):
+		self.backend = backend
+		self.hits = 0
+		self.misses = 0
+		self.stores = 0
+
+	def page_key(self, source_hash, template_hash, basepath):
+		digest = hashlib.sha256(f"{BUILD_VERSION}\0page\0".encode())
+		digest.update(f"{source_hash}\0{template_hash}\0{basepath}".encode())
+		return digest.hexdigest()
+
+	def fetch(self, key):
+		"""Returns the bytes stored under key, or None on a miss"""
+		try:
+			data = self.backend.get(key)
+		except OSError as e:
+			print(f"Warning: could not read {key} from the build cache: {e}")
+			data = None
+		if data is None:
+			self.misses += 1
+		else:
+			self.hits += 1
+		return data
+
+	def store(self, key, data):
+		try:
+			self.backend.put(key, data)
+		except OSError as e:
+			print(f"Warning: could not store {key} in the build cache: {e}")
+			return
+		self.stores += 1
+
+	def summary(self):
+		return f"Build cache: {self.hits} fetched, {self.misses} missed, {self.stores} stored"
+
+
+class DirectoryBackend:
+	"""
+	Docstring for DirectoryBackend constructor
+	parameters:
+	root: the directory holding the cache. It may be on a shared or network filesystem (NFS,
+		SMB, a mounted volume) so that several machines use the same cache.
+
+	Each entry is a file named by its key. Entries are written to a temporary file in the
+	same directory and renamed into place, which is atomic on local filesystems and on NFS,
+	so a concurrent reader sees either a complete entry or none. Entries are never modified
+	once written; two builds storing the same key write the same bytes.
+	"""
+	def __init__(self, root):
+		self.root = root
+
+	def path_for(self, key):
+		return os.path.join(self.root, key[:2], key)
+
+	def get(self, key):
+		try:
+			with open(self.path_for(key), "rb") as file:
+				return file.read()
+		except FileNotFoundError:
+			return None
+
+	def put(self, key, data):
+		path = self.path_for(key)
+		directory = os.path.dirname(path)
+		os.makedirs(directory, exist_ok=True)
+		tmp_path = temp_path_for(path)
+		try:
+			# "x" rather than mkstemp, whose files only their owner can read: the cache may be
+			# shared with other users' machines
+			with open(tmp_path, "xb") as file:
+				file.write(data)
+			os.replace(tmp_path, path)
+		except BaseException:
+			os.remove(tmp_path)
+			raise
+
+# url scheme -> backend class. A location without a scheme is a directory.
+BACKENDS = {
+	"file": DirectoryBackend,
+}
+
+"""
+Returns a BuildCache for a location given on the command line: a directory path, or a url
+whose scheme names one of BACKENDS (file:///mnt/build-cache)
+"""
+def open_build_cache(location):
+	url = urllib.parse.urlsplit(location)
+	if len(url.scheme) <= 1:
+		# No scheme, or a Windows drive letter
+		return BuildCache(DirectoryBackend(location))
+	if url.scheme not in BACKENDS:
+		raise ValueError(f"unknown build cache backend {url.scheme!r}; expected one of {sorted(BACKENDS)}")
+	return BuildCache(BACKENDS[url.scheme](urllib.parse.unquote(url.path)))
@@ -0,0 +1,166 @@
+"""
+A long-lived build server and its thin client, talking over a Unix socket.
+
+The server (python3 src/main.py --serve) builds the site once and then keeps the build
+manifest, compiled template, parse caches and directory snapshot in memory between builds.
+The client only needs the standard library, so it starts almost instantly:
+
+	python3 src/buildserver.py                      # rebuild whatever changed
+	python3 src/buildserver.py content/blog/x.md    # rebuild specific paths
+	python3 src/buildserver.py --full               # check every page
+	python3 src/buildserver.py --shutdown
+
+Protocol: the client sends one json request line, {"command": "build", "paths": [...],
+"full": false} or {"command": "shutdown"}. Paths are absolute, since the client may run
+in any directory. The server streams back json lines:
+{"type": "log", "line": ...} for every line the build prints, then
+{"type": "done", "ok": ..., "error": ..., "seconds": ...}.
+"""
+import argparse
+import contextlib
+import errno
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+SOCKET_PATH = "./.cache/build.sock"
+
+
+class ProgressStream:
+	"""
+	A write-only text stream that sends every complete line written to it as a log message
+	"""
+	def __init__(self, send):
+		self.send = send
+		self.buffer = ""
+
+	def write(self, text):
+		self.buffer += text
+		*lines, self.buffer = self.buffer.split("\n")
+		for line in lines:
+			self.send({"type": "log", "line": line})
+		return len(text)
+
+	def flush(self):
+		if self.buffer:
+			self.send({"type": "log", "line": self.buffer})
+			self.buffer = ""
+
+
+class BuildRequestHandler(socketserver.StreamRequestHandler):
+	def handle(self):
+		try:
+			request = json.loads(self.rfile.readline())
+		except ValueError:
+			self.send({"type": "done", "ok": False, "error": "malformed request", "seconds": 0})
+			return
+		if request.get("command") == "shutdown":
+			self.send({"type": "done", "ok": True, "error": None, "seconds": 0})
+			# shutdown() waits for serve_forever to return, so it can't run on this thread
+			threading.Thread(target=self.server.shutdown).start()
+			return
+
+		start = time.perf_counter()
+		ok = True
+		error = None
+		progress = ProgressStream(self.send)
+		with contextlib.redirect_stdout(progress):
+			try:
+				self.server.build(request)
+			except Exception as e:
+				ok = False
+				error = f"{type(e).__name__}: {e}"
+		progress.flush()
+		self.send({"type": "done", "ok": ok, "error": error, "seconds": time.perf_counter() - start})
+
+	def send(self, message):
+		try:
+			self.wfile.write((json.dumps(message) + "\n").encode())
+			self.wfile.flush()
+		except (BrokenPipeError, ConnectionResetError):
+			# The client went away; finish the build anyway
+			pass
+
+
+class BuildServer(socketserver.UnixStreamServer):
+	"""
+	Docstring for BuildServer constructor
+	parameters:
+	socket_path: where to listen. A stale socket left by a previous server is replaced, but
+		if another server is still listening on it, OSError (EADDRINUSE) is raised.
+	build: called with each build request dictionary. Anything it prints is streamed to the client.
+
+	Requests are handled one at a time, so builds never overlap.
+	"""
+	def __init__(self, socket_path, build):
+		self.build = build
+		directory = os.path.dirname(socket_path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		if is_listening(socket_path):
+			raise OSError(errno.EADDRINUSE, f"a build server is already listening on {socket_path}")
+		with contextlib.suppress(FileNotFoundError):
+			os.remove(socket_path)
+		super().__init__(socket_path, BuildRequestHandler)
+
+	def server_close(self):
+		super().server_close()
+		with contextlib.suppress(FileNotFoundError):
+			os.remove(self.server_address)
+
+"""
+Returns True if a server accepts connections on socket_path. A socket file nobody is
+listening on (left behind by a server that was killed) refuses them.
+"""
+def is_listening(socket_path):
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+		try:
+			sock.connect(socket_path)
+		except (FileNotFoundError, ConnectionRefusedError):
+			return False
+	return True
+
+"""
+Sends a request to the build server and writes its progress to out.
+Returns True if the build succeeded.
+"""
+def request_build(socket_path, request, out=sys.stdout):
+	with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+		sock.connect(socket_path)
+		sock.sendall((json.dumps(request) + "\n").encode())
+		with sock.makefile("r") as replies:
+			for line in replies:
+				message = json.loads(line)
+				if message["type"] == "log":
+					print(message["line"], file=out)
+				elif message["type"] == "done":
+					if message["error"]:
+						print(message["error"], file=out)
+					return message["ok"]
+	return False
+
+def main():
+	parser = argparse.ArgumentParser(description="Ask a running build server to rebuild the site.")
+	parser.add_argument("paths", nargs="*", help="source files to rebuild (default: whatever changed)")
+	parser.add_argument("--socket", default=SOCKET_PATH, help=f"the server's socket (default {SOCKET_PATH})")
+	parser.add_argument("--full", action="store_true", help="check every page, not just the changed ones")
+	parser.add_argument("--shutdown", action="store_true", help="stop the server")
+	args = parser.parse_args()
+
+	if args.shutdown:
+		request = {"command": "shutdown"}
+	else:
+		request = {"command": "build", "paths": [os.path.abspath(path) for path in args.paths], "full": args.full}
+	try:
+		ok = request_build(args.socket, request)
+	except (FileNotFoundError, ConnectionRefusedError):
+		print(f"No build server is listening on {args.socket}; start one with: python3 src/main.py --serve")
+		sys.exit(2)
+	sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+	main()
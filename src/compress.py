@@ -0,0 +1,100 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from filemanager import AtomicWriter
+from walker import walk_files
+
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".svg")
+# Below this, the gzip header and the extra request handling cost more than they save
+GZIP_MIN_SIZE = 1024
+
+
+class CompressionStats:
+	def __init__(self):
+		self.compressed = 0
+		self.unchanged = 0
+		self.removed = 0
+		self.original_bytes = 0
+		self.compressed_bytes = 0
+
+	def saved(self):
+		return self.original_bytes - self.compressed_bytes
+
+	def summary(self):
+		return f"Compressed files: {self.compressed} compressed, {self.unchanged} unchanged, {self.removed} removed, {self.saved()} bytes saved"
+
+"""
+precompress()
+inputs
+	root: the output directory, e.g. docs
+	min_size: files smaller than this (in bytes) are not compressed
+	threads: the number of files compressed at once. zlib releases the GIL while it
+		compresses, so the threads really do run in parallel.
+outputs
+	a CompressionStats
+	every html, css, js and svg file under root of at least min_size bytes gets a gzip
+	compressed sibling (index.html -> index.html.gz) for servers that can serve precompressed
+	files. A .gz is given its source's mtime, so while the mtimes match the source hasn't
+	changed and it isn't compressed again. A .gz whose source is gone, or no longer needs
+	one, is removed.
+"""
+def precompress(root, min_size=GZIP_MIN_SIZE, threads=None):
+	stats = CompressionStats()
+	sources = []
+	siblings = []
+	for rel_path in walk_files(root):
+		if rel_path.endswith(".gz"):
+			siblings.append(rel_path)
+		elif rel_path.endswith(COMPRESSIBLE_EXTENSIONS):
+			sources.append(rel_path)
+
+	with ThreadPoolExecutor(max_workers=threads) as executor:
+		paths = [os.path.join(root, rel_path) for rel_path in sources]
+		results = list(executor.map(compress_file, paths, [min_size] * len(paths)))
+
+	wanted = set()
+	for rel_path, (status, original_size, compressed_size) in zip(sources, results):
+		if status == "skipped":
+			continue
+		wanted.add(rel_path + ".gz")
+		stats.original_bytes += original_size
+		stats.compressed_bytes += compressed_size
+		if status == "compressed":
+			stats.compressed += 1
+		else:
+			stats.unchanged += 1
+
+	for rel_path in siblings:
+		if rel_path not in wanted and rel_path[:-3].endswith(COMPRESSIBLE_EXTENSIONS):
+			os.remove(os.path.join(root, rel_path))
+			stats.removed += 1
+	return stats
+
+"""
+Writes path.gz unless it is already up to date.
+Returns (status, original size, compressed size), where status is "compressed", "unchanged"
+or "skipped" (too small, or gzip didn't make it any smaller).
+"""
+def compress_file(path, min_size=GZIP_MIN_SIZE):
+	gz_path = path + ".gz"
+	stat = os.stat(path)
+	if stat.st_size < min_size:
+		return "skipped", stat.st_size, 0
+	try:
+		gz_stat = os.stat(gz_path)
+		if gz_stat.st_mtime_ns == stat.st_mtime_ns:
+			return "unchanged", stat.st_size, gz_stat.st_size
+	except FileNotFoundError:
+		pass
+
+	with open(path, "rb") as file:
+		data = file.read()
+	# mtime=0 keeps the output identical from build to build
+	compressed = gzip.compress(data, compresslevel=9, mtime=0)
+	if len(compressed) >= len(data):
+		return "skipped", stat.st_size, 0
+	with AtomicWriter(gz_path, "wb") as file:
+		file.write(compressed)
+	os.utime(gz_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+	return "compressed", stat.st_size, len(compressed)
@@ -0,0 +1,161 @@
+"""
+A development server that renders pages on request instead of building the site first.
+
+	python3 src/devserver.py [port]
+
+Request urls are mapped onto the markdown under content/ (/blog/tom/ is rendered from
+content/blog/tom/index.md) and anything else is served straight from static/. Rendered
+pages are kept in memory and rendered again only when their source or the template changes,
+so startup takes the same time however big the site is, and only pages that are actually
+viewed are ever rendered.
+"""
+import argparse
+import http.server
+import os
+import posixpath
+import threading
+import urllib.parse
+
+from filemanager import SRC_DIR
+from template import Template
+from text_converter import enable_block_cache, parse_document
+
+CONTENT_DIR = "./content"
+TEMPLATE_PATH = "./template.html"
+DEFAULT_PORT = 8888
+
+
+class PageRenderer:
+	"""
+	Docstring for PageRenderer constructor
+	parameters:
+	content_dir: the directory holding the markdown sources
+	template_path: the html template every page is rendered into
+	basepath: the url to the root of the site. The default of "" leaves root-relative urls as they are.
+
+	Renders markdown sources to complete html pages and caches the result in memory. A cached
+	page is reused until the source's modification time or size, or the template, changes.
+	"""
+	def __init__(self, content_dir=CONTENT_DIR, template_path=TEMPLATE_PATH, basepath=""):
+		self.content_dir = content_dir
+		self.template_path = template_path
+		self.basepath = basepath
+		# source path -> ((mtime_ns, size, template hash), html bytes)
+		self.pages = {}
+		self.lock = threading.Lock()
+		self.renders = 0
+
+	def source_for(self, url_path):
+		"""
+		Returns (source path, redirect): the markdown source behind a url path, or a url to
+		redirect to instead (a directory requested without its trailing slash), or (None, None).
+		"""
+		relative = posixpath.normpath(url_path).lstrip("/")
+		if relative == ".":
+			relative = ""
+		if relative.startswith(".."):
+			return None, None
+		if url_path.endswith("/") or relative == "":
+			candidate = os.path.join(self.content_dir, relative, "index.md")
+			return (candidate, None) if os.path.isfile(candidate) else (None, None)
+		base, ext = posixpath.splitext(relative)
+		if ext == ".html":
+			candidate = os.path.join(self.content_dir, base + ".md")
+			return (candidate, None) if os.path.isfile(candidate) else (None, None)
+		if ext == "":
+			candidate = os.path.join(self.content_dir, relative + ".md")
+			if os.path.isfile(candidate):
+				return candidate, None
+			if os.path.isfile(os.path.join(self.content_dir, relative, "index.md")):
+				return None, url_path + "/"
+		return None, None
+
+	def render(self, source_path):
+		"""Returns the rendered page for source_path as utf-8 bytes"""
+		template = Template.load_cached(self.template_path, self.basepath)
+		stat = os.stat(source_path)
+		signature = (stat.st_mtime_ns, stat.st_size, template.hash)
+		cached = self.pages.get(source_path)
+		if cached is not None and cached[0] == signature:
+			return cached[1]
+		with open(source_path, "r") as file:
+			document = parse_document(file)
+		html = template.render(Title=document.title, Content=document.node.to_html()).encode()
+		with self.lock:
+			self.pages[source_path] = (signature, html)
+			self.renders += 1
+		return html
+
+
+class DevRequestHandler(http.server.SimpleHTTPRequestHandler):
+	def __init__(self, request, client_address, server):
+		super().__init__(request, client_address, server, directory=server.static_dir)
+
+	def do_GET(self):
+		self.send_page(head_only=False)
+
+	def do_HEAD(self):
+		self.send_page(head_only=True)
+
+	def send_page(self, head_only):
+		url_path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+		source_path, redirect = self.server.renderer.source_for(url_path)
+		if redirect is not None:
+			self.send_response(301)
+			self.send_header("Location", redirect)
+			self.send_header("Content-Length", "0")
+			self.end_headers()
+			return
+		if source_path is None:
+			# Not a page, so it's a static file (or a 404)
+			if head_only:
+				super().do_HEAD()
+			else:
+				super().do_GET()
+			return
+		try:
+			html = self.server.renderer.render(source_path)
+		except Exception as e:
+			self.send_error(500, f"Could not render {source_path}", f"{type(e).__name__}: {e}")
+			return
+		self.send_response(200)
+		self.send_header("Content-Type", "text/html; charset=utf-8")
+		self.send_header("Content-Length", str(len(html)))
+		self.send_header("Cache-Control", "no-cache")
+		self.end_headers()
+		if not head_only:
+			self.wfile.write(html)
+
+
+class DevServer(http.server.ThreadingHTTPServer):
+	"""
+	Docstring for DevServer constructor
+	parameters:
+	address: the (host, port) to listen on
+	renderer: the PageRenderer used for pages
+	static_dir: the directory static files are served from
+	"""
+	def __init__(self, address, renderer, static_dir=SRC_DIR):
+		self.renderer = renderer
+		self.static_dir = static_dir
+		super().__init__(address, DevRequestHandler)
+
+def main():
+	parser = argparse.ArgumentParser(description="Serve the site, rendering pages as they are requested.")
+	parser.add_argument("port", nargs="?", type=int, default=DEFAULT_PORT, help=f"the port to listen on (default {DEFAULT_PORT})")
+	parser.add_argument("--bind", default="127.0.0.1", help="the address to listen on (default 127.0.0.1)")
+	args = parser.parse_args()
+
+	# Pages are rendered again on every request, mostly with only a few blocks edited
+	enable_block_cache()
+	server = DevServer((args.bind, args.port), PageRenderer())
+	print(f"Serving {CONTENT_DIR} and {SRC_DIR} at http://{args.bind}:{args.port}/")
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+
+if __name__ == "__main__":
+	main()
@@ -1,14 +1,53 @@
+import asyncio
+import contextlib
+import functools
+import hashlib
+import io
 import shutil
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-from text_converter import extract_title, markdown_to_html_node
+from imagesize import add_image_props
+from manifest import hash_bytes, hash_file, temp_path_for
+from template import Template
+from profiler import Profiler
+from text_converter import document_from_blocks, iter_blocks, parse_document
+from walker import RACY_SECONDS, walk_files
 
 SRC_DIR = "./static"
 DST_DIR = "./docs"
+# How many pages may wait between two stages of the pipeline (see generate_pages_pipelined)
+PIPELINE_DEPTH = 16
 
-def copy_static_to_public():
-	clear_public()
-	copy_dir("")
+"""
+copy_static_to_public()
+inputs
+	clean: if True, wipe the whole output directory first (generated pages included)
+	manifest: an optional BuildManifest. It remembers which files the previous build copied,
+		so that outputs whose source has since been deleted can be removed.
+	use_hash: compare file contents, not just size and modification time, when deciding
+		whether a file needs to be copied
+	snapshot: an optional DirectorySnapshot, so unchanged directories aren't listed again
+	names: see sync_dir
+	contents: see sync_dir
+outputs
+	the number of files that were copied
+	Every file under SRC_DIR will exist, unchanged, under DST_DIR. Files that are already
+	up to date are not rewritten, so their modification times stay stable.
+"""
+def copy_static_to_public(clean=False, manifest=None, use_hash=False, snapshot=None, names=None, contents=None):
+	if clean:
+		clear_public()
+	else:
+		os.makedirs(DST_DIR, exist_ok=True)
+	previous_assets = manifest.assets if manifest is not None else []
+	verified = manifest.verified_assets if manifest is not None else None
+	assets, copied, removed = sync_dir(SRC_DIR, DST_DIR, previous_assets, use_hash, snapshot, names, contents, verified)
+	print(f"Static files: {copied} copied, {removed} removed, {len(assets) - copied} unchanged")
+	if manifest is not None:
+		manifest.assets = assets
+	return copied
 
 def clear_public():
 	try:
@@ -18,95 +57,644 @@ def clear_public():
 		pass
 	os.mkdir(DST_DIR)
 
+"""
+sync_dir()
+inputs
+	src_root: the directory to copy from
+	dst_root: the directory to copy into. Files in it that did not come from src_root are left alone.
+	previous_assets: the relative paths returned by the last sync. Any that no longer exist
+		in src_root are removed from dst_root.
+	use_hash: see copy_static_to_public
+	snapshot: see copy_static_to_public
+	names: an optional dictionary mapping a file's relative path in src_root to the relative
+		path it is copied to (see fingerprint.fingerprint_assets). Other files keep their paths.
+	contents: an optional dictionary mapping a file's relative path in src_root to the bytes
+		to publish in its place (see fingerprint.rewritten_stylesheets). Other files are copied.
+	verified: an optional dictionary, kept between syncs (see BuildManifest.verified_assets).
+		A file whose mtime differs from its output's but whose bytes are the same is left
+		alone, and its size and mtimes are recorded here so the files aren't read again
+		until one of them changes.
+outputs
+	(assets, copied, removed): the relative path every file in src_root was copied to, and how
+		many files were copied and removed. Files are only copied if their contents differ,
+		and each copy replaces the old output atomically.
+"""
+def sync_dir(src_root, dst_root, previous_assets=(), use_hash=False, snapshot=None, names=None, contents=None, verified=None):
+	assets = []
+	copied = 0
+	if verified is None:
+		verified = {}
+	seen = set()
+	for rel_path in walk_files(src_root, snapshot):
+		seen.add(rel_path)
+		out_path = names.get(rel_path, rel_path) if names else rel_path
+		assets.append(out_path)
+		src = os.path.join(src_root, rel_path)
+		dst = os.path.join(dst_root, out_path)
+		if contents and rel_path in contents:
+			os.makedirs(os.path.dirname(dst), exist_ok=True)
+			writer = AtomicWriter(dst, "wb")
+			with writer as file:
+				file.write(contents[rel_path])
+			if writer.changed:
+				print(f"Writing {src} to {dst}")
+				copied += 1
+			continue
+		if is_unchanged(src, dst, use_hash):
+			continue
+		if not use_hash and is_verified(src, dst, verified, rel_path):
+			# Only the mtime differs; leave the output (and its mtime) alone
+			continue
+		print(f"Copying {src} to {dst}")
+		copy_file_atomic(src, dst)
+		copied += 1
+
+	for rel_path in set(verified) - seen:
+		del verified[rel_path]
+
+	removed = 0
+	current = set(assets)
+	for rel_path in previous_assets:
+		if rel_path in current:
+			continue
+		dst = os.path.join(dst_root, rel_path)
+		try:
+			os.remove(dst)
+		except FileNotFoundError:
+			continue
+		print(f"Removing orphaned {dst}")
+		removed += 1
+	return assets, copied, removed
+
+"""
+Returns True if dst holds the same bytes as src. The answer is remembered in verified,
+under rel_path, for as long as neither file's size or mtime changes.
+"""
+def is_verified(src, dst, verified, rel_path):
+	try:
+		dst_stat = os.stat(dst)
+	except FileNotFoundError:
+		return False
+	src_stat = os.stat(src)
+	stamp = [src_stat.st_size, src_stat.st_mtime_ns, dst_stat.st_mtime_ns]
+	if verified.get(rel_path) == stamp:
+		return True
+	verified.pop(rel_path, None)
+	if not same_contents(src, dst):
+		return False
+	# A file modified this recently might change again without its mtime changing
+	if time.time_ns() - src_stat.st_mtime_ns >= RACY_SECONDS * 1_000_000_000:
+		verified[rel_path] = stamp
+	return True
+
+def is_unchanged(src, dst, use_hash):
+	try:
+		dst_stat = os.stat(dst)
+	except FileNotFoundError:
+		return False
+	src_stat = os.stat(src)
+	if src_stat.st_size != dst_stat.st_size:
+		return False
+	if use_hash:
+		return hash_file(src) == hash_file(dst)
+	# Whole seconds, because not every filesystem keeps finer timestamps
+	return int(src_stat.st_mtime) == int(dst_stat.st_mtime)
+
+"""
+Copies src over dst with a single rename, creating dst's directory if needed.
+copy2 keeps the source mtime, which is what the next sync compares against.
+"""
+def copy_file_atomic(src, dst):
+	os.makedirs(os.path.dirname(dst), exist_ok=True)
+	tmp_path = temp_path_for(dst)
+	shutil.copy2(src, tmp_path)
+	os.replace(tmp_path, dst)
+
+"""
+Returns True if the two files hold the same bytes. Sizes are compared first, so
+files of different lengths are never read.
+"""
+def same_contents(path1, path2):
+	if os.stat(path1).st_size != os.stat(path2).st_size:
+		return False
+	with open(path1, "rb") as file1, open(path2, "rb") as file2:
+		while True:
+			chunk1 = file1.read(65536)
+			if chunk1 != file2.read(65536):
+				return False
+			if not chunk1:
+				return True
+
+
+class AtomicWriter:
+	"""
+	Docstring for AtomicWriter constructor
+	parameters:
+	dest_path: the file to write
+	mode: the mode to open the file with ("w" or "wb")
 
-def copy_dir(dirpath):
-	src_dir = os.path.join(SRC_DIR, dirpath)
-	dst_dir = os.path.join(DST_DIR, dirpath)
-	files = os.listdir(src_dir)
-	for f in files:
-		new_path = os.path.join(dirpath, f)
-		print(f"new_path = {new_path}")
-		if os.path.isdir(os.path.join(SRC_DIR, new_path)):
-			os.mkdir(os.path.join(DST_DIR, new_path))
-			copy_dir(new_path)
+	Used as a context manager, it yields a file that writes to a temporary file next to
+	dest_path. On a clean exit the temporary file replaces dest_path with a single rename,
+	but only if its contents differ; otherwise it is discarded and dest_path (and its mtime)
+	is left untouched. Afterwards, changed says whether dest_path was written.
+	"""
+	def __init__(self, dest_path, mode="w"):
+		self.dest_path = dest_path
+		self.mode = mode
+		self.tmp_path = temp_path_for(dest_path)
+		self.file = None
+		self.changed = False
+
+	def __enter__(self):
+		# "x" rather than mkstemp so the file gets normal, umask-based permissions
+		self.file = open(self.tmp_path, self.mode.replace("w", "x"))
+		return self.file
+
+	def __exit__(self, exc_type, exc, traceback):
+		self.file.close()
+		if exc_type is not None:
+			os.remove(self.tmp_path)
+			return False
+		if os.path.exists(self.dest_path) and same_contents(self.tmp_path, self.dest_path):
+			os.remove(self.tmp_path)
 		else:
-			src = os.path.join(src_dir, f)
-			print(f"source: {src}")
-			dst = os.path.join(dst_dir, f)
-			print(f"destination: {dst}")
-			shutil.copy(src, dst)
+			os.replace(self.tmp_path, self.dest_path)
+			self.changed = True
+		return False
+
+"""
+Writes text to path, atomically, unless path already holds exactly that text.
+Returns True if the file was written.
+"""
+def write_if_changed(path, text):
+	writer = AtomicWriter(path)
+	with writer as file:
+		file.write(text)
+	return writer.changed
 
 """
 generate_page()
 inputs
 	from_path: The markdown file that will be used as the source for page content
-	template_path: A boilerplate html frame used to present the translated content
+	template: A boilerplate html frame used to present the translated content. This is either a
+		compiled Template (preferred when generating many pages) or the path to the template file.
 	dest_path: the path to the complete generated html file. If any directories in this path don't exist, they will be created
 	basepath: the url to the root of the final web page
+	profiler: an optional Profiler. When given, each stage of the page is timed (see generate_page_profiled)
+	parse_cache: an optional ParseCache. When given, the title and body html are taken from the
+		cache if this exact markdown has been parsed before, and stored in it otherwise.
 outputs
-	No return
-	An html file will be generated at the location specified by dest_path.
+	True if dest_path was written, False if it already held exactly this page
+	An html file will be generated at the location specified by dest_path. It is replaced
+	atomically, and only if its contents change, so unchanged pages keep their mtime.
 	Any necessary directories will also be created.
 """
-def generate_page(from_path, template_path, dest_path, basepath):
-	print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-	markdown = ""
-	template = ""
-	with open(from_path, "r") as file1:
-		markdown = file1.read()
-
-	with open(template_path, "r") as file2:
-		template = file2.read()
-	
-	md_node = markdown_to_html_node(markdown)
-	html = md_node.to_html()
-
-	title = extract_title(markdown)
-
-	template = template.replace("{{ Title }}", title)
-	template = template.replace("{{ Content }}", html)
-	template = template.replace('href="/', f'href="{basepath}/')
-	template = template.replace('src="/', f'src="{basepath}/')
+def generate_page(from_path, template, dest_path, basepath, profiler=None, parse_cache=None):
+	if not isinstance(template, Template):
+		template = Template.load(template, basepath)
+	print(f"Generating page from {from_path} to {dest_path} using {template.path}")
+	if profiler is not None:
+		with profiler.page(from_path):
+			return generate_page_profiled(from_path, template, dest_path, profiler, parse_cache)
+	if parse_cache is not None:
+		title, content = parse_with_cache(from_path, parse_cache, template)
+	else:
+		# The markdown is parsed block by block as it is read, rather than loaded whole
+		with open(from_path, "r") as file1:
+			document = parse_document(file1)
+		title = document.title
+		content = body_node(document, template).iter_html(template.minify)
 
 	# Create the directory for dest_path, if it doesn't exist.
 	dest_dir = os.path.dirname(dest_path)
 	print(f"destination directory: {dest_dir}")
 	os.makedirs(dest_dir, exist_ok=True)
 
-	with open(dest_path, "w") as file3:
-		file3.write(template)
+	# The body is streamed straight into the file rather than built up as one string
+	writer = AtomicWriter(dest_path)
+	with writer as file3:
+		template.write_to(file3, Title=title, Content=content)
+	return writer.changed
+
+"""
+Returns (title, body html) for a markdown file, from parse_cache if possible.
+The body is stored in the cache on a miss. It is serialized the way template says
+(minified, with image sizes). The file is read once and both the key and the body come
+from those bytes, so a file saved mid-build can't have its body cached under another key.
+"""
+def parse_with_cache(from_path, parse_cache, template):
+	with open(from_path, "rb") as file1:
+		return parse_source_with_cache(file1.read(), parse_cache, template)
+
+def parse_source_with_cache(source, parse_cache, template):
+	key = parse_cache.key(source, template.minify, template.images_hash)
+	cached = parse_cache.get(key)
+	if cached is not None:
+		return cached
+	document = parse_document(decode_markdown(source))
+	body = body_node(document, template).to_html(template.minify)
+	parse_cache.put(key, document.title, body)
+	return document.title, body
+
+"""
+Returns the complete html page for the bytes of a markdown file. Used by the pipeline,
+which reads and writes files itself.
+"""
+def render_page_source(source, template, parse_cache=None):
+	if parse_cache is not None:
+		title, body = parse_source_with_cache(source, parse_cache, template)
+	else:
+		document = parse_document(decode_markdown(source))
+		title, body = document.title, body_node(document, template).to_html(template.minify)
+	return template.render(Title=title, Content=body)
+
+"""
+Returns the node tree of a page's body, with the template's image sizes added to its
+img elements (see imagesize.add_image_props)
+"""
+def body_node(document, template):
+	if not template.images:
+		return document.node
+	return add_image_props(document.node, template.images)
+
+def decode_markdown(source):
+	# Decode exactly as open(path, "r") would, newline translation included
+	return io.TextIOWrapper(io.BytesIO(source)).read()
+
+"""
+The same work as generate_page, but with each stage run to completion before the next
+one starts, so that read, block parse, inline parse, serialize, template and write can
+each be timed on their own. The output is identical; only the streaming is lost.
+"""
+def generate_page_profiled(from_path, template, dest_path, profiler, parse_cache=None):
+	with profiler.stage("read", from_path):
+		with open(from_path, "rb") as file1:
+			source = file1.read()
+		markdown = decode_markdown(source)
+	cached = None
+	if parse_cache is not None:
+		with profiler.stage("cache lookup", from_path):
+			key = parse_cache.key(source, template.minify, template.images_hash)
+			cached = parse_cache.get(key)
+	if cached is not None:
+		title, html = cached
+	else:
+		with profiler.stage("block parse", from_path):
+			blocks = list(iter_blocks(markdown))
+		with profiler.stage("inline parse", from_path):
+			document = document_from_blocks(blocks)
+			title = document.title
+		with profiler.stage("serialize", from_path):
+			html = body_node(document, template).to_html(template.minify)
+		if parse_cache is not None:
+			with profiler.stage("cache store", from_path):
+				parse_cache.put(key, title, html)
+	with profiler.stage("template", from_path):
+		page = template.render(Title=title, Content=html)
+	with profiler.stage("write", from_path):
+		return write_page(dest_path, page)
+
+class PageGenerationError(Exception):
+	"""
+	Raised when one or more pages fail to generate.
+	failures: a list of (source path, error description) tuples, in discovery order
+	"""
+	def __init__(self, failures):
+		self.failures = failures
+		details = "\n".join(f"{source}: {error}" for source, error in failures)
+		super().__init__(f"{len(failures)} page(s) failed to generate:\n{details}")
+
+"""
+discover_pages()
+inputs
+	content_dir_path: which directory should be searched for markdown
+	dest_dir_path: the directory that will hold the generated html
+	snapshot: an optional DirectorySnapshot, so unchanged directories aren't listed again
+outputs:
+	a list of (source path, destination path) tuples for every markdown file below
+		content_dir_path, sorted so that every build visits pages in the same order
+1. walk every file below content_dir_path (see walker.walk_files)
+2. for each file:
+	1. If it is not a markdown file, ignore it.
+	2. If it is a markdown file, add its source path and its .html destination path
+"""
+def discover_pages(content_dir_path, dest_dir_path, snapshot=None):
+	pages = []
+	for rel_path in walk_files(content_dir_path, snapshot):
+		base, ext = os.path.splitext(rel_path)
+		if ext == '.md':
+			pages.append((os.path.join(content_dir_path, rel_path), os.path.join(dest_dir_path, base + '.html')))
+	return pages
 
 """
 generate_pages_recursive()
 inputs
 	content_dir_path: which directory should be searched for markdown
-	template_path: an html file to be used as a template for the new content
+	template_path: an html file to be used as a template for the new content, or a compiled Template
 	dest_dir_path: the directory to be used to store the newly generted html
 	basepath: the url to the root of the final web page
+	manifest: see generate_pages
+	jobs: see generate_pages
+	profiler: see generate_pages
+	parse_cache: see generate_pages
+	build_cache: see generate_pages
+	pipeline_depth: see generate_pages
+	shard: an optional (index, count) pair, index counting from 1. Only the pages that
+		shard_of assigns to that shard are generated.
+	snapshot: see discover_pages
 outputs:
-	no direct return
+	the number of pages that were actually written
 	new html files and directories will be created in dest_dir_path, with a structure parallelling
 		that of the markdown files in content_dir_path
-1. get a list of all contents of the content_dir
-2. for each entry in the list:
-	1. if it is a directory:
-		1. join the directory name to content_dir_path and dest_dir_path to generate new paths
-		2. recursively call this function using the new paths
-	2. Otherwise:
-		1. If it is not a markdown file, ignore it.
-		2. If it is a markdown file:
-			1. create full paths for the source and destination
-			2. call generate page using the new paths
-"""
-def generate_pages_recursive(content_dir_path, template_path, dest_dir_path, basepath):
-	entries = os.listdir(content_dir_path)
-	for entry in entries:
-		entry_path = os.path.join(content_dir_path, entry)
-		dest_path = os.path.join(dest_dir_path, entry)
-		if os.path.isdir(entry_path):
-			generate_pages_recursive(entry_path, template_path, dest_path, basepath)
-		else:
-			base, ext = os.path.splitext(entry)
-			if ext == '.md':
-				dest_path = os.path.join(dest_dir_path, base + '.html')
-				generate_page(entry_path, template_path, dest_path, basepath)
\ No newline at end of file
+	pages recorded in the manifest whose markdown no longer exists are removed (see remove_deleted_pages)
+	raises PageGenerationError naming every source file that failed
+"""
+def generate_pages_recursive(content_dir_path, template_path, dest_dir_path, basepath, manifest=None, jobs=1, profiler=None, parse_cache=None, build_cache=None, pipeline_depth=None, shard=None, snapshot=None):
+	pages = discover_pages(content_dir_path, dest_dir_path, snapshot)
+	if manifest is not None:
+		remove_deleted_pages(pages, dest_dir_path, manifest)
+	if shard is not None:
+		pages = select_shard(pages, content_dir_path, shard)
+	return generate_pages(pages, template_path, basepath, manifest, jobs, profiler, parse_cache, build_cache, pipeline_depth)
+
+"""
+remove_deleted_pages()
+inputs
+	pages: every page found in the content directory, as returned by discover_pages
+	dest_dir_path: the directory the pages are generated into
+	manifest: the BuildManifest of the previous builds
+outputs
+	the number of pages removed
+	Output directories are no longer wiped before a build, so the html of a page whose markdown
+	has been deleted would otherwise stay published. Every page the manifest recorded under
+	dest_dir_path whose source wasn't found is deleted, along with any directories that
+	leaves empty, and forgotten.
+"""
+def remove_deleted_pages(pages, dest_dir_path, manifest):
+	sources = {os.path.normpath(source_path) for source_path, _ in pages}
+	removed = 0
+	for dest_path, entry in list(manifest.pages.items()):
+		if os.path.normpath(entry["source"]) in sources or not is_within(dest_path, dest_dir_path):
+			continue
+		print(f"Removing {dest_path}, its source {entry['source']} is gone")
+		manifest.forget(dest_path)
+		try:
+			os.remove(dest_path)
+			removed += 1
+		except FileNotFoundError:
+			pass
+		remove_empty_dirs(os.path.dirname(dest_path), dest_dir_path)
+	return removed
+
+"""
+Removes directory, and then each of its parents, for as long as they are empty,
+stopping at (and never removing) root
+"""
+def remove_empty_dirs(directory, root):
+	root = os.path.normpath(root)
+	directory = os.path.normpath(directory)
+	while directory != root and is_within(directory, root):
+		try:
+			os.rmdir(directory)
+		except OSError:
+			return
+		directory = os.path.dirname(directory)
+
+def is_within(path, directory):
+	return os.path.normpath(path).startswith(os.path.normpath(directory) + os.sep)
+
+"""
+Returns which of count shards (numbered from 0) a page belongs to. The assignment depends
+only on the source path relative to the content directory, so every machine agrees on it.
+"""
+def shard_of(relative_source_path, count):
+	digest = hashlib.sha256(relative_source_path.replace(os.sep, "/").encode()).digest()
+	return int.from_bytes(digest[:8], "big") % count
+
+"""
+Returns the pages (as returned by discover_pages) that belong to shard (index, count),
+index counting from 1
+"""
+def select_shard(pages, content_dir_path, shard):
+	index, count = shard
+	return [
+		(source_path, dest_path)
+		for source_path, dest_path in pages
+		if shard_of(os.path.relpath(source_path, content_dir_path), count) == index - 1
+	]
+
+"""
+generate_pages()
+inputs
+	pages: a list of (source path, destination path) tuples, as returned by discover_pages
+	template: a compiled Template, or the path to the template file
+	basepath: the url to the root of the final web page
+	manifest: an optional BuildManifest. When given, pages whose source, template and basepath
+		are unchanged since the last build (and whose output is intact) are skipped, and every
+		generated page is recorded in the manifest.
+	jobs: the number of worker processes used to render pages. 1 renders in this process.
+	profiler: an optional Profiler that receives the timings of every generated page
+	parse_cache: an optional ParseCache shared by every page (see generate_page)
+	build_cache: an optional BuildCache. Pages it already holds are copied from it instead of
+		being rendered, and every page that is rendered is stored in it.
+	pipeline_depth: if given, pages are generated by generate_pages_pipelined with this depth,
+		unless a profiler is given (profiling times each page's stages one after another)
+outputs:
+	the number of pages that were actually written (pages whose html came out identical are not rewritten)
+	raises PageGenerationError naming every source file that failed
+1. compile the template, if it isn't already
+2. drop the pages that the manifest says are up to date
+3. write the pages that the build cache holds
+4. generate the remaining pages, either one at a time or across a process pool
+5. record every generated page in the manifest, and store it in the build cache
+"""
+def generate_pages(pages, template, basepath, manifest=None, jobs=1, profiler=None, parse_cache=None, build_cache=None, pipeline_depth=None):
+	# Compile the template once for the whole build rather than once per page
+	if not isinstance(template, Template):
+		template = Template.load_cached(template, basepath)
+
+	stale_pages = []
+	for source_path, dest_path in pages:
+		source_hash = None
+		if manifest is not None or build_cache is not None:
+			source_hash = hash_file(source_path)
+		if manifest is not None and manifest.is_fresh(dest_path, source_hash, template.hash, basepath):
+			print(f"Skipping unchanged page {source_path}")
+			continue
+		stale_pages.append((source_path, dest_path, source_hash))
+
+	written = 0
+	render_pages = stale_pages
+	if build_cache is not None:
+		render_pages = []
+		for source_path, dest_path, source_hash in stale_pages:
+			data = build_cache.fetch(build_cache.page_key(source_hash, template.hash, basepath))
+			if data is None:
+				render_pages.append((source_path, dest_path, source_hash))
+				continue
+			print(f"Fetching {dest_path} from the build cache")
+			os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+			writer = AtomicWriter(dest_path, "wb")
+			with writer as file:
+				file.write(data)
+			if writer.changed:
+				written += 1
+			if manifest is not None:
+				manifest.record(dest_path, source_path, source_hash, template.hash, basepath, hash_bytes(data))
+
+	page_jobs = [(source_path, template, dest_path, basepath, parse_cache) for source_path, dest_path, _ in render_pages]
+	run_job = functools.partial(generate_page_job, profile=profiler is not None)
+	if pipeline_depth and profiler is None and page_jobs:
+		results = generate_pages_pipelined(page_jobs, jobs, pipeline_depth)
+	elif jobs > 1 and len(page_jobs) > 1:
+		with ProcessPoolExecutor(max_workers=jobs) as executor:
+			results = list(executor.map(run_job, page_jobs))
+	else:
+		results = map(run_job, page_jobs)
+
+	# Results come back in discovery order, so the log reads the same however many jobs ran
+	failures = []
+	for (source_path, dest_path, source_hash), (log, error, events, changed) in zip(render_pages, results):
+		print(log, end="")
+		if profiler is not None:
+			profiler.extend(events)
+		if error is not None:
+			failures.append((source_path, error))
+			continue
+		if changed:
+			written += 1
+		if manifest is None and build_cache is None:
+			continue
+		with open(dest_path, "rb") as file:
+			data = file.read()
+		if manifest is not None:
+			manifest.record(dest_path, source_path, source_hash, template.hash, basepath, hash_bytes(data))
+		if build_cache is not None:
+			build_cache.store(build_cache.page_key(source_hash, template.hash, basepath), data)
+	unchanged = len(stale_pages) - len(failures) - written
+	print(f"Pages: {written} written, {unchanged} unchanged, {len(pages) - len(stale_pages)} skipped")
+	if failures:
+		raise PageGenerationError(failures)
+	return written
+
+"""
+Returns the html path that generate_pages_recursive would write for a markdown file
+"""
+def page_dest_path(source_path, content_dir_path, dest_dir_path):
+	relative = os.path.relpath(source_path, content_dir_path)
+	base, _ = os.path.splitext(relative)
+	return os.path.join(dest_dir_path, base + '.html')
+
+def generate_page_job(page_job, profile=False):
+	"""
+	Runs generate_page for one (from_path, template, dest_path, basepath, parse_cache) tuple.
+	Returns (log, error, events, changed): the text generate_page printed, a description of the
+	exception it raised (or None), the profiling events it recorded (empty unless profile is
+	True), and whether the output file was written. Nothing escapes, so a pool worker never
+	dies on a bad page.
+	"""
+	log = io.StringIO()
+	error = None
+	changed = False
+	profiler = Profiler() if profile else None
+	with contextlib.redirect_stdout(log):
+		try:
+			from_path, template, dest_path, basepath, parse_cache = page_job
+			changed = generate_page(from_path, template, dest_path, basepath, profiler, parse_cache)
+		except Exception as e:
+			error = f"{type(e).__name__}: {e}"
+	if profiler is None:
+		return log.getvalue(), error, [], changed
+	profiler.close()
+	return log.getvalue(), error, profiler.events, changed
+
+"""
+generate_pages_pipelined()
+inputs
+	page_jobs: a list of (from_path, template, dest_path, basepath, parse_cache) tuples
+	jobs: the number of pages rendered at once. More than 1 renders across a process pool.
+	depth: how many pages may wait between stages
+outputs
+	a list of (log, error, events, changed) tuples in the same order as page_jobs, exactly as
+	generate_page_job would have returned them (events is always empty)
+
+Pages flow through three stages that run at the same time: a reader that loads the markdown
+sources one after another, renderers that turn them into html (in the event loop for a single
+job, across a process pool for more), and a writer that writes the finished pages. Reads and writes run in threads, so the disk (or network
+volume) is busy while pages render and the CPU is busy while files are read and written.
+The queues between the stages hold at most depth pages, so a stage that gets ahead waits
+for the next one, and memory use is bounded however many pages are being built.
+"""
+def generate_pages_pipelined(page_jobs, jobs=1, depth=PIPELINE_DEPTH):
+	return asyncio.run(run_pipeline(page_jobs, jobs, depth))
+
+async def run_pipeline(page_jobs, jobs, depth):
+	results = [None] * len(page_jobs)
+	read_queue = asyncio.Queue(depth)
+	write_queue = asyncio.Queue(depth)
+	renderer_count = max(jobs, 1)
+
+	def generating_line(index):
+		from_path, template, dest_path, _, _ = page_jobs[index]
+		return f"Generating page from {from_path} to {dest_path} using {template.path}\n"
+
+	def fail(index, e):
+		results[index] = (generating_line(index), f"{type(e).__name__}: {e}", [], False)
+
+	async def read_sources():
+		for index, (from_path, _, _, _, _) in enumerate(page_jobs):
+			try:
+				source = await asyncio.to_thread(read_bytes, from_path)
+			except Exception as e:
+				fail(index, e)
+				continue
+			await read_queue.put((index, source))
+		for _ in range(renderer_count):
+			await read_queue.put(None)
+
+	async def render_pages(executor):
+		loop = asyncio.get_running_loop()
+		while (item := await read_queue.get()) is not None:
+			index, source = item
+			_, template, _, _, parse_cache = page_jobs[index]
+			try:
+				if executor is None:
+					# Rendering in another thread would only contend for the GIL; reads and
+					# writes still carry on in their own threads while this page renders
+					page = render_page_source(source, template, parse_cache)
+				else:
+					page = await loop.run_in_executor(executor, render_page_source, source, template, parse_cache)
+			except Exception as e:
+				fail(index, e)
+				continue
+			await write_queue.put((index, page))
+			# put() doesn't yield while the queue has room; let the reader and writer start their next file
+			await asyncio.sleep(0)
+
+	async def write_pages():
+		while (item := await write_queue.get()) is not None:
+			index, page = item
+			dest_path = page_jobs[index][2]
+			try:
+				changed = await asyncio.to_thread(write_page, dest_path, page)
+			except Exception as e:
+				fail(index, e)
+				continue
+			log = generating_line(index) + f"destination directory: {os.path.dirname(dest_path)}\n"
+			results[index] = (log, None, [], changed)
+
+	executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+	with executor or contextlib.nullcontext():
+		writer = asyncio.create_task(write_pages())
+		await asyncio.gather(read_sources(), *(render_pages(executor) for _ in range(renderer_count)))
+		await write_queue.put(None)
+		await writer
+	return results
+
+def read_bytes(path):
+	with open(path, "rb") as file:
+		return file.read()
+
+def write_page(dest_path, page):
+	os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+	return write_if_changed(dest_path, page)
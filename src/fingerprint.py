@@ -0,0 +1,167 @@
+import os
+import posixpath
+import re
+import urllib.parse
+
+from filemanager import write_if_changed
+from manifest import hash_bytes, hash_file
+from walker import walk_files
+
+# Assets referenced from pages and stylesheets. Other static files (favicon.ico, robots.txt,
+# ...) are fetched by well-known names, so they keep theirs.
+FINGERPRINT_EXTENSIONS = (".css", ".js", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg", ".woff", ".woff2")
+DIGEST_LENGTH = 10
+HEADERS_FILE = "_headers"
+# A fingerprinted name always has the same content, so it can be cached for good;
+# everything else has to be checked with the server on every use
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+# url(...) references and @import "..." in a stylesheet, as (url(, quote, reference) or
+# (@import, quote, reference)
+CSS_REFERENCE_RE = re.compile(r"""(url\(\s*|@import\s+(?=['"]))(['"]?)([^'")\s]+)\2""")
+
+"""
+Returns the name an asset is published under: its content hash is inserted before the
+extension, e.g. images/tom.png becomes images/tom.1a2b3c4d5e.png
+"""
+def fingerprinted_path(rel_path, digest):
+	base, ext = os.path.splitext(rel_path)
+	return f"{base}.{digest[:DIGEST_LENGTH]}{ext}"
+
+"""
+fingerprint_assets()
+inputs
+	src_root: the static directory
+	snapshot: an optional DirectorySnapshot (see walker.scan_dir)
+outputs
+	a dictionary mapping the relative path of every fingerprintable asset under src_root to
+	its fingerprinted path. Pass it to sync_dir to publish the assets under those names.
+"""
+def fingerprint_assets(src_root, snapshot=None):
+	assets = {}
+	stylesheets = []
+	for rel_path in walk_files(src_root, snapshot):
+		if rel_path.lower().endswith(".css"):
+			stylesheets.append(rel_path)
+		elif rel_path.lower().endswith(FINGERPRINT_EXTENSIONS):
+			assets[rel_path] = fingerprinted_path(rel_path, hash_file(os.path.join(src_root, rel_path)))
+	# A stylesheet is published with its references rewritten to the fingerprinted names, and
+	# named by the hash of what is published, so a renamed font or image renames it too.
+	# A stylesheet can @import another, which then has to be named first.
+	def fingerprint_stylesheet(rel_path, importing):
+		importing = importing | {rel_path}
+		css = read_stylesheet(os.path.join(src_root, rel_path))
+		for reference in stylesheet_references(css, rel_path):
+			if reference in stylesheets and reference not in assets and reference not in importing:
+				fingerprint_stylesheet(reference, importing)
+		published = rewrite_stylesheet(css, rel_path, assets).encode("utf-8", "surrogateescape")
+		assets[rel_path] = fingerprinted_path(rel_path, hash_bytes(published))
+	for rel_path in stylesheets:
+		if rel_path not in assets:
+			fingerprint_stylesheet(rel_path, frozenset())
+	return dict(sorted(assets.items()))
+
+"""
+Returns the contents every stylesheet in assets (as returned by fingerprint_assets) has to be
+published with, by relative path: its references to other assets point at their fingerprinted
+names. Stylesheets without any such reference are left out, since they are copied as they are.
+Pass it to sync_dir along with assets.
+"""
+def rewritten_stylesheets(src_root, assets):
+	contents = {}
+	for rel_path in assets:
+		if not rel_path.lower().endswith(".css"):
+			continue
+		css = read_stylesheet(os.path.join(src_root, rel_path))
+		published = rewrite_stylesheet(css, rel_path, assets)
+		if published != css:
+			contents[rel_path] = published.encode("utf-8", "surrogateescape")
+	return contents
+
+def read_stylesheet(path):
+	# surrogateescape carries any bytes that aren't utf-8 through unchanged
+	with open(path, "r", encoding="utf-8", errors="surrogateescape", newline="") as file:
+		return file.read()
+
+"""
+Returns the relative path (under the static directory) of every local file a stylesheet refers
+to. rel_path is the stylesheet's own relative path, which relative references start from.
+"""
+def stylesheet_references(css, rel_path):
+	references = []
+	for match in CSS_REFERENCE_RE.finditer(css):
+		target = resolve_reference(match.group(3), rel_path)
+		if target is not None:
+			references.append(target)
+	return references
+
+"""
+Rewrites every reference in a stylesheet to a file in assets to point at its fingerprinted
+name. Only the file name changes, so relative references stay relative, and any ?query
+or #fragment is kept.
+"""
+def rewrite_stylesheet(css, rel_path, assets):
+	def rewrite(match):
+		prefix, quote, reference = match.groups()
+		target = resolve_reference(reference, rel_path)
+		if target not in assets:
+			return match.group(0)
+		path, sep, rest = reference.partition("?") if "?" in reference else reference.partition("#")
+		directory = path[:path.rfind("/") + 1]
+		published = urllib.parse.quote(os.path.basename(assets[target]))
+		return f"{prefix}{quote}{directory}{published}{sep}{rest}{quote}"
+	return CSS_REFERENCE_RE.sub(rewrite, css)
+
+"""
+Returns the relative path a stylesheet reference points at, or None for references that aren't
+to a local file (other sites, data: urls, fragments)
+"""
+def resolve_reference(reference, rel_path):
+	url = urllib.parse.urlsplit(reference)
+	if url.scheme or url.netloc or not url.path:
+		return None
+	path = urllib.parse.unquote(url.path)
+	if path.startswith("/"):
+		target = posixpath.normpath(path.lstrip("/"))
+	else:
+		target = posixpath.normpath(posixpath.join(posixpath.dirname(rel_path.replace(os.sep, "/")), path))
+	if target.startswith("../"):
+		return None
+	return target.replace("/", os.sep)
+
+"""
+Returns the same mapping as root-relative urls ({"/index.css": "/index.1a2b3c4d5e.css"}),
+which is what Template rewrites references with
+"""
+def asset_urls(assets):
+	return {to_url(rel_path): to_url(published) for rel_path, published in assets.items()}
+
+def to_url(rel_path):
+	return "/" + urllib.parse.quote(rel_path.replace(os.sep, "/"))
+
+"""
+write_headers()
+inputs
+	dest_dir_path: the output directory; the manifest is written to dest_dir_path/_headers
+	page_paths: the path of every generated page, under dest_dir_path
+	assets: the mapping returned by fingerprint_assets
+	basepath: the url to the root of the final web page. Only its path is used.
+outputs
+	True if the file was written (it is left alone when nothing has changed)
+	The file uses the _headers format read by Netlify, Cloudflare Pages and similar hosts:
+	every fingerprinted asset is marked immutable, and every page (under both its directory
+	url and its file url) must be revalidated.
+"""
+def write_headers(dest_dir_path, page_paths, assets, basepath):
+	prefix = urllib.parse.urlsplit(basepath).path.rstrip("/")
+	lines = []
+	for published in sorted(assets.values()):
+		lines.extend([prefix + to_url(published), f"  Cache-Control: {IMMUTABLE}"])
+	for page_path in sorted(page_paths):
+		url = to_url(os.path.relpath(page_path, dest_dir_path))
+		urls = [url]
+		if url.endswith("/index.html"):
+			urls.insert(0, url[:-len("index.html")])
+		for page_url in urls:
+			lines.extend([prefix + page_url, f"  Cache-Control: {REVALIDATE}"])
+	return write_if_changed(os.path.join(dest_dir_path, HEADERS_FILE), "\n".join(lines) + "\n")
@@ -0,0 +1,21 @@
+import os
+import tempfile
+import unittest
+
+
+class TempDirTestCase(unittest.TestCase):
+	"""
+	A TestCase that runs each test in a fresh temporary directory, self.tmp, which is removed
+	afterwards
+	"""
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.addCleanup(self.tmp.cleanup)
+
+	def write(self, relative_path, data):
+		"""Writes data (text or bytes) to relative_path under self.tmp, making its directories, and returns the full path"""
+		path = os.path.join(self.tmp.name, relative_path)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		with open(path, "wb" if isinstance(data, bytes) else "w") as file:
+			file.write(data)
+		return path
@@ -7,6 +7,9 @@ class HTMLNode:
 	children: any tagged html items within this node
 	props: a dictionary of properties to be assigned in the opening tag.
 	"""
+	# A large page builds tens of thousands of nodes; slots keep each one small
+	__slots__ = ("tag", "value", "children", "props")
+
 	def __init__(self, tag=None, value=None, children=None, props=None):
 		self.tag = tag
 		self.value = value
@@ -24,9 +27,21 @@ class HTMLNode:
 			return False
 		return True
 	
-	def to_html(self):
+	def to_html(self, minify=False):
+		return "".join(self.iter_html(minify))
+
+	def iter_html(self, minify=False):
+		"""
+		Yields the html for this node as a series of string chunks, without
+		building the whole string. Every opening tag is yielded as a single chunk.
+		With minify, runs of whitespace in text are collapsed to a single space as they
+		are serialized, except inside the elements in minify.PRESERVE_WHITESPACE_TAGS.
+		"""
 		raise NotImplementedError
 
+	def write_to(self, fp, minify=False):
+		fp.writelines(self.iter_html(minify))
+
 	def to_raw_text(self):
 		raise NotImplementedError
 
@@ -0,0 +1,216 @@
+import json
+import os
+import struct
+import time
+import urllib.parse
+
+from leafnode import LeafNode
+from manifest import hash_file, temp_path_for
+from parentnode import ParentNode
+from walker import RACY_SECONDS, walk_files
+
+IMAGE_SIZES_PATH = "./.cache/images.json"
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+# Added to every img whose size is known. With its size given the browser can reserve the
+# space up front, so deferring the download no longer shifts the page about when it arrives.
+LAZY_PROPS = {"loading": "lazy", "decoding": "async"}
+# JPEG start-of-frame markers, which hold the image size. C4, C8 and CC share the range
+# but are other kinds of segment.
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Markers that stand alone, without a length or a segment after them
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+# EXIF orientations 5 to 8 turn the image on its side, swapping its width and height
+EXIF_TRANSPOSED = {5, 6, 7, 8}
+
+"""
+image_size()
+inputs
+	file: a binary file opened at the start of an image
+outputs
+	(width, height) in pixels, or None if the file isn't a PNG, GIF, JPEG or WebP image or
+	its header is damaged. Only the header is read, never the pixel data. A JPEG whose EXIF
+	orientation turns it on its side has its size reported as it will be displayed.
+"""
+def image_size(file):
+	header = file.read(30)
+	try:
+		if header.startswith(b"\x89PNG\r\n\x1a\n") and header[12:16] == b"IHDR":
+			return struct.unpack(">II", header[16:24])
+		if header[:6] in (b"GIF87a", b"GIF89a"):
+			return struct.unpack("<HH", header[6:10])
+		if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+			return webp_size(header)
+		if header[:2] == b"\xff\xd8":
+			file.seek(2)
+			return jpeg_size(file)
+	except struct.error:
+		pass
+	return None
+
+def webp_size(header):
+	chunk = header[12:16]
+	if chunk == b"VP8 " and header[23:26] == b"\x9d\x01\x2a":
+		# Lossy: the frame header's 14 bit width and height (the top 2 bits are a scale)
+		width, height = struct.unpack("<HH", header[26:30])
+		return width & 0x3FFF, height & 0x3FFF
+	if chunk == b"VP8L" and header[20] == 0x2F:
+		# Lossless: 14 bits each of width - 1 and height - 1
+		bits = struct.unpack("<I", header[21:25])[0]
+		return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+	if chunk == b"VP8X":
+		# Extended: 24 bits each of canvas width - 1 and height - 1
+		return int.from_bytes(header[24:27], "little") + 1, int.from_bytes(header[27:30], "little") + 1
+	return None
+
+def jpeg_size(file):
+	transposed = False
+	while True:
+		byte = file.read(1)
+		if not byte:
+			return None
+		if byte != b"\xff":
+			continue
+		marker = file.read(1)
+		# Any number of 0xFF bytes may pad the space before a marker
+		while marker == b"\xff":
+			marker = file.read(1)
+		if not marker:
+			return None
+		marker = marker[0]
+		if marker in JPEG_STANDALONE_MARKERS or marker == 0x00:
+			continue
+		if marker == 0xD9:
+			return None
+		length = struct.unpack(">H", file.read(2))[0]
+		if length < 2:
+			return None
+		segment = file.read(length - 2)
+		if marker in JPEG_SOF_MARKERS:
+			height, width = struct.unpack(">HH", segment[1:5])
+			return (height, width) if transposed else (width, height)
+		if marker == 0xE1 and segment.startswith(b"Exif\0\0"):
+			transposed = exif_orientation(segment[6:]) in EXIF_TRANSPOSED
+
+"""
+Returns the orientation tag from the first IFD of an EXIF block (a TIFF header and what
+follows it), or None if it has none
+"""
+def exif_orientation(tiff):
+	try:
+		order = {b"II": "<", b"MM": ">"}[tiff[:2]]
+		offset = struct.unpack(order + "I", tiff[4:8])[0]
+		count = struct.unpack(order + "H", tiff[offset:offset + 2])[0]
+		for index in range(count):
+			entry = offset + 2 + index * 12
+			tag, _, _, value = struct.unpack(order + "HHIH", tiff[entry:entry + 10])
+			if tag == 0x0112:
+				return value
+	except (KeyError, struct.error):
+		pass
+	return None
+
+
+class ImageSizeCache:
+	"""
+	Docstring for ImageSizeCache constructor
+	parameters:
+	path: the json file used to persist the cache between builds
+	force: if True, the previous cache is ignored and every image is read again
+
+	Remembers the size of every image by the hash of its contents, so an image is only ever
+	read for its size once, however often it is copied, renamed or rebuilt. Each file's
+	hash is remembered along with its size and mtime as well; while those match, the hash
+	(and so the image size) is reused without opening the file at all.
+	"""
+	def __init__(self, path=IMAGE_SIZES_PATH, force=False):
+		self.path = path
+		self.files = {}
+		self.sizes = {}
+		if not force:
+			self.load()
+
+	def load(self):
+		try:
+			with open(self.path, "r") as file:
+				data = json.load(file)
+			self.files = data["files"]
+			self.sizes = data["sizes"]
+		except (FileNotFoundError, ValueError, KeyError):
+			self.files = {}
+			self.sizes = {}
+
+	def save(self):
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		# Only sizes still used by a known file are kept
+		hashes = {entry["hash"] for entry in self.files.values()}
+		sizes = {digest: size for digest, size in self.sizes.items() if digest in hashes}
+		tmp_path = temp_path_for(self.path)
+		with open(tmp_path, "w") as file:
+			json.dump({"files": self.files, "sizes": sizes}, file, sort_keys=True)
+		os.replace(tmp_path, self.path)
+
+	def size_of(self, path):
+		"""Returns (width, height) for the image at path, or None if its size can't be read"""
+		stat = os.stat(path)
+		entry = self.files.get(path)
+		if entry is None or entry["mtime_ns"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+			entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "hash": hash_file(path)}
+			# A file modified this recently might change again without its mtime changing
+			if time.time_ns() - stat.st_mtime_ns < RACY_SECONDS * 1_000_000_000:
+				self.files.pop(path, None)
+			else:
+				self.files[path] = entry
+		digest = entry["hash"]
+		if digest not in self.sizes:
+			with open(path, "rb") as file:
+				size = image_size(file)
+			self.sizes[digest] = list(size) if size else None
+		size = self.sizes[digest]
+		return tuple(size) if size else None
+
+"""
+image_sizes()
+inputs
+	src_root: the static directory
+	cache: an optional ImageSizeCache. Without one, every image is read.
+	snapshot: an optional DirectorySnapshot (see walker.scan_dir)
+outputs
+	a dictionary mapping the root-relative url of every image under src_root whose size
+	could be read to its (width, height), e.g. {"/images/tom.png": (640, 480)}.
+	Pass it to Template to have the sizes added to the img elements that use those urls.
+"""
+def image_sizes(src_root, cache=None, snapshot=None):
+	if cache is None:
+		cache = ImageSizeCache(path=None, force=True)
+	sizes = {}
+	for rel_path in walk_files(src_root, snapshot):
+		if not rel_path.lower().endswith(IMAGE_EXTENSIONS):
+			continue
+		size = cache.size_of(os.path.join(src_root, rel_path))
+		if size is not None:
+			sizes["/" + urllib.parse.quote(rel_path.replace(os.sep, "/"))] = size
+	return sizes
+
+"""
+add_image_props()
+inputs
+	node: an html node tree, such as Document.node
+	sizes: the dictionary returned by image_sizes
+outputs
+	the same tree, with width, height, loading="lazy" and decoding="async" props on every img
+	whose src is in sizes. Nodes are shared between pages by the block cache, so they are
+	never changed: the img and the parents above it are replaced with new nodes, and a tree
+	without any such img is returned as it is.
+"""
+def add_image_props(node, sizes):
+	if node.children is None:
+		if node.tag != "img" or not node.props or node.props.get("src") not in sizes:
+			return node
+		width, height = sizes[node.props["src"]]
+		return LeafNode(node.tag, node.value, {**node.props, "width": str(width), "height": str(height), **LAZY_PROPS})
+	children = [add_image_props(child, sizes) for child in node.children]
+	if all(new is old for new, old in zip(children, node.children)):
+		return node
+	return ParentNode(node.tag, children, node.props)
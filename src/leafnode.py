@@ -1,15 +1,28 @@
 from htmlnode import HTMLNode
+from minify import PRESERVE_WHITESPACE_TAGS, VOID_TAGS, collapse_whitespace
 
 
 class LeafNode(HTMLNode):
+	__slots__ = ()
+
 	def __init__(self, tag, value, props=None):
 		super().__init__(tag, value, None, props)
 
-	def to_html(self):
+	def to_html(self, minify=False):
+		value = self.value
+		if minify:
+			if value and self.tag not in PRESERVE_WHITESPACE_TAGS:
+				value = collapse_whitespace(value)
+			if not value and self.tag in VOID_TAGS:
+				# <img ...></img>: the closing tag is redundant (and not valid html)
+				return f"<{self.tag}{self.props_to_html()}>"
 		if self.tag:
-			return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+			return f"<{self.tag}{self.props_to_html()}>{value}</{self.tag}>"
 		else:
-			return f"{self.value}"
+			return f"{value}"
+
+	def iter_html(self, minify=False):
+		yield self.to_html(minify)
 
 	def to_raw_text(self):
 		return self.value
\ No newline at end of file
@@ -1,19 +1,291 @@
+import argparse
+import contextlib
+import os
+import shutil
 import sys
+import time
 from textnode import TextNode
-from filemanager import copy_static_to_public, generate_pages_recursive
+from buildcache import open_build_cache
+from buildserver import SOCKET_PATH, BuildServer
+from compress import GZIP_MIN_SIZE, precompress
+from filemanager import PIPELINE_DEPTH, SRC_DIR, PageGenerationError, copy_static_to_public, discover_pages, generate_pages, generate_pages_recursive, is_within, page_dest_path
+from fingerprint import HEADERS_FILE, asset_urls, fingerprint_assets, rewritten_stylesheets, write_headers
+from imagesize import ImageSizeCache, image_sizes
+from manifest import MANIFEST_PATH, BuildManifest
+from parsecache import ParseCache
+from profiler import PROFILE_PATH, Profiler
+from shards import ShardMergeError, check_shards, copy_shard_pages, parse_shard, shard_dir, shard_record_path, write_shard_manifest
+from template import Template
+from text_converter import block_cache_info, enable_block_cache
+from walker import SNAPSHOT_PATH, DirectorySnapshot
+from watcher import Watcher
 
 source_path = "content/index.md"
 content_path = "content"
 template_path = "template.html"
 dest_path = "docs"
 
+def parse_args():
+	parser = argparse.ArgumentParser(description="Generate the static site from markdown content.")
+	parser.add_argument("basepath", nargs="?", default="/", help="the url to the root of the final web page")
+	parser.add_argument("--force", action="store_true", help="ignore the build manifest and regenerate every page")
+	parser.add_argument("--clean", action="store_true", help="wipe the output directory before building")
+	parser.add_argument("--checksum", action="store_true", help="compare static files by content instead of size and mtime")
+	parser.add_argument("-j", "--jobs", type=int, default=1, help="render pages across this many worker processes")
+	parser.add_argument("--pipeline", action="store_true", help="overlap reading, rendering and writing pages")
+	parser.add_argument("--pipeline-depth", type=int, default=PIPELINE_DEPTH, metavar="DEPTH", help=f"with --pipeline, queue at most DEPTH pages between steps (default {PIPELINE_DEPTH})")
+	parser.add_argument("--no-parse-cache", action="store_true", help="parse every page from scratch instead of reusing cached parse results")
+	parser.add_argument("--cache-size", type=int, default=256, metavar="MB", help="maximum size of the parse cache (default 256 MB)")
+	parser.add_argument("--profile", action="store_true", help="time every page and build stage, and the memory each page allocates, and write a Chrome trace. Pages the parse cache already holds only show a cache lookup; add --no-parse-cache to profile parsing them")
+	parser.add_argument("--profile-output", default=PROFILE_PATH, metavar="TRACE_PATH", help=f"with --profile, where to write the trace (default {PROFILE_PATH})")
+	parser.add_argument("--build-cache", type=build_cache_arg, metavar="LOCATION", help="share rendered pages through this cache: a directory (which may be on NFS) or a file:// url")
+	parser.add_argument("--minify", action="store_true", help="leave insignificant whitespace out of every page (<pre> and <code> content is kept as written)")
+	parser.add_argument("--fingerprint", action="store_true", help=f"publish static assets under content-hashed names, rewrite references to them, and write a {HEADERS_FILE} file marking them immutable")
+	parser.add_argument("--image-sizes", action="store_true", help="give every img of a static image its width and height (read from the image file) and load it lazily")
+	parser.add_argument("--gzip", action="store_true", help="write a .gz copy of every html, css, js and svg output")
+	parser.add_argument("--gzip-min-size", type=int, default=GZIP_MIN_SIZE, metavar="BYTES", help=f"with --gzip, leave out files smaller than BYTES (default {GZIP_MIN_SIZE})")
+	parser.add_argument("--watch", action="store_true", help="keep running and rebuild whatever changes")
+	parser.add_argument("--serve", action="store_true", help="keep running and rebuild when asked to by src/buildserver.py")
+	parser.add_argument("--socket", default=SOCKET_PATH, help=f"with --serve, the socket to listen on (default {SOCKET_PATH})")
+	parser.add_argument("--shard", type=shard_arg, metavar="I/N", help="build only shard I of N (numbered from 1) into its own directory under shards/")
+	parser.add_argument("--merge", nargs="+", metavar="SHARD_DIR", help=f"merge the output of every shard into {dest_path} instead of building")
+	return parser.parse_args()
+
+def shard_arg(text):
+	try:
+		return parse_shard(text)
+	except ValueError as e:
+		raise argparse.ArgumentTypeError(str(e))
+
+def build_cache_arg(location):
+	try:
+		return open_build_cache(location)
+	except ValueError as e:
+		raise argparse.ArgumentTypeError(str(e))
+
 def main():
-	basepath = "/"
-	if len(sys.argv) > 1:
-		basepath = sys.argv[1]
+	args = parse_args()
+
+	manifest_path, snapshot_path = MANIFEST_PATH, SNAPSHOT_PATH
+	if args.shard is not None:
+		manifest_path = shard_record_path(MANIFEST_PATH, args.shard)
+		snapshot_path = shard_record_path(SNAPSHOT_PATH, args.shard)
+	manifest = BuildManifest(manifest_path, force=args.force)
+	snapshot = DirectorySnapshot(snapshot_path, force=args.force)
+	parse_cache = None if args.no_parse_cache else ParseCache(max_bytes=args.cache_size * 1024 * 1024)
+	if args.merge:
+		try:
+			merge(args, manifest, snapshot)
+		except ShardMergeError as e:
+			sys.exit(str(e))
+		return
+	if args.watch or args.serve:
+		# Edited pages are rendered again, mostly with only a few blocks changed
+		enable_block_cache()
+	build(args, manifest, parse_cache, args.clean, snapshot, args.build_cache)
+
+	if args.watch:
+		watch(args, manifest, parse_cache)
+	elif args.serve:
+		serve(args, manifest, parse_cache)
+
+def build(args, manifest, parse_cache, clean=False, snapshot=None, build_cache=None):
+	profiler = Profiler() if args.profile else None
+	# Pages refer to fingerprinted assets by name, so even a shard needs to know them
+	assets = fingerprint_assets(SRC_DIR, snapshot) if args.fingerprint else None
+	images = load_image_sizes(args, args.force, snapshot)
+	if args.shard is not None:
+		# A shard only renders its slice of the pages; merge copies the static files
+		output_path = shard_dir(args.shard)
+		if clean:
+			shutil.rmtree(output_path, ignore_errors=True)
+		static_written = 0
+	else:
+		output_path = dest_path
+		with profiler.stage("static copy") if profiler else contextlib.nullcontext():
+			static_written = copy_static_to_public(clean, manifest, args.checksum, snapshot, assets, stylesheets(assets))
+	try:
+		pages_written = generate_pages_recursive(content_path, load_template(args, assets, images), output_path, args.basepath, manifest, args.jobs, profiler, parse_cache, build_cache, pipeline_depth(args), args.shard, snapshot)
+		if args.shard is not None:
+			write_shard_manifest(content_path, output_path, args.shard, args.basepath, manifest)
+		if build_cache is not None:
+			print(build_cache.summary())
+		print(f"Build complete: {pages_written + static_written} files written ({pages_written} pages, {static_written} static files)")
+		if args.fingerprint and args.shard is None:
+			write_asset_headers(args, assets)
+		if args.gzip and args.shard is None:
+			with profiler.stage("gzip") if profiler else contextlib.nullcontext():
+				print(precompress(dest_path, args.gzip_min_size).summary())
+	finally:
+		# Keep the record of every page that did build, even if another one failed
+		manifest.save()
+		if snapshot is not None:
+			snapshot.save()
+		if parse_cache is not None:
+			parse_cache.prune()
+		if profiler is not None:
+			profiler.close()
+			profiler.write_trace(args.profile_output)
+			print(profiler.summary())
+			cache = block_cache_info()
+			print(f"Block cache: {cache.hits} hits, {cache.misses} misses")
+			print(f"Profile written to {args.profile_output}")
+
+def merge(args, manifest, snapshot):
+	assets = fingerprint_assets(SRC_DIR, snapshot) if args.fingerprint else None
+	# The shards must have rendered their pages just as this build would have. They are all
+	# checked before anything in the output directory (the live site) is touched.
+	template = load_template(args, assets, load_image_sizes(args, args.force, snapshot))
+	pages = check_shards(args.merge, content_path, dest_path, args.basepath, template.hash)
+	static_written = copy_static_to_public(args.clean, manifest, args.checksum, snapshot, assets, stylesheets(assets))
+	try:
+		pages_written = copy_shard_pages(pages, content_path, dest_path, args.basepath, manifest)
+		print(f"Build complete: {pages_written + static_written} files written ({pages_written} pages, {static_written} static files)")
+		if args.fingerprint:
+			write_asset_headers(args, assets)
+		if args.gzip:
+			print(precompress(dest_path, args.gzip_min_size).summary())
+	finally:
+		manifest.save()
+		snapshot.save()
+
+def watch(args, manifest, parse_cache):
+	watcher = Watcher([content_path, SRC_DIR, template_path])
+	print(f"Watching {content_path}, {SRC_DIR} and {template_path} for changes")
+	try:
+		for changed, removed in watcher.changes():
+			start = time.perf_counter()
+			try:
+				rebuild(changed, removed, args, manifest, parse_cache)
+			except (PageGenerationError, OSError, ValueError) as e:
+				# A broken page, or a file deleted (or the template missing) mid-rebuild,
+				# shouldn't stop the watcher; the next change can fix it
+				print(f"Rebuild failed: {e}")
+			else:
+				print(f"Rebuilt {len(changed) + len(removed)} changed file(s) in {(time.perf_counter() - start) * 1000:.0f} ms")
+			finally:
+				manifest.save()
+			cache = block_cache_info()
+			print(f"Block cache: {cache.hits} hits, {cache.misses} misses, {cache.currsize} blocks held")
+	except KeyboardInterrupt:
+		pass
+
+"""
+Keeps the manifest, parse caches, compiled template and a snapshot of the source tree
+warm between builds, and rebuilds whenever a client asks over the socket.
+A request without paths rebuilds whatever changed since the previous request;
+a request with paths rebuilds just those (paths that no longer exist are removed).
+Paths may be absolute or relative to this directory. A request fails if none of its
+paths are part of the site.
+"""
+def serve(args, manifest, parse_cache):
+	watcher = Watcher([content_path, SRC_DIR, template_path])
+
+	def handle_build(request):
+		if request.get("full"):
+			build(args, manifest, parse_cache)
+			watcher.poll()
+			return
+		if request.get("paths"):
+			paths = site_paths(request["paths"])
+			changed = sorted(path for path in paths if os.path.exists(path))
+			removed = sorted(paths.difference(changed))
+		else:
+			changed, removed = (sorted(paths) for paths in watcher.poll())
+		try:
+			rebuild(changed, removed, args, manifest, parse_cache)
+		finally:
+			manifest.save()
+		print(f"Rebuilt {len(changed) + len(removed)} changed file(s)")
+
+	server = BuildServer(args.socket, handle_build)
+	print(f"Build server listening on {args.socket}")
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+
+"""
+Returns the paths, relative to this directory, of the requested paths that are part of the
+site (under content or static, or the template). The others are reported and left out;
+ValueError is raised if that leaves nothing to rebuild.
+"""
+def site_paths(requested):
+	paths = set()
+	for path in requested:
+		relative = os.path.relpath(os.path.abspath(path), os.getcwd())
+		if is_within(relative, content_path) or is_within(relative, SRC_DIR) or relative == os.path.normpath(template_path):
+			paths.add(relative)
+		else:
+			print(f"Ignoring {path}: not in {content_path}, {os.path.normpath(SRC_DIR)} or {template_path}")
+	if not paths:
+		raise ValueError("none of the requested paths are part of the site")
+	return paths
+
+def rebuild(changed, removed, args, manifest, parse_cache):
+	static_changed = any(is_within(path, SRC_DIR) for path in changed + removed)
+	assets = fingerprint_assets(SRC_DIR) if args.fingerprint else None
+	images = load_image_sizes(args)
+	if static_changed:
+		copy_static_to_public(False, manifest, args.checksum, names=assets, contents=stylesheets(assets))
+
+	for path in removed:
+		if is_within(path, content_path) and path.endswith(".md"):
+			page_path = page_dest_path(path, content_path, dest_path)
+			print(f"Removing {page_path}")
+			manifest.forget(page_path)
+			try:
+				os.remove(page_path)
+			except FileNotFoundError:
+				pass
+
+	try:
+		if template_path in changed or ((args.fingerprint or args.image_sizes) and static_changed):
+			# Every page depends on the template, and on the names of fingerprinted assets
+			# and the sizes of images
+			generate_pages_recursive(content_path, load_template(args, assets, images), dest_path, args.basepath, manifest, args.jobs, parse_cache=parse_cache, pipeline_depth=pipeline_depth(args))
+		else:
+			pages = [
+				(path, page_dest_path(path, content_path, dest_path))
+				for path in changed
+				if is_within(path, content_path) and path.endswith(".md")
+			]
+			generate_pages(pages, load_template(args, assets, images), args.basepath, manifest, args.jobs, parse_cache=parse_cache, pipeline_depth=pipeline_depth(args))
+	finally:
+		if args.fingerprint:
+			write_asset_headers(args, assets)
+		# Removed pages lose their .gz too, and pages that did build get theirs
+		if args.gzip:
+			print(precompress(dest_path, args.gzip_min_size).summary())
+
+def pipeline_depth(args):
+	return args.pipeline_depth if args.pipeline else None
+
+def load_template(args, assets=None, images=None):
+	return Template.load_cached(template_path, args.basepath, args.minify, asset_urls(assets) if assets else None, images)
+
+"""
+Returns the size of every static image (see imagesize.image_sizes) if --image-sizes was
+given, otherwise None. Sizes are cached by image hash between builds.
+"""
+def load_image_sizes(args, force=False, snapshot=None):
+	if not args.image_sizes:
+		return None
+	cache = ImageSizeCache(force=force)
+	try:
+		return image_sizes(SRC_DIR, cache, snapshot)
+	finally:
+		cache.save()
+
+def stylesheets(assets):
+	return rewritten_stylesheets(SRC_DIR, assets) if assets else None
 
-	copy_static_to_public()
-	generate_pages_recursive(content_path, template_path, dest_path, basepath)
+def write_asset_headers(args, assets):
+	pages = [page_path for _, page_path in discover_pages(content_path, dest_path)]
+	if write_headers(dest_path, pages, assets, args.basepath):
+		print(f"Wrote {os.path.join(dest_path, HEADERS_FILE)}")
 
 if __name__ == "__main__":
-	main()
\ No newline at end of file
+	main()
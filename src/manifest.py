@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import secrets
+
+from text_converter import PARSER_VERSION
+
+MANIFEST_PATH = "./.cache/manifest.json"
+# Bump this whenever a change to the generator alters the html it produces,
+# so that every page recorded by an older build is regenerated.
+GENERATOR_VERSION = 1
+# Everything that versions the html a build produces. Pages recorded (or cached, or built by
+# a shard) under any other version are stale, whichever of the two was bumped.
+BUILD_VERSION = f"generator-{GENERATOR_VERSION}.parser-{PARSER_VERSION}"
+
+
+def hash_bytes(data):
+	return hashlib.sha256(data).hexdigest()
+
+def hash_file(path):
+	digest = hashlib.sha256()
+	with open(path, "rb") as file:
+		for chunk in iter(lambda: file.read(65536), b""):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+"""
+Returns a temporary path next to path, unique to this process and call, to write to before
+renaming over path. Builds running at once (such as the shards of a sharded build) can
+then never rename each other's half-written files.
+"""
+def temp_path_for(path):
+	directory, name = os.path.split(path)
+	return os.path.join(directory, f".{name}.{os.getpid()}.{secrets.token_hex(4)}.tmp")
+
+
+class BuildManifest:
+	"""
+	Docstring for BuildManifest constructor
+	parameters:
+	path: the json file used to persist the manifest between builds
+	force: if True, every page is reported as stale. The recorded pages are still loaded, so
+		outputs whose source has since been deleted are still found and removed.
+
+	The manifest records, for every generated page (keyed by its destination path),
+	the hash of the markdown source, the hash of the template, the basepath and the hash
+	of the html that was written. A page only needs to be regenerated if one of those
+	inputs has changed, or if its output is missing or has been modified since.
+	It also lists the static assets copied by the last build, so that outputs whose
+	source has been deleted can be cleaned up without touching generated pages, and the
+	static files found to match their output byte for byte although their mtimes differ
+	(see filemanager.sync_dir), so they are only compared once.
+	"""
+	def __init__(self, path=MANIFEST_PATH, force=False):
+		self.path = path
+		self.force = force
+		self.pages = {}
+		self.assets = []
+		self.verified_assets = {}
+		self.load()
+
+	def load(self):
+		try:
+			with open(self.path, "r") as file:
+				data = json.load(file)
+		except (FileNotFoundError, json.JSONDecodeError):
+			# A missing or damaged manifest just means a full rebuild
+			return
+		if data.get("version") != BUILD_VERSION:
+			return
+		self.pages = data.get("pages", {})
+		self.assets = data.get("assets", [])
+		self.verified_assets = data.get("verified_assets", {})
+
+	def save(self):
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		data = {"version": BUILD_VERSION, "pages": self.pages, "assets": self.assets, "verified_assets": self.verified_assets}
+		tmp_path = temp_path_for(self.path)
+		with open(tmp_path, "w") as file:
+			json.dump(data, file, indent=1, sort_keys=True)
+		os.replace(tmp_path, self.path)
+
+	def is_fresh(self, dest_path, source_hash, template_hash, basepath):
+		if self.force:
+			return False
+		entry = self.pages.get(dest_path)
+		if entry is None:
+			return False
+		if entry["source_hash"] != source_hash:
+			return False
+		if entry["template_hash"] != template_hash:
+			return False
+		if entry["basepath"] != basepath:
+			return False
+		try:
+			return hash_file(dest_path) == entry["output_hash"]
+		except FileNotFoundError:
+			return False
+
+	def record(self, dest_path, source_path, source_hash, template_hash, basepath, output_hash):
+		self.pages[dest_path] = {
+			"source": source_path,
+			"source_hash": source_hash,
+			"template_hash": template_hash,
+			"basepath": basepath,
+			"output_hash": output_hash,
+		}
+
+	def forget(self, dest_path):
+		self.pages.pop(dest_path, None)
@@ -0,0 +1,84 @@
+import re
+
+# Whitespace inside these elements is displayed (or executed) as written
+PRESERVE_WHITESPACE_TAGS = ("pre", "code", "textarea", "script", "style")
+# Whitespace next to these elements never renders, so it can be dropped entirely
+BLOCK_TAGS = {
+	"!doctype", "html", "head", "body", "title", "meta", "link", "base", "script", "style",
+	"article", "aside", "blockquote", "div", "dl", "dd", "dt", "figcaption", "figure", "footer",
+	"form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p",
+	"pre", "section", "table", "tbody", "td", "tfoot", "th", "thead", "tr", "ul",
+}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+# Only ASCII whitespace, as in HTML: \s would also collapse no-break and other Unicode spaces,
+# which are displayed as written
+WHITESPACE_RE = re.compile(r"[ \t\n\r\f]+")
+# Tags and comments, as (comment) or (tag, closing slash, name)
+MARKUP_RE = re.compile(r"(<!--.*?-->)|(<(/?)([!\w-]+)[^>]*>)", re.DOTALL)
+SELF_CLOSING_RE = re.compile(r"\s*/>$")
+
+"""
+Collapses every run of whitespace in a piece of text to a single space, which is how
+the browser displays it anyway
+"""
+def collapse_whitespace(text):
+	return WHITESPACE_RE.sub(" ", text)
+
+"""
+minify_html()
+inputs
+	html: a complete html document or fragment, such as a page template
+outputs
+	the same document with insignificant whitespace removed:
+	- whitespace next to block-level tags is dropped, and other runs of whitespace in text
+		are collapsed to a single space
+	- comments are dropped
+	- the redundant " />" on void elements (<meta ... />) becomes ">"
+	Everything inside <pre>, <code>, <textarea>, <script> and <style> is left exactly as written.
+"""
+def minify_html(html):
+	pieces = []
+	position = 0
+	preserving = None
+	previous_block = True
+	# Text before a comment runs on into the text after it
+	pending = ""
+	for match in MARKUP_RE.finditer(html):
+		comment, tag, closing, name = match.groups()
+		text = html[position:match.start()]
+		position = match.end()
+		if preserving is not None:
+			pieces.append(text)
+			pieces.append(match.group(0))
+			if closing and name.lower() == preserving:
+				previous_block = preserving in BLOCK_TAGS
+				preserving = None
+			continue
+		if comment is not None:
+			pending += text
+			continue
+
+		name = name.lower()
+		block = name in BLOCK_TAGS
+		pieces.append(minify_text(pending + text, previous_block, block))
+		pending = ""
+		if name in VOID_TAGS:
+			tag = SELF_CLOSING_RE.sub(">", tag)
+		pieces.append(tag)
+		if not closing and name in PRESERVE_WHITESPACE_TAGS:
+			preserving = name
+		previous_block = block
+	if preserving is not None:
+		pieces.append(html[position:])
+	else:
+		pieces.append(minify_text(pending + html[position:], previous_block, True))
+	return "".join(pieces)
+
+def minify_text(text, after_block, before_block):
+	text = collapse_whitespace(text)
+	if after_block:
+		text = text.lstrip(" ")
+	if before_block:
+		text = text.rstrip(" ")
+	return text
@@ -1,21 +1,51 @@
 from htmlnode import HTMLNode
+from minify import PRESERVE_WHITESPACE_TAGS
 
 
 class ParentNode(HTMLNode):
+	__slots__ = ()
+
 	def __init__(self, tag, children, props=None):
 		super().__init__(tag, None, children, props)
 
-	def to_html(self):
+	def to_html(self, minify=False):
+		"""
+		The same html as iter_html, built without generators: each parent joins the html of
+		its children in one list. Used wherever the whole string is wanted anyway.
+		"""
+		tag = self.tag
+		if not tag or not self.children:
+			self.check()
+		parts = [f"<{tag}{self.props_to_html()}>" if self.props else f"<{tag}>"]
+		append = parts.append
+		# Nothing inside <pre> (or <code>, ...) is minified
+		minify = minify and tag not in PRESERVE_WHITESPACE_TAGS
+		for child in self.children:
+			if child.children is None and not minify and not child.props:
+				# A leaf without props, most of the nodes in a page: what LeafNode.to_html returns
+				if not child.tag:
+					append(f"{child.value}")
+				else:
+					append(f"<{child.tag}>{child.value}</{child.tag}>")
+			else:
+				append(child.to_html(minify))
+		append(f"</{tag}>")
+		return "".join(parts)
+
+	def iter_html(self, minify=False):
+		self.check()
+		yield f"<{self.tag}{self.props_to_html()}>"
+		# Nothing inside <pre> (or <code>, ...) is minified
+		minify = minify and self.tag not in PRESERVE_WHITESPACE_TAGS
+		for child in self.children:
+			yield from child.iter_html(minify)
+		yield f"</{self.tag}>"
+
+	def check(self):
 		if not self.tag:
 			raise ValueError("Node does not have a tag.")
 		if not self.children:
 			raise ValueError("Parent node does not have children.")
-		output_string = f"<{self.tag}{self.props_to_html()}>"
-		for child in self.children:
-			output_string += child.to_html()
-		output_string += f"</{self.tag}>"
-
-		return output_string
 
 	def to_raw_text(self):
 		children_text = [child.to_raw_text() for child in self.children]
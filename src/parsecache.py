@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import time
+
+from manifest import temp_path_for
+from text_converter import PARSER_VERSION
+
+PARSE_CACHE_DIR = "./.cache/parse"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Temporary files older than this were left behind by a build that died mid-write
+STALE_TEMP_SECONDS = 3600
+
+
+class ParseCache:
+	"""
+	Docstring for ParseCache constructor
+	parameters:
+	directory: where cache entries are stored
+	max_bytes: prune() evicts the least recently used entries until the cache fits in this size
+
+	Stores the title and the rendered body html of a markdown source, keyed by the hash of the
+	source bytes, the parser version, whether the body was minified and the image sizes added
+	to it (see Template.images_hash). The body is stored before basepath rewriting, so a
+	template or basepath change can reuse it without parsing the markdown again.
+
+	Several builds may share one cache directory. Entries are written to a temporary file and
+	renamed into place, so a reader sees either a complete entry or none, and an entry that
+	disappears (or is damaged) is simply treated as a miss.
+	"""
+	def __init__(self, directory=PARSE_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+		self.directory = directory
+		self.max_bytes = max_bytes
+
+	def key(self, source_bytes, minify=False, images_hash=None):
+		digest = hashlib.sha256(f"parser-{PARSER_VERSION}\0".encode())
+		if minify:
+			# Minified bodies are cached separately from the full ones
+			digest.update(b"minify\0")
+		if images_hash:
+			digest.update(f"images-{images_hash}\0".encode())
+		digest.update(source_bytes)
+		return digest.hexdigest()
+
+	def path_for(self, key):
+		return os.path.join(self.directory, key[:2], f"{key}.json")
+
+	def get(self, key):
+		"""Returns (title, body) for key, or None on a miss"""
+		path = self.path_for(key)
+		try:
+			with open(path, "r") as file:
+				entry = json.load(file)
+			# Bump the mtime so that prune() sees this entry as recently used
+			os.utime(path)
+		except (FileNotFoundError, ValueError):
+			return None
+		return entry["title"], entry["body"]
+
+	def put(self, key, title, body):
+		path = self.path_for(key)
+		directory = os.path.dirname(path)
+		os.makedirs(directory, exist_ok=True)
+		tmp_path = temp_path_for(path)
+		try:
+			with open(tmp_path, "x") as file:
+				json.dump({"title": title, "body": body}, file)
+			os.replace(tmp_path, path)
+		except BaseException:
+			os.remove(tmp_path)
+			raise
+
+	def prune(self):
+		"""
+		Removes least recently used entries until the cache is no larger than max_bytes.
+		Returns the number of entries removed.
+		"""
+		entries = []
+		total = 0
+		now = time.time()
+		for dirpath, _, filenames in os.walk(self.directory):
+			for filename in filenames:
+				path = os.path.join(dirpath, filename)
+				try:
+					stat = os.stat(path)
+				except FileNotFoundError:
+					continue
+				# Entries are never dotfiles; temporary files (see temp_path_for) always are
+				if filename.startswith("."):
+					if now - stat.st_mtime > STALE_TEMP_SECONDS:
+						remove_quietly(path)
+					continue
+				entries.append((stat.st_mtime, stat.st_size, path))
+				total += stat.st_size
+
+		removed = 0
+		for _, size, path in sorted(entries):
+			if total <= self.max_bytes:
+				break
+			# Another build may have pruned it already
+			remove_quietly(path)
+			total -= size
+			removed += 1
+		return removed
+
+def remove_quietly(path):
+	try:
+		os.remove(path)
+	except FileNotFoundError:
+		pass
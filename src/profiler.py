@@ -0,0 +1,128 @@
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+PROFILE_PATH = "./.cache/profile.json"
+
+
+class Profiler:
+	"""
+	Docstring for Profiler constructor
+	parameters:
+	trace_memory: if True, tracemalloc is used to record the peak bytes allocated by each stage
+
+	Records timed spans as a list of event dictionaries. Every event has a name, a category
+	("page", "stage" or "build"), a start time and a duration in seconds, the process that
+	recorded it and, for stages, the page it belongs to. Pages and stages also record the net
+	number of memory blocks they allocated (and the peak bytes they allocated, when tracing
+	memory). Events recorded in worker processes can be merged in with extend().
+	"""
+	def __init__(self, trace_memory=True):
+		self.events = []
+		self.trace_memory = trace_memory
+		# The peak seen so far by every span still measuring memory, innermost last. Each span
+		# resets tracemalloc's peak, so it hands the peak up to the spans around it first.
+		self.open_peaks = []
+		self.started_tracing = False
+		if trace_memory and not tracemalloc.is_tracing():
+			tracemalloc.start()
+			self.started_tracing = True
+
+	def close(self):
+		if self.started_tracing:
+			tracemalloc.stop()
+			self.started_tracing = False
+
+	@contextlib.contextmanager
+	def span(self, name, category, page=None, measure_memory=False):
+		blocks = sys.getallocatedblocks()
+		tracing = measure_memory and self.trace_memory
+		if tracing:
+			self.fold_peak()
+			tracemalloc.reset_peak()
+			baseline = tracemalloc.get_traced_memory()[0]
+			self.open_peaks.append(baseline)
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			duration = time.perf_counter() - start
+			event = {
+				"name": name,
+				"category": category,
+				"page": page,
+				"start": start,
+				"duration": duration,
+				"pid": os.getpid(),
+			}
+			if measure_memory:
+				event["blocks"] = sys.getallocatedblocks() - blocks
+			if tracing:
+				self.fold_peak()
+				event["peak_bytes"] = self.open_peaks.pop() - baseline
+			self.events.append(event)
+
+	def fold_peak(self):
+		peak = tracemalloc.get_traced_memory()[1]
+		self.open_peaks = [max(open_peak, peak) for open_peak in self.open_peaks]
+
+	def stage(self, name, page=None):
+		return self.span(name, "stage", page, measure_memory=True)
+
+	def page(self, source_path):
+		return self.span(source_path, "page", source_path, measure_memory=True)
+
+	def extend(self, events):
+		self.events.extend(events)
+
+	def stage_totals(self):
+		"""Returns {stage name: total seconds}, slowest first"""
+		totals = {}
+		for event in self.events:
+			if event["category"] != "page":
+				totals[event["name"]] = totals.get(event["name"], 0) + event["duration"]
+		return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+	def slowest_pages(self, count=10):
+		pages = [event for event in self.events if event["category"] == "page"]
+		return sorted(pages, key=lambda event: event["duration"], reverse=True)[:count]
+
+	def summary(self, count=10):
+		lines = ["Slowest stages:"]
+		for name, total in list(self.stage_totals().items())[:count]:
+			lines.append(f"  {total * 1000:10.1f} ms  {name}")
+		lines.append("Slowest pages:")
+		for event in self.slowest_pages(count):
+			memory = f"{event['blocks']:+9d} blocks"
+			if "peak_bytes" in event:
+				memory += f"  {event['peak_bytes'] / 1024:9.1f} KB peak"
+			lines.append(f"  {event['duration'] * 1000:10.1f} ms  {memory}  {event['name']}")
+		return "\n".join(lines)
+
+	def write_trace(self, path=PROFILE_PATH):
+		"""
+		Writes the events in Chrome's trace event format, which chrome://tracing and
+		Perfetto can open. The raw events are kept under "events" for other tools.
+		"""
+		origin = min((event["start"] for event in self.events), default=0)
+		trace_events = []
+		for event in self.events:
+			args = {key: event[key] for key in ("page", "blocks", "peak_bytes") if event.get(key) is not None}
+			trace_events.append({
+				"name": event["name"],
+				"cat": event["category"],
+				"ph": "X",
+				"ts": (event["start"] - origin) * 1e6,
+				"dur": event["duration"] * 1e6,
+				"pid": event["pid"],
+				"tid": event["pid"],
+				"args": args,
+			})
+		directory = os.path.dirname(path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		with open(path, "w") as file:
+			json.dump({"traceEvents": trace_events, "events": self.events}, file)
@@ -0,0 +1,216 @@
+import json
+import os
+
+from filemanager import copy_file_atomic, discover_pages, same_contents, select_shard, write_if_changed
+from manifest import BUILD_VERSION, hash_file
+
+# Each shard of a sharded build writes its pages to SHARD_ROOT/{index}-of-{count}
+SHARD_ROOT = "./shards"
+SHARD_MANIFEST = "shard.json"
+
+
+class ShardMergeError(Exception):
+	"""
+	Docstring for ShardMergeError constructor
+	parameters:
+	problems: a list of messages, one for every missing, duplicated or damaged page or shard
+	"""
+	def __init__(self, problems):
+		self.problems = problems
+		lines = [f"Could not merge shards ({len(problems)} problem(s)):"]
+		lines.extend(f"  {problem}" for problem in problems)
+		super().__init__("\n".join(lines))
+
+"""
+Parses a shard argument such as "2/4" into (2, 4). Shards are numbered from 1.
+"""
+def parse_shard(text):
+	try:
+		index, count = (int(part) for part in text.split("/"))
+	except ValueError:
+		raise ValueError(f"expected a shard such as 1/4, got {text!r}")
+	if count < 1 or not 1 <= index <= count:
+		raise ValueError(f"shard {text} is out of range; use 1/N to N/N")
+	return index, count
+
+def shard_dir(shard, root=SHARD_ROOT):
+	index, count = shard
+	return os.path.join(root, f"{index}-of-{count}")
+
+"""
+Returns where a shard keeps one of the build's records (the manifest, the directory
+snapshot), e.g. ./.cache/manifest.json becomes ./.cache/manifest.2-of-4.json for shard 2/4.
+Shards often run at once on one machine, and each must only see its own records.
+"""
+def shard_record_path(path, shard):
+	index, count = shard
+	base, ext = os.path.splitext(path)
+	return f"{base}.{index}-of-{count}{ext}"
+
+"""
+write_shard_manifest()
+inputs
+	content_dir_path: the directory the shard's pages were discovered in
+	shard_dir_path: the directory the shard's pages were written to
+	shard: the (index, count) pair that was built
+	basepath: the url to the root of the final web page
+	manifest: the BuildManifest the shard's pages were recorded in
+outputs
+	writes SHARD_MANIFEST into shard_dir_path. It lists every page in the shard, by its path
+	relative to the shard directory, with its source and the hashes the build manifest recorded.
+"""
+def write_shard_manifest(content_dir_path, shard_dir_path, shard, basepath, manifest):
+	pages = {}
+	for source_path, dest_path in select_shard(discover_pages(content_dir_path, shard_dir_path), content_dir_path, shard):
+		entry = manifest.pages[dest_path]
+		pages[relative_key(dest_path, shard_dir_path)] = {
+			"source": relative_key(source_path, content_dir_path),
+			"source_hash": entry["source_hash"],
+			"template_hash": entry["template_hash"],
+			"output_hash": entry["output_hash"],
+		}
+	data = {
+		"version": BUILD_VERSION,
+		"shard": shard[0],
+		"count": shard[1],
+		"basepath": basepath,
+		"pages": pages,
+	}
+	# A shard can be handed no pages at all, and then nothing else has created its directory
+	os.makedirs(shard_dir_path, exist_ok=True)
+	write_if_changed(os.path.join(shard_dir_path, SHARD_MANIFEST), json.dumps(data, indent=1, sort_keys=True))
+
+def relative_key(path, root):
+	return os.path.relpath(path, root).replace(os.sep, "/")
+
+"""
+merge_shards()
+inputs
+	shard_dir_paths: the output directories of every shard of one build
+	content_dir_path: the markdown directory the shards were built from
+	dest_dir_path: the directory to merge the pages into
+	basepath: the basepath every shard must have been built with
+	manifest: an optional BuildManifest; every merged page is recorded in it, so a later
+		unsharded build can skip pages that haven't changed
+	template_hash: see check_shards
+outputs
+	the number of pages that were written (pages already identical in dest_dir_path are not)
+	raises ShardMergeError, before anything is written, if check_shards finds a problem
+"""
+def merge_shards(shard_dir_paths, content_dir_path, dest_dir_path, basepath, manifest=None, template_hash=None):
+	pages = check_shards(shard_dir_paths, content_dir_path, dest_dir_path, basepath, template_hash)
+	return copy_shard_pages(pages, content_dir_path, dest_dir_path, basepath, manifest)
+
+"""
+check_shards()
+inputs
+	shard_dir_paths, content_dir_path, dest_dir_path, basepath: as for merge_shards
+	template_hash: the hash of the Template every shard must have been built with. It covers
+		the template text and the options that change the html (--minify, --fingerprint,
+		--image-sizes). Without it, the shards only have to agree with each other.
+outputs
+	a dictionary mapping the path of every page, relative to dest_dir_path, to the shard
+	directory it is in and its entry in that shard's SHARD_MANIFEST. Pass it to
+	copy_shard_pages. Nothing is written.
+	raises ShardMergeError if a shard is missing or duplicated, the shards disagree about
+	the build, or any page is missing, duplicated, damaged or doesn't match a markdown file
+	in content_dir_path
+"""
+def check_shards(shard_dir_paths, content_dir_path, dest_dir_path, basepath, template_hash=None):
+	problems = []
+	shards = []
+	for directory in shard_dir_paths:
+		try:
+			with open(os.path.join(directory, SHARD_MANIFEST), "r") as file:
+				shards.append((directory, json.load(file)))
+		except (FileNotFoundError, json.JSONDecodeError) as e:
+			problems.append(f"{directory}: no readable {SHARD_MANIFEST} ({e})")
+	if problems:
+		raise ShardMergeError(problems)
+
+	counts = {data["count"] for _, data in shards}
+	if len(counts) > 1:
+		problems.append(f"shards disagree about the shard count: {sorted(counts)}")
+	else:
+		indexes = [data["shard"] for _, data in shards]
+		for index in range(1, counts.pop() + 1):
+			if indexes.count(index) == 0:
+				problems.append(f"shard {index} is missing")
+			elif indexes.count(index) > 1:
+				problems.append(f"shard {index} was given more than once")
+	for directory, data in shards:
+		if data["version"] != BUILD_VERSION:
+			problems.append(f"{directory}: built by version {data['version']}, not {BUILD_VERSION}")
+		if data["basepath"] != basepath:
+			problems.append(f"{directory}: built for basepath {data['basepath']}, not {basepath}")
+	problems.extend(template_problems(shards, template_hash))
+
+	expected = {
+		relative_key(dest_path, dest_dir_path): relative_key(source_path, content_dir_path)
+		for source_path, dest_path in discover_pages(content_dir_path, dest_dir_path)
+	}
+	found = {}
+	for directory, data in shards:
+		for page, entry in sorted(data["pages"].items()):
+			if page in found:
+				problems.append(f"{page} is in both {found[page][0]} and {directory}")
+				continue
+			found[page] = (directory, entry)
+			if page not in expected:
+				problems.append(f"{directory}: {page} has no source in {content_dir_path}")
+				continue
+			try:
+				intact = hash_file(os.path.join(directory, page)) == entry["output_hash"]
+			except FileNotFoundError:
+				intact = False
+			if not intact:
+				problems.append(f"{directory}: {page} is missing or damaged")
+	for page in sorted(set(expected) - set(found)):
+		problems.append(f"{page} (from {expected[page]}) is not in any shard")
+	if problems:
+		raise ShardMergeError(problems)
+	return found
+
+"""
+Copies the pages check_shards returned into dest_dir_path, recording them in manifest if
+one is given, and returns the number that were written
+"""
+def copy_shard_pages(pages, content_dir_path, dest_dir_path, basepath, manifest=None):
+	written = 0
+	for page, (directory, entry) in sorted(pages.items()):
+		src = os.path.join(directory, page)
+		dst = os.path.join(dest_dir_path, page)
+		if not (os.path.exists(dst) and same_contents(src, dst)):
+			print(f"Copying {src} to {dst}")
+			copy_file_atomic(src, dst)
+			written += 1
+		if manifest is not None:
+			source_path = os.path.join(content_dir_path, entry["source"])
+			manifest.record(dst, source_path, entry["source_hash"], entry["template_hash"], basepath, entry["output_hash"])
+	print(f"Merged shards: {written} pages written, {len(pages) - written} unchanged")
+	return written
+
+"""
+Returns a problem for every shard whose pages weren't all rendered with the same template
+and options as the other shards' (or as template_hash, when given)
+"""
+def template_problems(shards, template_hash=None):
+	used = {}
+	for directory, data in shards:
+		hashes = {entry["template_hash"] for entry in data["pages"].values()}
+		if hashes:
+			used[directory] = hashes
+	options = "template or template options (--minify, --fingerprint, --image-sizes)"
+	if template_hash is not None:
+		return [
+			f"{directory}: built with a different {options} than this merge"
+			for directory, hashes in used.items()
+			if hashes != {template_hash}
+		]
+	if len(set().union(*used.values())) > 1:
+		# Any shard could be the odd one out, so they are all listed
+		return [
+			f"{directory}: built with template {', '.join(sorted(h[:12] for h in hashes))}; the shards disagree about the {options}"
+			for directory, hashes in used.items()
+		]
+	return []
@@ -0,0 +1,134 @@
+import json
+import os
+import re
+
+from manifest import hash_bytes
+from minify import minify_html
+
+PLACEHOLDER_RE = re.compile(r"\{\{ (\w+) \}\}")
+ROOT_URL_RE = re.compile(r'(href|src)="/')
+# Captures the path of a root-relative url, without its query or fragment
+ROOT_PATH_RE = re.compile(r'(href|src)="(/[^"?#]*)')
+# (template path, basepath, minify, assets, images) -> ((mtime_ns, size), Template), see Template.load_cached
+COMPILED_TEMPLATES = {}
+
+"""
+Points every root-relative href/src attribute in a piece of html at basepath,
+e.g. href="/index.css" becomes href="{basepath}/index.css"
+assets optionally maps root-relative urls to the urls they are published under
+(see fingerprint.asset_urls), e.g. href="/index.css" becomes href="{basepath}/index.1a2b3c4d5e.css"
+"""
+def rewrite_root_urls(html, basepath, assets=None):
+	if '="/' not in html:
+		return html
+	if not assets:
+		return ROOT_URL_RE.sub(lambda match: f'{match.group(1)}="{basepath}/', html)
+	return ROOT_PATH_RE.sub(lambda match: f'{match.group(1)}="{basepath}{assets.get(match.group(2), match.group(2))}', html)
+
+
+class Template:
+	"""
+	Docstring for Template constructor
+	parameters:
+	text: the html of the template, containing placeholders such as {{ Title }} and {{ Content }}
+	basepath: the url to the root of the final web page
+	path: where the template was loaded from (used for log messages only)
+	minify: if True, insignificant whitespace is removed from the template here, and pages
+		rendered with it serialize their content minified too (see minify.py)
+	assets: an optional dictionary of asset urls to rewrite (see rewrite_root_urls)
+	images: an optional dictionary of image urls to (width, height), added to the img
+		elements of pages rendered with it (see imagesize.add_image_props)
+
+	hash identifies the template text, the minify setting, the assets and the image sizes,
+	so build records can tell when any of them has changed. images_hash identifies the image
+	sizes alone, for caches of page bodies (which don't depend on the template text).
+
+	The template is split once into literal segments and named placeholder slots.
+	Basepath rewriting is applied to the literal segments here, so rendering a page
+	only has to rewrite the values being substituted and join the pieces together.
+	"""
+	def __init__(self, text, basepath, path=None, minify=False, assets=None, images=None):
+		self.basepath = basepath
+		self.path = path
+		self.minify = minify
+		self.assets = assets
+		self.images = images
+		self.images_hash = hash_bytes(json.dumps(images, sort_keys=True).encode()) if images else None
+		if minify:
+			text = minify_html(text)
+		key = text.encode()
+		if minify:
+			key = b"minify\0" + key
+		if assets:
+			key = json.dumps(assets, sort_keys=True).encode() + b"\0" + key
+		if images:
+			key = f"images-{self.images_hash}".encode() + b"\0" + key
+		self.hash = hash_bytes(key)
+		# Even indexes hold literal html, odd indexes hold placeholder names
+		self.segments = []
+		position = 0
+		for match in PLACEHOLDER_RE.finditer(text):
+			self.segments.append(rewrite_root_urls(text[position:match.start()], basepath, assets))
+			self.segments.append(match.group(1))
+			position = match.end()
+		self.segments.append(rewrite_root_urls(text[position:], basepath, assets))
+
+	@classmethod
+	def load(cls, template_path, basepath, minify=False, assets=None, images=None):
+		with open(template_path, "r") as file:
+			return cls(file.read(), basepath, template_path, minify, assets, images)
+
+	@classmethod
+	def load_cached(cls, template_path, basepath, minify=False, assets=None, images=None):
+		"""
+		Like load, but keeps compiled templates for the life of the process and only
+		recompiles one when the file's mtime or size changes. Long-running builds
+		(watch mode, the build server) use this to avoid recompiling on every rebuild.
+		"""
+		stat = os.stat(template_path)
+		signature = (stat.st_mtime_ns, stat.st_size)
+		key = (template_path, basepath, minify, tuple(sorted(assets.items())) if assets else None, tuple(sorted(images.items())) if images else None)
+		cached = COMPILED_TEMPLATES.get(key)
+		if cached is None or cached[0] != signature:
+			cached = (signature, cls.load(template_path, basepath, minify, assets, images))
+			COMPILED_TEMPLATES[key] = cached
+		return cached[1]
+
+	def placeholders(self):
+		return self.segments[1::2]
+
+	def render(self, **values):
+		"""
+		Fills every placeholder with the value of the same name in a single pass.
+		Placeholders without a value are left in the output untouched.
+		"""
+		pieces = []
+		for index, segment in enumerate(self.segments):
+			if index % 2 == 0:
+				pieces.append(segment)
+			elif segment in values:
+				pieces.append(rewrite_root_urls(values[segment], self.basepath, self.assets))
+			else:
+				pieces.append(f"{{{{ {segment} }}}}")
+		return "".join(pieces)
+
+	def write_to(self, fp, **values):
+		"""
+		Streams the rendered page to fp. A value may be a string, or an iterable of
+		string chunks (such as HTMLNode.iter_html()) which is written as it is produced.
+		Each chunk is rewritten on its own, so an href/src attribute must not be split
+		across chunks.
+		"""
+		for index, segment in enumerate(self.segments):
+			if index % 2 == 0:
+				fp.write(segment)
+			elif segment not in values:
+				fp.write(f"{{{{ {segment} }}}}")
+			elif isinstance(values[segment], str):
+				fp.write(rewrite_root_urls(values[segment], self.basepath, self.assets))
+			else:
+				for chunk in values[segment]:
+					fp.write(rewrite_root_urls(chunk, self.basepath, self.assets))
+
+	def __repr__(self):
+		return f"Template({self.path}, basepath={self.basepath})"
@@ -0,0 +1,97 @@
+import os
+import unittest
+from unittest import mock
+
+from buildcache import BuildCache, DirectoryBackend, open_build_cache
+from filemanager import generate_pages_recursive
+from fixtures import TempDirTestCase
+from manifest import BuildManifest
+
+
+class BrokenBackend:
+	def get(self, key):
+		raise OSError("stale NFS file handle")
+
+	def put(self, key, data):
+		raise OSError("read-only file system")
+
+
+class TestBuildCache(TempDirTestCase):
+	def setUp(self):
+		super().setUp()
+		self.content = os.path.join(self.tmp.name, "content")
+		self.cache_dir = os.path.join(self.tmp.name, "cache")
+		self.template = self.write("template.html", '<title>{{ Title }}</title><link href="/index.css"><main>{{ Content }}</main>')
+		self.write("content/index.md", "# Home\n\nWelcome")
+		self.write("content/blog/a.md", "# A\n\nFirst post")
+
+	def build(self, checkout, basepath="/", cache=None):
+		dest = os.path.join(self.tmp.name, checkout)
+		cache = cache or open_build_cache(self.cache_dir)
+		manifest = BuildManifest(os.path.join(self.tmp.name, f"{checkout}.json"))
+		generate_pages_recursive(self.content, self.template, dest, basepath, manifest, build_cache=cache)
+		manifest.save()
+		return dest, cache, manifest
+
+	def read(self, path):
+		with open(path) as file:
+			return file.read()
+
+	def test_page_key(self):
+		cache = BuildCache(DirectoryBackend(self.cache_dir))
+		key = cache.page_key("source", "template", "/")
+		self.assertEqual(key, cache.page_key("source", "template", "/"))
+		self.assertNotEqual(key, cache.page_key("source", "template", "/site"))
+		self.assertNotEqual(key, cache.page_key("source", "other", "/"))
+		self.assertNotEqual(key, cache.page_key("other", "template", "/"))
+		with mock.patch("buildcache.BUILD_VERSION", "generator-1.parser-999"):
+			self.assertNotEqual(key, cache.page_key("source", "template", "/"))
+
+	def test_second_checkout_fetches(self):
+		first, cache, _ = self.build("first")
+		self.assertEqual((cache.hits, cache.misses, cache.stores), (0, 2, 2))
+		second, cache, manifest = self.build("second")
+		self.assertEqual((cache.hits, cache.misses, cache.stores), (2, 0, 0))
+		for page in ("index.html", os.path.join("blog", "a.html")):
+			self.assertEqual(self.read(os.path.join(second, page)), self.read(os.path.join(first, page)))
+		# Fetched pages are recorded, so the next build of this checkout skips them
+		self.assertTrue(all(entry["output_hash"] for entry in manifest.pages.values()))
+		_, cache, _ = self.build("second")
+		self.assertEqual(cache.hits + cache.misses, 0)
+
+	def test_basepath_is_part_of_the_key(self):
+		self.build("first", "/")
+		dest, cache, _ = self.build("second", "/site")
+		self.assertEqual(cache.hits, 0)
+		self.assertIn('href="/site/index.css"', self.read(os.path.join(dest, "index.html")))
+
+	def test_url_location(self):
+		self.build("first")
+		_, cache, _ = self.build("second", cache=open_build_cache("file://" + self.cache_dir))
+		self.assertEqual(cache.hits, 2)
+		with self.assertRaises(ValueError):
+			open_build_cache("s3://bucket/cache")
+
+	def test_broken_backend_never_fails_the_build(self):
+		dest, cache, _ = self.build("first", cache=BuildCache(BrokenBackend()))
+		self.assertEqual((cache.hits, cache.misses, cache.stores), (0, 2, 0))
+		self.assertIn("<title>Home</title>", self.read(os.path.join(dest, "index.html")))
+
+	def test_no_temporary_files(self):
+		self.build("first")
+		for dirpath, _, filenames in os.walk(self.cache_dir):
+			self.assertFalse([name for name in filenames if name.endswith(".tmp")])
+
+	def test_entries_follow_umask(self):
+		umask = os.umask(0o022)
+		try:
+			self.build("first")
+		finally:
+			os.umask(umask)
+		for dirpath, _, filenames in os.walk(self.cache_dir):
+			for name in filenames:
+				self.assertEqual(os.stat(os.path.join(dirpath, name)).st_mode & 0o777, 0o644)
+
+
+if __name__ == "__main__":
+	unittest.main()
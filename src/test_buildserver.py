@@ -0,0 +1,81 @@
+import errno
+import io
+import os
+import threading
+import unittest
+
+from buildserver import BuildServer, request_build
+from fixtures import TempDirTestCase
+
+
+class TestBuildServer(TempDirTestCase):
+	def setUp(self):
+		super().setUp()
+		self.socket_path = os.path.join(self.tmp.name, "build.sock")
+		self.requests = []
+		self.server = BuildServer(self.socket_path, self.build)
+		self.thread = threading.Thread(target=self.server.serve_forever)
+		self.thread.start()
+
+	def tearDown(self):
+		self.stop()
+
+	def stop(self):
+		if self.thread.is_alive():
+			self.server.shutdown()
+			self.thread.join()
+			self.server.server_close()
+
+	def build(self, request):
+		self.requests.append(request)
+		if request.get("paths") == ["broken.md"]:
+			raise ValueError("invalid markdown")
+		print("Generating page from content/index.md")
+		print("Pages: 1 written", end="")
+
+	def test_streams_progress(self):
+		out = io.StringIO()
+		request = {"command": "build", "paths": [], "full": False}
+		self.assertTrue(request_build(self.socket_path, request, out))
+		self.assertEqual(self.requests, [request])
+		self.assertEqual(out.getvalue(), "Generating page from content/index.md\nPages: 1 written\n")
+
+	def test_reports_failure(self):
+		out = io.StringIO()
+		request = {"command": "build", "paths": ["broken.md"], "full": False}
+		self.assertFalse(request_build(self.socket_path, request, out))
+		self.assertEqual(out.getvalue(), "ValueError: invalid markdown\n")
+
+	def test_stays_up_between_builds(self):
+		request = {"command": "build", "paths": [], "full": True}
+		for _ in range(3):
+			self.assertTrue(request_build(self.socket_path, request, io.StringIO()))
+		self.assertEqual(len(self.requests), 3)
+
+	def test_shutdown_request(self):
+		self.assertTrue(request_build(self.socket_path, {"command": "shutdown"}, io.StringIO()))
+		self.thread.join(timeout=5)
+		self.assertFalse(self.thread.is_alive())
+		self.server.server_close()
+		self.assertFalse(os.path.exists(self.socket_path))
+		self.assertEqual(self.requests, [])
+
+	def test_replaces_stale_socket(self):
+		self.stop()
+		with open(self.socket_path, "w"):
+			pass
+		self.server = BuildServer(self.socket_path, self.build)
+		self.thread = threading.Thread(target=self.server.serve_forever)
+		self.thread.start()
+		self.assertTrue(request_build(self.socket_path, {"command": "build"}, io.StringIO()))
+
+	def test_live_socket_is_not_replaced(self):
+		with self.assertRaises(OSError) as raised:
+			BuildServer(self.socket_path, self.build)
+		self.assertEqual(raised.exception.errno, errno.EADDRINUSE)
+		# The running server keeps its socket
+		self.assertTrue(request_build(self.socket_path, {"command": "build"}, io.StringIO()))
+
+
+if __name__ == "__main__":
+	unittest.main()
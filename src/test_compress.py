@@ -0,0 +1,64 @@
+import gzip
+import os
+import unittest
+
+from compress import precompress
+from fixtures import TempDirTestCase
+
+
+class TestCompress(TempDirTestCase):
+	def setUp(self):
+		super().setUp()
+		self.root = self.tmp.name
+		self.page = self.write("blog/index.html", "<p>Hey dol! merry dol!</p>\n" * 200)
+		self.css = self.write("index.css", "body { margin: 0; }\n" * 100)
+		self.small = self.write("small.js", "let x = 1;")
+		self.image = self.write("images/tom.png", "not text" * 500)
+
+	def test_writes_gzip_siblings(self):
+		stats = precompress(self.root, min_size=1024, threads=2)
+		self.assertEqual(stats.compressed, 2)
+		for path in (self.page, self.css):
+			with open(path, "rb") as original, gzip.open(path + ".gz", "rb") as compressed:
+				self.assertEqual(compressed.read(), original.read())
+		self.assertFalse(os.path.exists(self.small + ".gz"))
+		self.assertFalse(os.path.exists(self.image + ".gz"))
+		expected = sum(os.path.getsize(p) - os.path.getsize(p + ".gz") for p in (self.page, self.css))
+		self.assertEqual(stats.saved(), expected)
+
+	def test_unchanged_files_not_recompressed(self):
+		precompress(self.root)
+		before = os.stat(self.css + ".gz").st_ino
+		stats = precompress(self.root)
+		self.assertEqual((stats.compressed, stats.unchanged), (0, 2))
+		self.assertEqual(os.stat(self.css + ".gz").st_ino, before)
+
+		self.write("index.css", "body { margin: 1em; }\n" * 100)
+		os.utime(self.css, ns=(0, 0))
+		stats = precompress(self.root)
+		self.assertEqual((stats.compressed, stats.unchanged), (1, 1))
+		with gzip.open(self.css + ".gz", "rt") as compressed:
+			self.assertIn("1em", compressed.read())
+
+	def test_removes_orphans(self):
+		precompress(self.root)
+		os.remove(self.page)
+		stats = precompress(self.root)
+		self.assertEqual(stats.removed, 1)
+		self.assertFalse(os.path.exists(self.page + ".gz"))
+		# Raising the threshold drops the .gz of files now below it
+		self.assertEqual(precompress(self.root, min_size=10 ** 6).removed, 1)
+		self.assertFalse(os.path.exists(self.css + ".gz"))
+
+	def test_output_is_deterministic(self):
+		precompress(self.root)
+		with open(self.page + ".gz", "rb") as file:
+			first = file.read()
+		os.remove(self.page + ".gz")
+		precompress(self.root)
+		with open(self.page + ".gz", "rb") as file:
+			self.assertEqual(file.read(), first)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,85 @@
+import os
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+from devserver import DevRequestHandler, DevServer, PageRenderer
+from fixtures import TempDirTestCase
+
+
+class TestDevServer(TempDirTestCase):
+	def setUp(self):
+		super().setUp()
+		self.root = self.tmp.name
+		self.content = os.path.join(self.root, "content")
+		self.static = os.path.join(self.root, "static")
+		self.write("content/index.md", "# Home\n\n[Tom](/blog/tom)")
+		self.write("content/blog/tom/index.md", "# Tom\n\nHey dol!")
+		self.write("content/about.md", "# About")
+		self.write("static/index.css", "body {}")
+		self.template_path = self.write("template.html", '<link href="/index.css"><title>{{ Title }}</title>{{ Content }}')
+
+		# Keep the request log out of the test output
+		patcher = mock.patch.object(DevRequestHandler, "log_message")
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+		self.renderer = PageRenderer(self.content, self.template_path)
+		self.server = DevServer(("127.0.0.1", 0), self.renderer, self.static)
+		self.thread = threading.Thread(target=self.server.serve_forever)
+		self.thread.start()
+		self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+	def tearDown(self):
+		self.server.shutdown()
+		self.thread.join()
+		self.server.server_close()
+
+	def get(self, path):
+		with urllib.request.urlopen(self.url + path) as response:
+			return response.read().decode()
+
+	def test_renders_pages(self):
+		self.assertEqual(self.get("/"), '<link href="/index.css"><title>Home</title><div><h1>Home</h1><p><a href="/blog/tom">Tom</a></p></div>')
+		self.assertEqual(self.get("/blog/tom/"), '<link href="/index.css"><title>Tom</title><div><h1>Tom</h1><p>Hey dol!</p></div>')
+		self.assertEqual(self.get("/about.html"), self.get("/about"))
+
+	def test_redirects_directories(self):
+		# urllib follows the redirect to /blog/tom/
+		self.assertIn("<title>Tom</title>", self.get("/blog/tom"))
+
+	def test_serves_static_files(self):
+		self.assertEqual(self.get("/index.css"), "body {}")
+		with self.assertRaises(urllib.error.HTTPError) as raised:
+			self.get("/missing.css")
+		self.assertEqual(raised.exception.code, 404)
+
+	def test_rejects_paths_outside_content(self):
+		self.assertEqual(self.renderer.source_for("/../template.html"), (None, None))
+
+	def test_caches_until_source_changes(self):
+		self.get("/about")
+		self.get("/about")
+		self.assertEqual(self.renderer.renders, 1)
+		self.write("content/about.md", "# About us")
+		os.utime(os.path.join(self.content, "about.md"), ns=(0, 0))
+		self.assertIn("<title>About us</title>", self.get("/about"))
+		self.assertEqual(self.renderer.renders, 2)
+
+	def test_template_change_rerenders(self):
+		self.get("/about")
+		self.write("template.html", "<h1>{{ Title }}</h1>")
+		os.utime(self.template_path, ns=(0, 0))
+		self.assertEqual(self.get("/about"), "<h1>About</h1>")
+
+	def test_render_error(self):
+		self.write("content/about.md", "no title here")
+		with self.assertRaises(urllib.error.HTTPError) as raised:
+			self.get("/about")
+		self.assertEqual(raised.exception.code, 500)
+
+
+if __name__ == "__main__":
+	unittest.main()
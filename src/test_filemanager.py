@@ -0,0 +1,170 @@
+import os
+import unittest
+from unittest import mock
+
+from filemanager import PageGenerationError, discover_pages, generate_pages_pipelined, generate_pages_recursive, same_contents, sync_dir, write_if_changed
+from fixtures import TempDirTestCase
+from manifest import BuildManifest
+from template import Template
+
+
+class TestFileManager(TempDirTestCase):
+	def setUp(self):
+		super().setUp()
+		self.content = os.path.join(self.tmp.name, "content")
+		self.dest = os.path.join(self.tmp.name, "docs")
+		self.template = self.write("template.html", '<title>{{ Title }}</title><link href="/index.css"><main>{{ Content }}</main>')
+		self.write("content/index.md", "# Home\n\nWelcome to the [blog](/blog)")
+		self.write("content/blog/b.md", "# B\n\nSecond post")
+		self.write("content/blog/a.md", "# A\n\nFirst post")
+		self.write("content/notes.txt", "not markdown")
+
+	def read_dest(self, relative_path):
+		with open(os.path.join(self.dest, relative_path)) as file:
+			return file.read()
+
+	def test_discover_pages_sorted(self):
+		pages = discover_pages(self.content, self.dest)
+		sources = [os.path.relpath(source, self.content) for source, _ in pages]
+		self.assertEqual(sources, [os.path.join("blog", "a.md"), os.path.join("blog", "b.md"), "index.md"])
+		self.assertEqual(pages[2][1], os.path.join(self.dest, "index.html"))
+
+	def test_generate_pages(self):
+		generate_pages_recursive(self.content, self.template, self.dest, "/site")
+		html = self.read_dest("index.html")
+		self.assertIn("<title>Home</title>", html)
+		self.assertIn('href="/site/index.css"', html)
+		self.assertIn('<a href="/site/blog">blog</a>', html)
+		self.assertIn("<p>First post</p>", self.read_dest(os.path.join("blog", "a.html")))
+
+	def test_parallel_matches_sequential(self):
+		generate_pages_recursive(self.content, self.template, self.dest, "/site")
+		sequential = [self.read_dest(p) for p in ("index.html", "blog/a.html", "blog/b.html")]
+		generate_pages_recursive(self.content, self.template, self.dest, "/site", jobs=2)
+		parallel = [self.read_dest(p) for p in ("index.html", "blog/a.html", "blog/b.html")]
+		self.assertEqual(sequential, parallel)
+
+	def test_failures_name_source(self):
+		self.write("content/broken.md", "no title here")
+		with self.assertRaises(PageGenerationError) as context:
+			generate_pages_recursive(self.content, self.template, self.dest, "/", jobs=2)
+		failed = [source for source, _ in context.exception.failures]
+		self.assertEqual(failed, [os.path.join(self.content, "broken.md")])
+		# The other pages still build
+		self.assertIn("<title>B</title>", self.read_dest(os.path.join("blog", "b.html")))
+
+	def test_pipeline_matches_sequential(self):
+		pages = ("index.html", "blog/a.html", "blog/b.html")
+		generate_pages_recursive(self.content, self.template, self.dest, "/site")
+		sequential = [self.read_dest(p) for p in pages]
+		for jobs in (1, 2):
+			os.remove(os.path.join(self.dest, "index.html"))
+			self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, "/site", jobs=jobs, pipeline_depth=1), 1)
+			self.assertEqual([self.read_dest(p) for p in pages], sequential)
+
+	def test_pipeline_results_in_order(self):
+		self.write("content/broken.md", "no title here")
+		template = Template.load(self.template, "/")
+		sources = ["broken.md", "index.md", "missing.md", os.path.join("blog", "a.md")]
+		page_jobs = [
+			(os.path.join(self.content, source), template, os.path.join(self.dest, f"{i}.html"), "/", None)
+			for i, source in enumerate(sources)
+		]
+		results = generate_pages_pipelined(page_jobs, depth=1)
+		errors = [error for _, error, _, _ in results]
+		self.assertTrue(errors[0].startswith("ValueError"))
+		self.assertTrue(errors[2].startswith("FileNotFoundError"))
+		self.assertEqual((errors[1], errors[3]), (None, None))
+		self.assertEqual([changed for _, _, _, changed in results], [False, True, False, True])
+		self.assertTrue(results[1][0].startswith(f"Generating page from {page_jobs[1][0]}"))
+
+	def test_unchanged_pages_not_rewritten(self):
+		self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, "/"), 3)
+		index = os.path.join(self.dest, "index.html")
+		os.utime(index, ns=(0, 0))
+		self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, "/"), 0)
+		self.assertEqual(os.stat(index).st_mtime_ns, 0)
+		self.write("content/index.md", "# Home\n\nEdited")
+		self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, "/"), 1)
+		self.assertNotEqual(os.stat(index).st_mtime_ns, 0)
+		# No temporary files are left behind
+		self.assertEqual(sorted(os.listdir(self.dest)), ["blog", "index.html"])
+
+	def test_deleted_pages_removed(self):
+		manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"))
+		self.write("content/old/page.md", "# Old\n\nGone soon")
+		generate_pages_recursive(self.content, self.template, self.dest, "/", manifest)
+		old_page = os.path.join(self.dest, "old", "page.html")
+		self.assertTrue(os.path.exists(old_page))
+
+		os.remove(os.path.join(self.content, "old", "page.md"))
+		self.assertEqual(generate_pages_recursive(self.content, self.template, self.dest, "/", manifest), 0)
+		self.assertFalse(os.path.exists(os.path.dirname(old_page)))
+		self.assertNotIn(old_page, manifest.pages)
+		self.assertEqual(sorted(os.listdir(self.dest)), ["blog", "index.html"])
+
+	def test_deleted_pages_removed_by_forced_build(self):
+		manifest_path = os.path.join(self.tmp.name, "manifest.json")
+		manifest = BuildManifest(manifest_path)
+		self.write("content/temp.md", "# Temp")
+		generate_pages_recursive(self.content, self.template, self.dest, "/", manifest)
+		manifest.save()
+
+		os.remove(os.path.join(self.content, "temp.md"))
+		generate_pages_recursive(self.content, self.template, self.dest, "/", BuildManifest(manifest_path, force=True))
+		self.assertFalse(os.path.exists(os.path.join(self.dest, "temp.html")))
+
+	def test_write_if_changed(self):
+		path = os.path.join(self.tmp.name, "out.txt")
+		self.assertTrue(write_if_changed(path, "one"))
+		self.assertFalse(write_if_changed(path, "one"))
+		self.assertTrue(write_if_changed(path, "two"))
+		with open(path) as file:
+			self.assertEqual(file.read(), "two")
+
+	def test_sync_dir(self):
+		static = os.path.join(self.tmp.name, "static")
+		for name, text in (("index.css", "body {}"), ("images/a.png", "png"), ("old.js", "js")):
+			self.write(os.path.join("static", name), text)
+		generate_pages_recursive(self.content, self.template, self.dest, "/")
+
+		assets, copied, removed = sync_dir(static, self.dest)
+		self.assertEqual(assets, [os.path.join("images", "a.png"), "index.css", "old.js"])
+		self.assertEqual((copied, removed), (3, 0))
+		css_mtime = os.stat(os.path.join(self.dest, "index.css")).st_mtime_ns
+
+		# Nothing changed, so nothing is copied and mtimes are untouched
+		self.assertEqual(sync_dir(static, self.dest, assets)[1:], (0, 0))
+		self.assertEqual(sync_dir(static, self.dest, assets, use_hash=True)[1:], (0, 0))
+		self.assertEqual(os.stat(os.path.join(self.dest, "index.css")).st_mtime_ns, css_mtime)
+
+		# A deleted source removes only its own output; generated pages stay
+		os.remove(os.path.join(static, "old.js"))
+		self.write("static/index.css", "body { margin: 0 }")
+		assets, copied, removed = sync_dir(static, self.dest, assets)
+		self.assertEqual((copied, removed), (1, 1))
+		self.assertFalse(os.path.exists(os.path.join(self.dest, "old.js")))
+		self.assertTrue(os.path.exists(os.path.join(self.dest, "index.html")))
+
+	def test_sync_dir_compares_bytes_once(self):
+		static = os.path.join(self.tmp.name, "static")
+		src = self.write("static/images/a.png", "png")
+		dst = self.write("docs/images/a.png", "png")
+		# Same bytes, different mtimes, as after a fresh clone
+		os.utime(src, ns=(10**18, 10**18))
+		os.utime(dst, ns=(2 * 10**18, 2 * 10**18))
+		verified = {}
+		with mock.patch("filemanager.same_contents", wraps=same_contents) as compare:
+			self.assertEqual(sync_dir(static, self.dest, verified=verified)[1:], (0, 0))
+			self.assertEqual(sync_dir(static, self.dest, verified=verified)[1:], (0, 0))
+		self.assertEqual(compare.call_count, 1)
+		self.assertEqual(os.stat(dst).st_mtime_ns, 2 * 10**18)
+
+		# A changed source is compared (and copied) again
+		self.write("static/images/a.png", "PNG")
+		self.assertEqual(sync_dir(static, self.dest, verified=verified)[1:], (1, 0))
+		self.assertEqual(verified, {})
+
+
+if __name__ == "__main__":
+	unittest.main()
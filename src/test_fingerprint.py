@@ -0,0 +1,119 @@
+import os
+import unittest
+
+from filemanager import generate_pages_recursive, sync_dir
+from fingerprint import IMMUTABLE, REVALIDATE, asset_urls, fingerprint_assets, fingerprinted_path, rewrite_stylesheet, rewritten_stylesheets, write_headers
+from fixtures import TempDirTestCase
+from manifest import hash_bytes, hash_file
+from template import Template, rewrite_root_urls
+
+
+class TestFingerprint(TempDirTestCase):
+	def setUp(self):
+		super().setUp()
+		self.static = os.path.join(self.tmp.name, "static")
+		self.content = os.path.join(self.tmp.name, "content")
+		self.dest = os.path.join(self.tmp.name, "docs")
+		self.write("static/index.css", "body { margin: 0 }")
+		self.write("static/images/tom.png", "png bytes")
+		self.write("static/robots.txt", "User-agent: *")
+		self.write("content/index.md", "# Home\n\n![Tom](/images/tom.png) [robots](/robots.txt)")
+		self.template_text = '<link href="/index.css"><title>{{ Title }}</title>{{ Content }}'
+
+	def test_fingerprinted_path(self):
+		self.assertEqual(fingerprinted_path(os.path.join("images", "tom.png"), "0123456789abcdef"), os.path.join("images", "tom.0123456789.png"))
+
+	def test_fingerprint_assets(self):
+		assets = fingerprint_assets(self.static)
+		css_hash = hash_file(os.path.join(self.static, "index.css"))
+		self.assertEqual(assets["index.css"], f"index.{css_hash[:10]}.css")
+		self.assertIn(os.path.join("images", "tom.png"), assets)
+		# Files fetched by well-known names keep them
+		self.assertNotIn("robots.txt", assets)
+
+	def test_rewrite_root_urls(self):
+		assets = {"/index.css": "/index.abc.css"}
+		html = '<link href="/index.css"><link href="/index.css?v=2"><a href="/blog">blog</a>'
+		expected = '<link href="/site/index.abc.css"><link href="/site/index.abc.css?v=2"><a href="/site/blog">blog</a>'
+		self.assertEqual(rewrite_root_urls(html, "/site", assets), expected)
+
+	def test_build_with_fingerprints(self):
+		assets = fingerprint_assets(self.static)
+		published, _, _ = sync_dir(self.static, self.dest, names=assets)
+		self.assertEqual(sorted(published), sorted(list(assets.values()) + ["robots.txt"]))
+		template = Template(self.template_text, "/site", assets=asset_urls(assets))
+		self.assertNotEqual(template.hash, Template(self.template_text, "/site").hash)
+		self.assertIn(f'href="/site/{assets["index.css"]}"', template.segments[0])
+
+		generate_pages_recursive(self.content, template, self.dest, "/site")
+		with open(os.path.join(self.dest, "index.html")) as file:
+			html = file.read()
+		self.assertIn(f'src="/site/{assets[os.path.join("images", "tom.png")].replace(os.sep, "/")}"', html)
+		self.assertIn('href="/site/robots.txt"', html)
+
+		# A changed asset gets a new name, and the old one is removed
+		self.write("static/index.css", "body { margin: 1em }")
+		new_assets = fingerprint_assets(self.static)
+		self.assertNotEqual(new_assets["index.css"], assets["index.css"])
+		_, copied, removed = sync_dir(self.static, self.dest, published, names=new_assets)
+		self.assertEqual((copied, removed), (1, 1))
+		self.assertFalse(os.path.exists(os.path.join(self.dest, assets["index.css"])))
+
+	def test_rewrite_stylesheet(self):
+		assets = {
+			os.path.join("fonts", "a.woff2"): os.path.join("fonts", "a.123.woff2"),
+			os.path.join("images", "bg.png"): os.path.join("images", "bg.456.png"),
+		}
+		css = (
+			"@font-face { src: url('../fonts/a.woff2?v=1#x') format('woff2'), url(../fonts/a.ttf) }\n"
+			"body { background: url( \"/images/bg.png\" ), url(data:image/png;base64,AAAA), url(https://example.com/bg.png) }"
+		)
+		expected = (
+			"@font-face { src: url('../fonts/a.123.woff2?v=1#x') format('woff2'), url(../fonts/a.ttf) }\n"
+			"body { background: url( \"/images/bg.456.png\" ), url(data:image/png;base64,AAAA), url(https://example.com/bg.png) }"
+		)
+		self.assertEqual(rewrite_stylesheet(css, os.path.join("css", "site.css"), assets), expected)
+
+	def test_stylesheet_references_are_published(self):
+		self.write("static/fonts/body.woff2", "font bytes")
+		self.write("static/theme.css", "body { font-family: Body; background: url(images/tom.png) }")
+		self.write("static/index.css", '@import "theme.css";\n@font-face { font-family: Body; src: url(/fonts/body.woff2) }')
+		assets = fingerprint_assets(self.static)
+		contents = rewritten_stylesheets(self.static, assets)
+		published, _, _ = sync_dir(self.static, self.dest, names=assets, contents=contents)
+
+		with open(os.path.join(self.dest, assets["index.css"])) as file:
+			index_css = file.read()
+		self.assertIn(f'@import "{assets["theme.css"]}"', index_css)
+		self.assertIn(f'url(/{assets[os.path.join("fonts", "body.woff2")].replace(os.sep, "/")})', index_css)
+		# Every stylesheet is named by the hash of what is published
+		for rel_path in ("index.css", "theme.css"):
+			with open(os.path.join(self.dest, assets[rel_path]), "rb") as file:
+				self.assertEqual(assets[rel_path], fingerprinted_path(rel_path, hash_bytes(file.read())))
+
+		# A changed font renames the stylesheet that uses it, but not the one that doesn't
+		self.write("static/fonts/body.woff2", "new font bytes")
+		new_assets = fingerprint_assets(self.static)
+		self.assertNotEqual(new_assets["index.css"], assets["index.css"])
+		self.assertEqual(new_assets["theme.css"], assets["theme.css"])
+		_, copied, _ = sync_dir(self.static, self.dest, published, names=new_assets, contents=rewritten_stylesheets(self.static, new_assets))
+		self.assertEqual(copied, 2)
+
+	def test_write_headers(self):
+		assets = {"index.css": "index.abc.css"}
+		pages = [os.path.join(self.dest, "index.html"), os.path.join(self.dest, "blog", "post.html")]
+		os.makedirs(self.dest)
+		self.assertTrue(write_headers(self.dest, pages, assets, "https://example.com/site/"))
+		self.assertFalse(write_headers(self.dest, pages, assets, "https://example.com/site/"))
+		with open(os.path.join(self.dest, "_headers")) as file:
+			lines = file.read().splitlines()
+		self.assertEqual(lines, [
+			"/site/index.abc.css", f"  Cache-Control: {IMMUTABLE}",
+			"/site/blog/post.html", f"  Cache-Control: {REVALIDATE}",
+			"/site/", f"  Cache-Control: {REVALIDATE}",
+			"/site/index.html", f"  Cache-Control: {REVALIDATE}",
+		])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,183 @@
+import io
+import os
+import struct
+import unittest
+from unittest import mock
+
+import imagesize
+from filemanager import generate_pages_recursive
+from fixtures import TempDirTestCase
+from imagesize import ImageSizeCache, add_image_props, image_size, image_sizes
+from leafnode import LeafNode
+from parentnode import ParentNode
+from parsecache import ParseCache
+from template import Template
+
+def png(width, height):
+	return b"\x89PNG\r\n\x1a\n" + struct.pack(">I4sII", 13, b"IHDR", width, height) + b"\x08\x06\x00\x00\x00" + b"pixels"
+
+def jpeg(width, height, orientation=None):
+	data = b"\xff\xd8"
+	if orientation is not None:
+		tiff = b"MM\x00\x2a" + struct.pack(">I", 8) + struct.pack(">H", 1) + struct.pack(">HHIHH", 0x0112, 3, 1, orientation, 0) + struct.pack(">I", 0)
+		exif = b"Exif\0\0" + tiff
+		data += b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+	data += b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0" + bytes(9)
+	frame = struct.pack(">BHHB", 8, height, width, 3) + bytes(9)
+	data += b"\xff\xc0" + struct.pack(">H", len(frame) + 2) + frame
+	return data + b"\xff\xda" + b"scan data"
+
+def webp(chunk, payload):
+	body = b"WEBP" + chunk + struct.pack("<I", len(payload)) + payload
+	return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+class TestImageSize(unittest.TestCase):
+	def size(self, data):
+		return image_size(io.BytesIO(data))
+
+	def test_png(self):
+		self.assertEqual(self.size(png(640, 480)), (640, 480))
+
+	def test_gif(self):
+		self.assertEqual(self.size(b"GIF89a" + struct.pack("<HH", 300, 200) + bytes(20)), (300, 200))
+
+	def test_jpeg(self):
+		self.assertEqual(self.size(jpeg(1024, 768)), (1024, 768))
+
+	def test_jpeg_exif_orientation(self):
+		self.assertEqual(self.size(jpeg(1024, 768, orientation=1)), (1024, 768))
+		# Rotated 90 degrees: displayed as portrait
+		self.assertEqual(self.size(jpeg(1024, 768, orientation=6)), (768, 1024))
+
+	def test_webp_lossy(self):
+		payload = b"\x00\x00\x00" + b"\x9d\x01\x2a" + struct.pack("<HH", 400, 300) + bytes(10)
+		self.assertEqual(self.size(webp(b"VP8 ", payload)), (400, 300))
+
+	def test_webp_lossless(self):
+		bits = (400 - 1) | ((300 - 1) << 14)
+		payload = b"\x2f" + struct.pack("<I", bits) + bytes(10)
+		self.assertEqual(self.size(webp(b"VP8L", payload)), (400, 300))
+
+	def test_webp_extended(self):
+		payload = bytes(4) + (4000 - 1).to_bytes(3, "little") + (3000 - 1).to_bytes(3, "little")
+		self.assertEqual(self.size(webp(b"VP8X", payload)), (4000, 3000))
+
+	def test_not_an_image(self):
+		self.assertIsNone(self.size(b"<svg></svg>"))
+		self.assertIsNone(self.size(b""))
+
+	def test_damaged_header(self):
+		self.assertIsNone(self.size(png(640, 480)[:20]))
+		self.assertIsNone(self.size(jpeg(1024, 768)[:26]))
+
+
+class TestImageSizeCache(TempDirTestCase):
+	def setUp(self):
+		super().setUp()
+		self.static = os.path.join(self.tmp.name, "static")
+		self.cache_path = os.path.join(self.tmp.name, "images.json")
+		self.write("static/images/tom.png", png(640, 480))
+		self.write("static/images/copy.png", png(640, 480))
+		self.write("static/photo.JPG", jpeg(1024, 768))
+		self.write("static/index.css", b"body { margin: 0 }")
+
+	def write(self, relative_path, data, age=60):
+		path = super().write(relative_path, data)
+		# Old enough that the cache may remember it by its mtime
+		mtime = os.stat(path).st_mtime - age
+		os.utime(path, (mtime, mtime))
+		return path
+
+	def test_image_sizes(self):
+		sizes = image_sizes(self.static)
+		self.assertEqual(sizes, {
+			"/images/copy.png": (640, 480),
+			"/images/tom.png": (640, 480),
+			"/photo.JPG": (1024, 768),
+		})
+
+	def test_unchanged_images_are_not_read(self):
+		cache = ImageSizeCache(self.cache_path)
+		first = image_sizes(self.static, cache)
+		cache.save()
+		with mock.patch.object(imagesize, "hash_file") as hash_file, mock.patch.object(imagesize, "image_size") as read_size:
+			self.assertEqual(image_sizes(self.static, ImageSizeCache(self.cache_path)), first)
+		hash_file.assert_not_called()
+		read_size.assert_not_called()
+
+	def test_sizes_are_shared_by_hash(self):
+		cache = ImageSizeCache(self.cache_path)
+		with mock.patch.object(imagesize, "image_size", wraps=image_size) as read_size:
+			image_sizes(self.static, cache)
+		# tom.png and copy.png have the same contents
+		self.assertEqual(read_size.call_count, 2)
+
+	def test_changed_image_is_read_again(self):
+		cache = ImageSizeCache(self.cache_path)
+		image_sizes(self.static, cache)
+		cache.save()
+		self.write("static/images/tom.png", png(320, 240), age=30)
+		sizes = image_sizes(self.static, ImageSizeCache(self.cache_path))
+		self.assertEqual(sizes["/images/tom.png"], (320, 240))
+		self.assertEqual(sizes["/images/copy.png"], (640, 480))
+
+	def test_force_ignores_saved_cache(self):
+		cache = ImageSizeCache(self.cache_path)
+		image_sizes(self.static, cache)
+		cache.save()
+		self.assertEqual(ImageSizeCache(self.cache_path, force=True).files, {})
+
+
+class TestAddImageProps(unittest.TestCase):
+	def test_adds_size_and_lazy_loading(self):
+		image = LeafNode("img", "", {"src": "/images/tom.png", "alt": "Tom"})
+		tree = ParentNode("div", [ParentNode("p", [LeafNode(None, "text "), image])])
+		result = add_image_props(tree, {"/images/tom.png": (640, 480)})
+		self.assertEqual(
+			result.to_html(),
+			'<div><p>text <img src="/images/tom.png" alt="Tom" width="640" height="480" loading="lazy" decoding="async"></img></p></div>',
+		)
+		# The original tree may be shared by other pages, so it is left as it was
+		self.assertEqual(image.props, {"src": "/images/tom.png", "alt": "Tom"})
+
+	def test_unknown_images_are_left_alone(self):
+		tree = ParentNode("div", [
+			ParentNode("p", [LeafNode("img", "", {"src": "https://example.com/tom.png", "alt": "Tom"})]),
+			ParentNode("p", [LeafNode("a", "link", {"href": "/images/tom.png"})]),
+		])
+		self.assertIs(add_image_props(tree, {"/images/tom.png": (640, 480)}), tree)
+
+
+class TestImageSizesBuild(TempDirTestCase):
+	def setUp(self):
+		super().setUp()
+		self.content = os.path.join(self.tmp.name, "content")
+		self.dest = os.path.join(self.tmp.name, "docs")
+		self.write("content/index.md", "# Home\n\n![Tom](/images/tom.png)")
+
+	def build(self, images, parse_cache=None):
+		template = Template("{{ Content }}", "/site", images=images)
+		generate_pages_recursive(self.content, template, self.dest, "/site", parse_cache=parse_cache)
+		with open(os.path.join(self.dest, "index.html")) as file:
+			return file.read()
+
+	def test_pages_get_image_sizes(self):
+		self.assertEqual(self.build(None), '<div><h1>Home</h1><p><img src="/site/images/tom.png" alt="Tom"></img></p></div>')
+		self.assertIn('width="640" height="480" loading="lazy"', self.build({"/images/tom.png": (640, 480)}))
+
+	def test_parse_cache_follows_image_sizes(self):
+		parse_cache = ParseCache(os.path.join(self.tmp.name, "parse"))
+		self.assertIn('width="640"', self.build({"/images/tom.png": (640, 480)}, parse_cache))
+		self.assertIn('width="320"', self.build({"/images/tom.png": (320, 240)}, parse_cache))
+		self.assertNotIn("width", self.build(None, parse_cache))
+
+	def test_template_hash_follows_image_sizes(self):
+		plain = Template("{{ Content }}", "/")
+		self.assertEqual(Template("{{ Content }}", "/", images={}).hash, plain.hash)
+		self.assertNotEqual(Template("{{ Content }}", "/", images={"/a.png": (1, 2)}).hash, plain.hash)
+		self.assertNotEqual(Template("{{ Content }}", "/", images={"/a.png": (1, 2)}).hash, Template("{{ Content }}", "/", images={"/a.png": (2, 1)}).hash)
+
+
+if __name__ == "__main__":
+	unittest.main()
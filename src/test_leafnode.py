@@ -16,5 +16,15 @@ class TestLeafNode(unittest.TestCase):
 		node = LeafNode("a", "Click me!", {"href": "https://www.google.com"})
 		self.assertEqual(node.to_html(), '<a href="https://www.google.com">Click me!</a>')
 
+	def test_leaf_to_html_minify(self):
+		node = LeafNode("img", "", {"src": "/tom.png", "alt": "Tom"})
+		self.assertEqual(node.to_html(), '<img src="/tom.png" alt="Tom"></img>')
+		self.assertEqual(node.to_html(minify=True), '<img src="/tom.png" alt="Tom">')
+		self.assertEqual(LeafNode("b", " so \t bold ").to_html(minify=True), "<b> so bold </b>")
+
+	def test_slots(self):
+		node = LeafNode("b", "compact")
+		self.assertFalse(hasattr(node, "__dict__"))
+
 
 
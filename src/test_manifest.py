@@ -0,0 +1,66 @@
+import os
+import unittest
+from unittest import mock
+
+from fixtures import TempDirTestCase
+from manifest import BuildManifest, hash_bytes, hash_file
+
+
+class TestBuildManifest(TempDirTestCase):
+	def setUp(self):
+		super().setUp()
+		self.manifest_path = os.path.join(self.tmp.name, "manifest.json")
+		self.dest_path = self.write("index.html", "<p>hello</p>")
+		self.output_hash = hash_file(self.dest_path)
+
+	def record(self, manifest):
+		manifest.record(self.dest_path, "index.md", "src", "tmpl", "/", self.output_hash)
+
+	def test_hash_file_matches_bytes(self):
+		self.assertEqual(self.output_hash, hash_bytes(b"<p>hello</p>"))
+
+	def test_other_version_discarded(self):
+		manifest = BuildManifest(self.manifest_path)
+		self.record(manifest)
+		manifest.save()
+		# A parser change makes the recorded pages stale, just like a generator change
+		with mock.patch("manifest.BUILD_VERSION", "generator-1.parser-999"):
+			self.assertEqual(BuildManifest(self.manifest_path).pages, {})
+
+	def test_fresh_after_reload(self):
+		manifest = BuildManifest(self.manifest_path)
+		self.record(manifest)
+		manifest.save()
+		reloaded = BuildManifest(self.manifest_path)
+		self.assertTrue(reloaded.is_fresh(self.dest_path, "src", "tmpl", "/"))
+
+	def test_changed_inputs_are_stale(self):
+		manifest = BuildManifest(self.manifest_path)
+		self.record(manifest)
+		self.assertFalse(manifest.is_fresh(self.dest_path, "new src", "tmpl", "/"))
+		self.assertFalse(manifest.is_fresh(self.dest_path, "src", "new tmpl", "/"))
+		self.assertFalse(manifest.is_fresh(self.dest_path, "src", "tmpl", "/site"))
+
+	def test_modified_or_missing_output_is_stale(self):
+		manifest = BuildManifest(self.manifest_path)
+		self.record(manifest)
+		with open(self.dest_path, "w") as file:
+			file.write("<p>edited by hand</p>")
+		self.assertFalse(manifest.is_fresh(self.dest_path, "src", "tmpl", "/"))
+		os.remove(self.dest_path)
+		self.assertFalse(manifest.is_fresh(self.dest_path, "src", "tmpl", "/"))
+
+	def test_force_keeps_records(self):
+		manifest = BuildManifest(self.manifest_path)
+		self.record(manifest)
+		manifest.assets = ["index.css"]
+		manifest.save()
+		forced = BuildManifest(self.manifest_path, force=True)
+		# Pages are still known, so outputs of deleted sources can be removed
+		self.assertIn(self.dest_path, forced.pages)
+		self.assertEqual(forced.assets, ["index.css"])
+		self.assertFalse(forced.is_fresh(self.dest_path, "src", "tmpl", "/"))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from minify import collapse_whitespace, minify_html
+from text_converter import markdown_to_html_node
+
+
+class TestMinify(unittest.TestCase):
+	def test_collapse_whitespace(self):
+		self.assertEqual(collapse_whitespace("a \n\t b  c"), "a b c")
+		self.assertEqual(collapse_whitespace(" a "), " a ")
+
+	def test_no_break_space_kept(self):
+		self.assertEqual(collapse_whitespace("10\u00a0km \u2003 away"), "10\u00a0km \u2003 away")
+		self.assertEqual(minify_html("<p>\n  10\u00a0km away\n</p>"), "<p>10\u00a0km away</p>")
+		html = markdown_to_html_node("# T\n\n10\u00a0km away").to_html(minify=True)
+		self.assertIn("10\u00a0km away", html)
+
+	def test_block_whitespace_dropped(self):
+		html = "<!doctype html>\n<html>\n  <body>\n    <p>\n      Hello,   world\n    </p>\n  </body>\n</html>\n"
+		self.assertEqual(minify_html(html), "<!doctype html><html><body><p>Hello, world</p></body></html>")
+
+	def test_inline_whitespace_kept(self):
+		html = "<p>see <a href=\"/x\">this</a>\n  and <b>that</b> </p>"
+		self.assertEqual(minify_html(html), '<p>see <a href="/x">this</a> and <b>that</b></p>')
+
+	def test_preserved_elements(self):
+		html = "<div>\n<pre>  x\n    y  </pre>\n<p>a  <code>b   c</code>  d</p>\n<script>\nlet  x = 1;\n</script>\n</div>"
+		self.assertEqual(
+			minify_html(html),
+			"<div><pre>  x\n    y  </pre><p>a <code>b   c</code> d</p><script>\nlet  x = 1;\n</script></div>",
+		)
+
+	def test_comments_and_void_tags(self):
+		html = '<head>\n<!-- styles -->\n<link href="/index.css" rel="stylesheet" />\n</head><p>a <!-- note --> b<br /></p>'
+		self.assertEqual(minify_html(html), '<head><link href="/index.css" rel="stylesheet"></head><p>a b<br></p>')
+
+	def test_placeholders_kept(self):
+		self.assertEqual(minify_html("<title>{{ Title }}</title>\n<article>\n  {{ Content }}\n</article>"), "<title>{{ Title }}</title><article>{{ Content }}</article>")
+
+
+if __name__ == "__main__":
+	unittest.main()
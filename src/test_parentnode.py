@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from leafnode import LeafNode
@@ -17,4 +18,40 @@ class TestParentNode(unittest.TestCase):
 		self.assertEqual(
 			parent_node.to_html(),
 			"<div><span><b>grandchild</b></span></div>",
-		)
\ No newline at end of file
+		)
+
+	def test_iter_html_chunks(self):
+		parent_node = ParentNode("p", [LeafNode(None, "see "), LeafNode("a", "here", {"href": "/x"})])
+		self.assertEqual(list(parent_node.iter_html()), ["<p>", "see ", '<a href="/x">here</a>', "</p>"])
+
+	def test_minify_keeps_pre(self):
+		code = LeafNode("code", "def f():\n    return  1\n")
+		parent_node = ParentNode("div", [
+			ParentNode("p", [LeafNode(None, "one\n  two   "), LeafNode("code", "a  b")]),
+			ParentNode("pre", [code]),
+		])
+		self.assertEqual(
+			parent_node.to_html(minify=True),
+			"<div><p>one two <code>a  b</code></p><pre><code>def f():\n    return  1\n</code></pre></div>",
+		)
+		self.assertEqual(parent_node.to_html(), parent_node.to_html(minify=False))
+
+	def test_write_to(self):
+		grandchild_node = LeafNode("b", "grandchild")
+		parent_node = ParentNode("div", [ParentNode("span", [grandchild_node]), LeafNode(None, "tail")])
+		output = io.StringIO()
+		parent_node.write_to(output)
+		self.assertEqual(output.getvalue(), parent_node.to_html())
+
+	def test_to_html_matches_iter_html(self):
+		parent_node = ParentNode("div", [
+			ParentNode("p", [LeafNode(None, "see  "), LeafNode("a", "here", {"href": "/x"}), LeafNode("b", "bold")], {"class": "intro"}),
+			ParentNode("pre", [LeafNode("code", "a  b")]),
+			LeafNode("img", "", {"src": "/tom.png"}),
+		])
+		for minify in (False, True):
+			self.assertEqual(parent_node.to_html(minify), "".join(parent_node.iter_html(minify)))
+
+	def test_to_html_without_children(self):
+		with self.assertRaises(ValueError):
+			ParentNode("div", []).to_html()
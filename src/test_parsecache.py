@@ -0,0 +1,94 @@
+import os
+import unittest
+from unittest import mock
+
+from filemanager import generate_page
+from fixtures import TempDirTestCase
+from manifest import temp_path_for
+from parsecache import ParseCache
+from template import Template
+from text_converter import parse_document
+
+
+class TestParseCache(TempDirTestCase):
+	def setUp(self):
+		super().setUp()
+		self.cache = ParseCache(os.path.join(self.tmp.name, "parse"), max_bytes=10000)
+
+	def test_get_put(self):
+		key = self.cache.key(b"# Title\n\nbody")
+		self.assertIsNone(self.cache.get(key))
+		self.cache.put(key, "Title", "<div><p>body</p></div>")
+		self.assertEqual(self.cache.get(key), ("Title", "<div><p>body</p></div>"))
+
+	def test_key_depends_on_source(self):
+		self.assertEqual(self.cache.key(b"same"), self.cache.key(b"same"))
+		self.assertNotEqual(self.cache.key(b"same"), self.cache.key(b"different"))
+
+	def test_generate_page_fills_cache(self):
+		source = self.write("page.md", "# Title\n\nSome **body** text\n\n- a list")
+		template = Template("<title>{{ Title }}</title>{{ Content }}", "/")
+		uncached = os.path.join(self.tmp.name, "uncached.html")
+		generate_page(source, template, uncached, "/")
+
+		first = os.path.join(self.tmp.name, "first.html")
+		generate_page(source, template, first, "/", parse_cache=self.cache)
+		# A hit doesn't parse the markdown at all
+		second = os.path.join(self.tmp.name, "second.html")
+		with mock.patch("filemanager.parse_document", side_effect=AssertionError("parsed")):
+			generate_page(source, template, second, "/", parse_cache=self.cache)
+		with open(uncached) as expected, open(first) as actual1, open(second) as actual2:
+			html = expected.read()
+			self.assertEqual(actual1.read(), html)
+			self.assertEqual(actual2.read(), html)
+
+	def test_source_edited_mid_build(self):
+		source = self.write("page.md", "# Old\n\nold body")
+		template = Template("{{ Content }}", "/")
+		def edit_then_parse(markdown):
+			# An editor saves the file while the page is being built
+			self.write("page.md", "# New\n\nnew body")
+			return parse_document(markdown)
+		with mock.patch("filemanager.parse_document", side_effect=edit_then_parse):
+			generate_page(source, template, os.path.join(self.tmp.name, "page.html"), "/", parse_cache=self.cache)
+		# Whatever was parsed is stored under the key of the bytes it was parsed from
+		cached = self.cache.get(self.cache.key(b"# New\n\nnew body"))
+		self.assertTrue(cached is None or "new body" in cached[1])
+		cached = self.cache.get(self.cache.key(b"# Old\n\nold body"))
+		self.assertTrue(cached is None or "old body" in cached[1])
+
+	def test_damaged_entry_is_a_miss(self):
+		key = self.cache.key(b"source")
+		self.cache.put(key, "Title", "<p>body</p>")
+		with open(self.cache.path_for(key), "w") as file:
+			file.write('{"title": "Tit')
+		self.assertIsNone(self.cache.get(key))
+
+	def test_prune_evicts_least_recently_used(self):
+		keys = [self.cache.key(str(i).encode()) for i in range(5)]
+		for age, key in enumerate(keys):
+			self.cache.put(key, "Title", "x" * 3000)
+			# Oldest first: key 0 is the least recently used
+			os.utime(self.cache.path_for(key), (1000 + age, 1000 + age))
+		self.cache.get(keys[0])
+		removed = self.cache.prune()
+		self.assertEqual(removed, 2)
+		self.assertIsNotNone(self.cache.get(keys[0]))
+		self.assertIsNone(self.cache.get(keys[1]))
+		self.assertIsNone(self.cache.get(keys[2]))
+		self.assertIsNotNone(self.cache.get(keys[4]))
+
+	def test_prune_removes_stale_temporary_files(self):
+		key = self.cache.key(b"source")
+		self.cache.put(key, "Title", "<p>body</p>")
+		stale = temp_path_for(self.cache.path_for(key))
+		with open(stale, "w") as file:
+			file.write("half written")
+		os.utime(stale, (1000, 1000))
+		self.cache.prune()
+		self.assertFalse(os.path.exists(stale))
+		self.assertIsNotNone(self.cache.get(key))
+
+
+if __name__ == "__main__":
+	unittest.main()
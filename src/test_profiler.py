@@ -0,0 +1,52 @@
+import json
+import os
+import tempfile
+import unittest
+
+from profiler import Profiler
+
+
+class TestProfiler(unittest.TestCase):
+	def setUp(self):
+		self.profiler = Profiler()
+		with self.profiler.page("slow.md"):
+			with self.profiler.stage("read", "slow.md"):
+				data = [str(i) for i in range(10000)]
+			with self.profiler.stage("write", "slow.md"):
+				pass
+		with self.profiler.page("fast.md"):
+			with self.profiler.stage("read", "fast.md"):
+				pass
+		self.profiler.close()
+
+	def test_events(self):
+		stages = [event for event in self.profiler.events if event["category"] == "stage"]
+		self.assertEqual([event["name"] for event in stages], ["read", "write", "read"])
+		self.assertGreater(stages[0]["peak_bytes"], 0)
+		self.assertIn("blocks", stages[0])
+
+	def test_page_memory(self):
+		pages = {event["name"]: event for event in self.profiler.events if event["category"] == "page"}
+		read = next(event for event in self.profiler.events if event["name"] == "read")
+		# A stage resets tracemalloc's peak, but the page around it still sees it
+		self.assertGreaterEqual(pages["slow.md"]["peak_bytes"], read["peak_bytes"])
+		self.assertIn("blocks", pages["slow.md"])
+		self.assertIn("KB peak", self.profiler.summary())
+
+	def test_summary(self):
+		self.assertEqual(list(self.profiler.stage_totals()), ["read", "write"])
+		self.assertEqual([event["name"] for event in self.profiler.slowest_pages()], ["slow.md", "fast.md"])
+		self.assertIn("slow.md", self.profiler.summary())
+
+	def test_write_trace(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, "trace", "profile.json")
+			self.profiler.write_trace(path)
+			with open(path) as file:
+				trace = json.load(file)
+		self.assertEqual(len(trace["traceEvents"]), 5)
+		self.assertTrue(all(event["ph"] == "X" for event in trace["traceEvents"]))
+
+
+if __name__ == "__main__":
+	unittest.main()
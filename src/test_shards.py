@@ -0,0 +1,122 @@
+import os
+import unittest
+
+from filemanager import discover_pages, generate_pages_recursive, select_shard, shard_of
+from fixtures import TempDirTestCase
+from manifest import BuildManifest
+from shards import ShardMergeError, check_shards, copy_shard_pages, merge_shards, parse_shard, shard_dir, shard_record_path, write_shard_manifest
+from template import Template
+
+
+class TestShards(TempDirTestCase):
+	def setUp(self):
+		super().setUp()
+		self.content = os.path.join(self.tmp.name, "content")
+		self.dest = os.path.join(self.tmp.name, "docs")
+		self.shard_root = os.path.join(self.tmp.name, "shards")
+		self.template = self.write("template.html", "<title>{{ Title }}</title><main>{{ Content }}</main>")
+		for index in range(12):
+			self.write(os.path.join("content", f"section{index % 3}", f"page{index}.md"), f"# Page {index}\n\nBody {index}")
+		self.manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"))
+
+	def build_shard(self, shard):
+		directory = shard_dir(shard, self.shard_root)
+		generate_pages_recursive(self.content, self.template, directory, "/", self.manifest, shard=shard)
+		write_shard_manifest(self.content, directory, shard, "/", self.manifest)
+		return directory
+
+	def test_parse_shard(self):
+		self.assertEqual(parse_shard("2/4"), (2, 4))
+		for text in ("0/4", "5/4", "1/0", "2", "a/b"):
+			with self.assertRaises(ValueError):
+				parse_shard(text)
+
+	def test_shard_record_path(self):
+		self.assertEqual(shard_record_path("./.cache/manifest.json", (2, 4)), "./.cache/manifest.2-of-4.json")
+		self.assertNotEqual(shard_record_path("./.cache/manifest.json", (1, 4)), shard_record_path("./.cache/manifest.json", (1, 2)))
+
+	def test_shard_of_is_stable(self):
+		self.assertEqual(shard_of("blog/tom/index.md", 4), shard_of(os.path.join("blog", "tom", "index.md"), 4))
+		self.assertEqual([shard_of(f"page{i}.md", 1) for i in range(5)], [0] * 5)
+
+	def test_shards_partition_pages(self):
+		pages = discover_pages(self.content, self.dest)
+		slices = [select_shard(pages, self.content, (index, 3)) for index in (1, 2, 3)]
+		self.assertEqual(sorted(page for pages in slices for page in pages), sorted(pages))
+		self.assertTrue(all(slices))
+
+	def test_merge_matches_unsharded_build(self):
+		directories = [self.build_shard((index, 3)) for index in (1, 2, 3)]
+		merged = os.path.join(self.tmp.name, "merged")
+		self.assertEqual(merge_shards(directories, self.content, merged, "/", self.manifest), 12)
+
+		generate_pages_recursive(self.content, self.template, self.dest, "/")
+		for source_path, dest_path in discover_pages(self.content, self.dest):
+			relative = os.path.relpath(dest_path, self.dest)
+			with open(dest_path) as expected, open(os.path.join(merged, relative)) as actual:
+				self.assertEqual(actual.read(), expected.read())
+			self.assertIn(os.path.join(merged, relative), self.manifest.pages)
+
+		# Merging again leaves identical pages alone
+		self.assertEqual(merge_shards(directories, self.content, merged, "/"), 0)
+
+	def test_check_writes_nothing(self):
+		directories = [self.build_shard((index, 2)) for index in (1, 2)]
+		pages = check_shards(directories, self.content, self.dest, "/")
+		self.assertEqual(len(pages), 12)
+		self.assertFalse(os.path.exists(self.dest))
+		self.assertEqual(copy_shard_pages(pages, self.content, self.dest, "/"), 12)
+
+	def test_missing_shard(self):
+		directories = [self.build_shard((index, 3)) for index in (1, 3)]
+		with self.assertRaises(ShardMergeError) as raised:
+			merge_shards(directories, self.content, self.dest, "/")
+		self.assertIn("shard 2 is missing", raised.exception.problems)
+		self.assertTrue(any("is not in any shard" in problem for problem in raised.exception.problems))
+		self.assertFalse(os.path.exists(self.dest))
+
+	def test_duplicate_shard(self):
+		first = self.build_shard((1, 2))
+		second = self.build_shard((2, 2))
+		with self.assertRaises(ShardMergeError) as raised:
+			merge_shards([first, second, first], self.content, self.dest, "/")
+		self.assertIn("shard 1 was given more than once", raised.exception.problems)
+		self.assertTrue(any(" is in both " in problem for problem in raised.exception.problems))
+
+	def test_damaged_page(self):
+		directories = [self.build_shard((index, 2)) for index in (1, 2)]
+		page = select_shard(discover_pages(self.content, directories[0]), self.content, (1, 2))[0][1]
+		with open(page, "a") as file:
+			file.write("tampered")
+		with self.assertRaises(ShardMergeError) as raised:
+			merge_shards(directories, self.content, self.dest, "/")
+		self.assertEqual(len(raised.exception.problems), 1)
+		self.assertIn("missing or damaged", raised.exception.problems[0])
+
+	def test_different_templates(self):
+		first = self.build_shard((1, 2))
+		with open(self.template, "a") as file:
+			file.write("<footer></footer>")
+		second = self.build_shard((2, 2))
+		with self.assertRaises(ShardMergeError) as raised:
+			merge_shards([first, second], self.content, self.dest, "/")
+		self.assertEqual(len(raised.exception.problems), 2)
+		self.assertTrue(all("disagree about the template" in problem for problem in raised.exception.problems))
+
+	def test_template_must_match_merge(self):
+		directories = [self.build_shard((index, 2)) for index in (1, 2)]
+		template = Template.load(self.template, "/")
+		self.assertEqual(merge_shards(directories, self.content, self.dest, "/", template_hash=template.hash), 12)
+		minified = Template.load(self.template, "/", minify=True)
+		with self.assertRaises(ShardMergeError) as raised:
+			merge_shards(directories, self.content, self.dest, "/", template_hash=minified.hash)
+		self.assertEqual(len(raised.exception.problems), 2)
+
+	def test_wrong_basepath(self):
+		directories = [self.build_shard((1, 1))]
+		with self.assertRaises(ShardMergeError):
+			merge_shards(directories, self.content, self.dest, "/site")
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,67 @@
+import io
+import os
+import tempfile
+import unittest
+
+from template import Template, rewrite_root_urls
+
+
+class TestTemplate(unittest.TestCase):
+	def test_rewrite_root_urls(self):
+		html = '<a href="/blog">blog</a><img src="/images/a.png"><a href="https://boot.dev">x</a>'
+		expected = '<a href="/site/blog">blog</a><img src="/site/images/a.png"><a href="https://boot.dev">x</a>'
+		self.assertEqual(rewrite_root_urls(html, "/site"), expected)
+
+	def test_segments(self):
+		template = Template('<link href="/index.css"><title>{{ Title }}</title>{{ Content }}', "/site")
+		self.assertEqual(template.placeholders(), ["Title", "Content"])
+		self.assertEqual(template.segments[0], '<link href="/site/index.css"><title>')
+
+	def test_render(self):
+		template = Template('<title>{{ Title }}</title><article>{{ Content }}</article>', "/site")
+		html = template.render(Title="Home", Content='<img src="/tom.png">')
+		self.assertEqual(html, '<title>Home</title><article><img src="/site/tom.png"></article>')
+
+	def test_render_matches_replace(self):
+		text = '<head><link href="/index.css" /><title>{{ Title }}</title></head><body>{{ Content }}</body>'
+		content = '<p><a href="/contact">contact</a></p>'
+		expected = text.replace("{{ Title }}", "Home").replace("{{ Content }}", content)
+		expected = expected.replace('href="/', 'href="//').replace('src="/', 'src="//')
+		self.assertEqual(Template(text, "/").render(Title="Home", Content=content), expected)
+
+	def test_extra_placeholders(self):
+		template = Template("{{ Title }} - {{ Date }} - {{ Title }}", "/")
+		self.assertEqual(template.render(Title="Post", Date="2024-01-01"), "Post - 2024-01-01 - Post")
+		self.assertEqual(template.render(Title="Post"), "Post - {{ Date }} - Post")
+
+	def test_write_to_streams_chunks(self):
+		template = Template('<link href="/index.css"><title>{{ Title }}</title><main>{{ Content }}</main>', "/site")
+		chunks = ['<p>', '<a href="/blog">blog</a>', '</p>']
+		output = io.StringIO()
+		template.write_to(output, Title="Home", Content=iter(chunks))
+		self.assertEqual(output.getvalue(), template.render(Title="Home", Content="".join(chunks)))
+
+
+	def test_minify(self):
+		text = '<html>\n\t<head>\n\t\t<link href="/index.css" />\n\t</head>\n\t<body>\n\t\t<article>{{ Content }}</article>\n\t</body>\n</html>\n'
+		template = Template(text, "/site", minify=True)
+		self.assertEqual(template.render(Content="<p>Hi</p>"), '<html><head><link href="/site/index.css"></head><body><article><p>Hi</p></article></body></html>')
+		# Pages recorded by a build without --minify are rebuilt
+		self.assertNotEqual(template.hash, Template(text, "/site").hash)
+
+	def test_load_cached(self):
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, "template.html")
+			with open(path, "w") as file:
+				file.write("<title>{{ Title }}</title>")
+			template = Template.load_cached(path, "/")
+			self.assertIs(Template.load_cached(path, "/"), template)
+			self.assertIsNot(Template.load_cached(path, "/site"), template)
+			with open(path, "w") as file:
+				file.write("<h1>{{ Title }}</h1>")
+			os.utime(path, ns=(0, 0))
+			self.assertEqual(Template.load_cached(path, "/").render(Title="Home"), "<h1>Home</h1>")
+
+
+if __name__ == "__main__":
+	unittest.main()
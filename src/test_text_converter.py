@@ -1,7 +1,8 @@
+import io
 import unittest
 
 from leafnode import LeafNode
-from text_converter import BlockType, extract_title, identify_block_type, markdown_to_blocks, markdown_to_html_node
+from text_converter import BlockType, BlockCache, block_cache_info, clear_block_cache, enable_block_cache, extract_title, parse_document, identify_block_type, iter_blocks, markdown_to_blocks, markdown_to_html_node
 
 class TestTextConverter(unittest.TestCase):
 	def test_markdown_to_blocks(self):
@@ -296,4 +297,78 @@ class TestTextConverter(unittest.TestCase):
 		md = """ """
 
 		with self.assertRaises(IndexError):
-			title = extract_title(md)
\ No newline at end of file
+			title = extract_title(md)
+
+	def test_iter_blocks_from_file(self):
+		md = "# Title\n\n  Some text  \n   \nmore text\n\n\n\n- a\n- b\n\n1. one\nnot a list item\n\n> quoted\n>\n"
+		blocks = list(iter_blocks(io.StringIO(md)))
+		self.assertEqual(
+			blocks,
+			[
+				("# Title", BlockType.HEADING),
+				("Some text\nmore text", BlockType.PARAGRAPH),
+				("- a\n- b", BlockType.UNORDERED_LIST),
+				("1. one\nnot a list item", BlockType.ORDERED_LIST),
+				("> quoted\n>", BlockType.QUOTE),
+			],
+		)
+		self.assertEqual([block for block, _ in blocks], markdown_to_blocks(md))
+		self.assertEqual([b_type for _, b_type in blocks], [identify_block_type(block) for block, _ in blocks])
+
+	def test_markdown_file_to_html_node(self):
+		md = "# Title\n\nSome **bold** text\n\n```\ncode\n```\n"
+		self.assertEqual(markdown_to_html_node(io.StringIO(md)).to_html(), markdown_to_html_node(md).to_html())
+		self.assertEqual(extract_title(io.StringIO(md)), "Title")
+
+	def test_block_cache(self):
+		enable_block_cache()
+		self.addCleanup(enable_block_cache, 0)
+		clear_block_cache()
+		md = "# Title\n\nFirst paragraph\n\nSecond paragraph"
+		markdown_to_html_node(md)
+		self.assertEqual((block_cache_info().hits, block_cache_info().misses), (0, 3))
+		edited = markdown_to_html_node(md.replace("Second", "Edited second"))
+		self.assertEqual((block_cache_info().hits, block_cache_info().misses), (2, 4))
+		self.assertEqual(edited.to_html(), "<div><h1>Title</h1><p>First paragraph</p><p>Edited second paragraph</p></div>")
+
+	def test_block_cache_is_off_by_default(self):
+		cache = BlockCache()
+		cache.convert("Some paragraph", BlockType.PARAGRAPH)
+		self.assertEqual(cache.info().currsize, 0)
+
+	def test_block_cache_bounded_by_bytes(self):
+		cache = BlockCache(max_bytes=30, max_block_bytes=20)
+		for text in ("first block", "second block", "third block"):
+			cache.convert(text, BlockType.PARAGRAPH)
+		# The oldest block is evicted to stay within 30 bytes
+		self.assertEqual((cache.info().currsize, cache.info().bytes), (2, 23))
+		cache.convert("a block that is longer than twenty bytes", BlockType.PARAGRAPH)
+		self.assertEqual(cache.info().currsize, 2)
+		cache.convert("third block", BlockType.PARAGRAPH)
+		self.assertEqual(cache.info().hits, 1)
+
+	def test_parse_document(self):
+		md = """
+			# The **important** title
+
+			Some text with _emphasis_
+
+			## Section one
+
+			- a list item
+
+			### Sub section
+			"""
+		document = parse_document(md)
+		self.assertEqual(document.title, "The important title")
+		self.assertEqual(document.title, extract_title(md))
+		self.assertEqual(document.node.to_html(), markdown_to_html_node(md).to_html())
+		self.assertEqual(document.headings, [(1, "The important title"), (2, "Section one"), (3, "Sub section")])
+		self.assertEqual(document.stats["blocks"], 5)
+		self.assertEqual(document.stats["block_types"], {"heading": 3, "paragraph": 1, "unordered_list": 1})
+
+	def test_parse_document_without_title(self):
+		with self.assertRaises(ValueError):
+			parse_document("## Not a title\n\ntext")
+		with self.assertRaises(IndexError):
+			parse_document(" ")
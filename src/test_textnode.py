@@ -1,7 +1,7 @@
 import unittest
 
 from textnode import TextNode, TextType, split_nodes_image, split_nodes_link, text_node_to_html_node, convert_line_to_textnodes
-from textnode import extract_markdown_images, extract_markdown_links
+from textnode import extract_markdown_images, extract_markdown_links, split_nodes_delimiter, tokenize_inline
 
 
 class TestTextNode(unittest.TestCase):
@@ -20,6 +20,10 @@ class TestTextNode(unittest.TestCase):
 		node2 = TextNode("This is a text node", TextType.ITALIC)
 		self.assertNotEqual(node, node2)
 
+	def test_slots(self):
+		node = TextNode("This is a text node", TextType.BOLD)
+		self.assertFalse(hasattr(node, "__dict__"))
+
 	def test_plaintext(self):
 		node = TextNode("This is a text node", TextType.PLAIN)
 		html_node = text_node_to_html_node(node)
@@ -253,6 +257,54 @@ class TestTextNode(unittest.TestCase):
 		]
 		self.assertListEqual(expected, actual)
 
+	def staged_pipeline(self, text):
+		nodes = [TextNode(text, TextType.PLAIN)]
+		nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+		nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+		nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+		return split_nodes_link(split_nodes_image(nodes))
+
+	def test_tokenizer_matches_staged_pipeline(self):
+		lines = [
+			"",
+			"**a**",
+			"a **b _c_ d** e",
+			"__init__ file",
+			"[link](/a)[second](/b) then ![img](/c.png)",
+			"![img](/c.png)[link](/a)",
+			"_![image](/i.png)_ and **[link](/l)**",
+			"`code` and _italic_ and **bold with `ticks`**",
+			"a ![broken](image and [broken](link",
+			"``",
+		]
+		for line in lines:
+			self.assertListEqual(self.staged_pipeline(line), convert_line_to_textnodes(line), line)
+
+	def test_tokenizer_invalid_syntax(self):
+		for line in ["**unclosed", "a_b", "one ` tick", "_a **b_ c**"]:
+			with self.assertRaises(Exception):
+				convert_line_to_textnodes(line)
+
+	def test_split_delimiter_keeps_empty_nodes(self):
+		nodes = split_nodes_delimiter([TextNode("**bold**", TextType.PLAIN)], "**", TextType.BOLD)
+		self.assertListEqual(
+			[
+				TextNode("", TextType.PLAIN),
+				TextNode("bold", TextType.BOLD),
+				TextNode("", TextType.PLAIN),
+			],
+			nodes,
+		)
+
+	def test_tokenizer_single_delimiter(self):
+		nodes = tokenize_inline("a `b` c **d**", (("`", TextType.CODE),), media=False)
+		self.assertEqual([node.text for node in nodes], ["a ", "b", " c **d**"])
+
+	def test_tokenizer_long_line(self):
+		line = "word **bold** _it_ `code` [link](/x) " * 5000
+		nodes = convert_line_to_textnodes(line)
+		self.assertEqual(len(nodes), 5000 * 8 + 1)
+
 
 if __name__ == "__main__":
 	unittest.main()
\ No newline at end of file
@@ -0,0 +1,71 @@
+import os
+import unittest
+from unittest import mock
+
+from fixtures import TempDirTestCase
+from walker import DirectorySnapshot, scan_dir, walk_files
+
+
+class TestWalker(TempDirTestCase):
+	def setUp(self):
+		super().setUp()
+		self.root = os.path.join(self.tmp.name, "content")
+		for relative_path in ("index.md", "blog/b.md", "blog/a.md", "blog-notes.md", "z/deep/er/page.md"):
+			self.write(os.path.join("content", relative_path), "# Page")
+		self.snapshot_path = os.path.join(self.tmp.name, "directories.json")
+
+	def age_directories(self):
+		# Snapshots don't trust directories modified in the last couple of seconds
+		for dirpath, _, _ in os.walk(self.root):
+			os.utime(dirpath, ns=(0, 0))
+
+	def test_walk_order(self):
+		expected = ["blog/a.md", "blog/b.md", "blog-notes.md", "index.md", "z/deep/er/page.md"]
+		self.assertEqual(list(walk_files(self.root)), [path.replace("/", os.sep) for path in expected])
+
+	def test_matches_listdir_walk(self):
+		def listdir_walk(dirpath=""):
+			for entry in sorted(os.listdir(os.path.join(self.root, dirpath))):
+				rel_path = os.path.join(dirpath, entry)
+				if os.path.isdir(os.path.join(self.root, rel_path)):
+					yield from listdir_walk(rel_path)
+				else:
+					yield rel_path
+		self.assertEqual(list(walk_files(self.root)), list(listdir_walk()))
+
+	def test_snapshot_skips_unchanged_directories(self):
+		self.age_directories()
+		snapshot = DirectorySnapshot(self.snapshot_path)
+		first = list(walk_files(self.root, snapshot))
+		snapshot.save()
+
+		snapshot = DirectorySnapshot(self.snapshot_path)
+		with mock.patch("os.scandir") as scandir:
+			self.assertEqual(list(walk_files(self.root, snapshot)), first)
+		scandir.assert_not_called()
+
+	def test_snapshot_sees_new_files(self):
+		self.age_directories()
+		snapshot = DirectorySnapshot(self.snapshot_path)
+		list(walk_files(self.root, snapshot))
+		snapshot.save()
+
+		self.write("content/blog/c.md", "# Page")
+		snapshot = DirectorySnapshot(self.snapshot_path)
+		self.assertIn(os.path.join("blog", "c.md"), list(walk_files(self.root, snapshot)))
+
+	def test_recent_directories_not_remembered(self):
+		snapshot = DirectorySnapshot(self.snapshot_path)
+		scan_dir(self.root, snapshot)
+		self.assertEqual(snapshot.directories, {})
+
+	def test_force_ignores_snapshot(self):
+		self.age_directories()
+		snapshot = DirectorySnapshot(self.snapshot_path)
+		list(walk_files(self.root, snapshot))
+		snapshot.save()
+		self.assertEqual(DirectorySnapshot(self.snapshot_path, force=True).previous, {})
+
+
+if __name__ == "__main__":
+	unittest.main()
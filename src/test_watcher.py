@@ -0,0 +1,36 @@
+import os
+import unittest
+
+from fixtures import TempDirTestCase
+from watcher import Watcher
+
+
+class TestWatcher(TempDirTestCase):
+	def setUp(self):
+		super().setUp()
+		self.root = self.tmp.name
+		self.index = self.write("index.md", "# Home")
+		self.post = self.write("blog/post.md", "# Post")
+
+	def test_no_changes(self):
+		watcher = Watcher([self.root])
+		self.assertEqual(watcher.poll(), (set(), set()))
+
+	def test_changes(self):
+		watcher = Watcher([self.root])
+		self.write("index.md", "# Home, edited")
+		# Make sure the mtime moves even on filesystems with coarse timestamps
+		os.utime(self.index, ns=(0, 0))
+		added = self.write("blog/new.md", "# New")
+		os.remove(self.post)
+		self.assertEqual(watcher.poll(), ({self.index, added}, {self.post}))
+		self.assertEqual(watcher.poll(), (set(), set()))
+
+	def test_single_file(self):
+		watcher = Watcher([self.index])
+		os.utime(self.index, ns=(0, 0))
+		self.assertEqual(watcher.poll(), ({self.index}, set()))
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -1,10 +1,16 @@
 import re
+import threading
+from collections import OrderedDict, namedtuple
 from enum import Enum
 
 from leafnode import LeafNode
 from parentnode import ParentNode
 from textnode import convert_line_to_textnodes, text_node_to_html_node
 
+# Bump this whenever a parser change alters the html produced for the same markdown,
+# so that cached parse results from older versions are not reused.
+PARSER_VERSION = 1
+
 class BlockType(Enum):
 	PARAGRAPH = "paragraph"
 	HEADING = "heading"
@@ -16,49 +22,214 @@ class BlockType(Enum):
 """
 Returns the raw text of the heading at the top of a markdown page. This text will be used as the <title> of the html translation
 parameters:
-- markdown: a string, intended to be the full contents of a markdown file
+- markdown: a string, intended to be the full contents of a markdown file (or an open file / iterable of lines).
+	Only the first block is read.
 return:
 - title: the text of the h1 header at the top of the file. The leading '# ' will be stripped away.
 	If the file does not begin with an h1 header block, This method will raise an exception
 """
 def extract_title(markdown):
-	blocks = markdown_to_blocks(markdown)
-	title_block = blocks[0]
-	title_node = block_to_heading(title_block)
+	first_block = next(iter_blocks(markdown), None)
+	if first_block is None:
+		raise IndexError("The markdown does not contain any blocks")
+	return title_from_block(first_block[0])
+
+def title_from_block(block, node=None):
+	# node is the block's already-converted heading node, if the caller has one
+	title_node = node if node is not None else block_to_heading(block)
 	if title_node.tag != "h1":
 		raise ValueError("The first block of markdown must be a h1 header (begins with '# ')")
 	return title_node.to_raw_text()
+
+
+class Document:
+	"""
+	Docstring for Document constructor
+	parameters:
+	title: the raw text of the h1 heading at the top of the page
+	node: the <div> ParentNode holding the page body
+	headings: a list of (level, raw text) tuples, one per heading block, in page order
+	stats: a dictionary of basic counts: "blocks", "words", "characters", and "block_types"
+		(a dictionary of block count per BlockType value)
+	"""
+	def __init__(self, title, node, headings, stats):
+		self.title = title
+		self.node = node
+		self.headings = headings
+		self.stats = stats
+
+	def __repr__(self):
+		return f"Document('{self.title}', {len(self.headings)} headings, {self.stats['blocks']} blocks)"
+
+"""
+Parses a markdown page once and returns a Document holding its title, body node tree,
+headings and basic stats. Anything that needs more than the body of a page (page
+generation, index pages, feeds, sitemaps) should use this rather than parsing twice.
+parameters:
+- markdown: a string, or an open file / iterable of lines
+Raises the same exceptions as extract_title if the page does not start with an h1 heading.
+"""
+def parse_document(markdown):
+	return document_from_blocks(iter_blocks(markdown))
+
+def document_from_blocks(blocks):
+	children = []
+	headings = []
+	title = None
+	words = 0
+	characters = 0
+	block_types = {}
+	for block, b_type in blocks:
+		node = cached_block_to_html_node(block, b_type)
+		if b_type == BlockType.HEADING:
+			headings.append((int(node.tag[1:]), node.to_raw_text()))
+		if not children:
+			title = title_from_block(block, node if b_type == BlockType.HEADING else None)
+		children.append(node)
+		words += len(block.split())
+		characters += len(block)
+		block_types[b_type.value] = block_types.get(b_type.value, 0) + 1
+	if not children:
+		raise IndexError("The markdown does not contain any blocks")
+	stats = {
+		"blocks": len(children),
+		"words": words,
+		"characters": characters,
+		"block_types": block_types,
+	}
+	return Document(title, ParentNode("div", children), headings, stats)
 	
 	
 
 
+"""
+Converts markdown to a <div> ParentNode holding one node per block.
+parameters:
+- markdown: a string, or an open file / iterable of lines. Files are parsed as they are read,
+	one block at a time, so the whole document never has to be held as a string.
+"""
 def markdown_to_html_node(markdown):
-	blocks = markdown_to_blocks(markdown)
 	children = []
-	for block in blocks:
-		b_type = identify_block_type(block)
-		match b_type:
-			case BlockType.PARAGRAPH:
-				children.append(block_to_paragraph(block))
-			case BlockType.HEADING:
-				children.append(block_to_heading(block))
-			case BlockType.CODE:
-				children.append(block_to_code(block))
-			case BlockType.QUOTE:
-				children.append(block_to_quote(block))
-			case BlockType.UNORDERED_LIST:
-				children.append(block_to_list(block, False))
-			case BlockType.ORDERED_LIST:
-				children.append(block_to_list(block, True))
-			case _:
-				raise Exception("Unrecognized Block Type.")
+	for block, b_type in iter_blocks(markdown):
+		children.append(cached_block_to_html_node(block, b_type))
 	return ParentNode("div", children)
 
+# Used by the long-running modes (watch, the build server), which re-render edited pages.
+# The nodes of a block take around twenty times the memory of its text, so this holds
+# roughly 20 MB.
+BLOCK_CACHE_BYTES = 1024 * 1024
+# A block this long is rarely repeated, and its nodes would crowd out many smaller ones
+MAX_CACHED_BLOCK_BYTES = 64 * 1024
+
+BlockCacheInfo = namedtuple("BlockCacheInfo", ["hits", "misses", "currsize", "bytes"])
+
+
+class BlockCache:
+	"""
+	Docstring for BlockCache constructor
+	parameters:
+	max_bytes: the total length of block text the cache may hold; the least recently used
+		blocks are evicted to stay within it. 0 disables the cache.
+	max_block_bytes: blocks longer than this are converted but never cached
+
+	Memoizes block_to_html_node on the block text and its BlockType. The nodes of a block
+	take many times the memory of its text, so the cache is bounded by bytes rather than
+	by a count of blocks, and it is off unless a long-running build turns it on with
+	enable_block_cache: a single build parses each page once, and would only pay for holding
+	every block alive after its page is written. It may be shared by threads (the dev server
+	renders each request on its own thread).
+	"""
+	def __init__(self, max_bytes=0, max_block_bytes=MAX_CACHED_BLOCK_BYTES):
+		self.max_bytes = max_bytes
+		self.max_block_bytes = max_block_bytes
+		self.entries = OrderedDict()
+		self.bytes = 0
+		self.hits = 0
+		self.misses = 0
+		self.lock = threading.Lock()
+
+	def convert(self, block, b_type):
+		key = (block, b_type)
+		with self.lock:
+			node = self.entries.get(key)
+			if node is not None:
+				self.entries.move_to_end(key)
+				self.hits += 1
+				return node
+			self.misses += 1
+		node = block_to_html_node(block, b_type)
+		if len(block) <= min(self.max_block_bytes, self.max_bytes):
+			with self.lock:
+				if key not in self.entries:
+					self.entries[key] = node
+					self.bytes += len(block)
+				self.evict()
+		return node
+
+	def evict(self):
+		"""Drops the least recently used blocks until the cache is within max_bytes. Call with lock held."""
+		while self.bytes > self.max_bytes:
+			(evicted, _), _ = self.entries.popitem(last=False)
+			self.bytes -= len(evicted)
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+			self.bytes = 0
+			self.hits = 0
+			self.misses = 0
+
+	def info(self):
+		return BlockCacheInfo(self.hits, self.misses, len(self.entries), self.bytes)
+
+BLOCK_CACHE = BlockCache()
+
+"""
+block_to_html_node, memoized by BLOCK_CACHE when it is enabled. Re-rendering a page after a
+small edit (in watch mode, or from the build server) only converts the blocks that changed.
+The returned nodes are shared between every page that contains the same block, so they must
+not be modified.
+"""
+def cached_block_to_html_node(block, b_type):
+	return BLOCK_CACHE.convert(block, b_type)
+
+"""
+Turns the block cache on (or resizes it) with room for max_bytes of block text
+"""
+def enable_block_cache(max_bytes=BLOCK_CACHE_BYTES):
+	with BLOCK_CACHE.lock:
+		BLOCK_CACHE.max_bytes = max_bytes
+		BLOCK_CACHE.evict()
+
+"""
+Returns the block cache's hits, misses, currsize (the number of blocks held) and bytes
+(the length of their text)
+"""
+def block_cache_info():
+	return BLOCK_CACHE.info()
+
+def clear_block_cache():
+	BLOCK_CACHE.clear()
+
+def block_to_html_node(block, b_type):
+	match b_type:
+		case BlockType.PARAGRAPH:
+			return block_to_paragraph(block)
+		case BlockType.HEADING:
+			return block_to_heading(block)
+		case BlockType.CODE:
+			return block_to_code(block)
+		case BlockType.QUOTE:
+			return block_to_quote(block)
+		case BlockType.UNORDERED_LIST:
+			return block_to_list(block, False)
+		case BlockType.ORDERED_LIST:
+			return block_to_list(block, True)
+		case _:
+			raise Exception("Unrecognized Block Type.")
+
 def markdown_to_blocks(markdown):
-	initial_split = markdown.split("\n\n")
-	stripped = [clean_block(block) for block in initial_split]
-	blocks = [block for block in stripped if block != ""]
-	return blocks
+	return [block for block, _ in iter_blocks(markdown)]
 
 def clean_block(block):
 	lines = block.split("\n")
@@ -69,6 +240,68 @@ def clean_block(block):
 	newBlock = "\n".join(filtered)
 	return newBlock
 
+"""
+Lazily splits a string into lines, exactly like markdown.split("\n") but without building the list
+"""
+def iter_lines(markdown):
+	start = 0
+	while True:
+		end = markdown.find("\n", start)
+		if end == -1:
+			yield markdown[start:]
+			return
+		yield markdown[start:end]
+		start = end + 1
+
+"""
+Streaming block parser. Yields (block, BlockType) tuples one block at a time.
+parameters:
+- markdown: a string, or an open file / iterable of lines (with or without their trailing newline)
+
+Blocks are separated by empty lines. Every line is stripped and whitespace-only lines are
+dropped, which gives the same blocks as splitting the whole document on "\n\n" and cleaning
+each piece. The block type is worked out as the lines are collected, using the same rules
+as identify_block_type, so no block is re-split to classify it.
+"""
+def iter_blocks(markdown):
+	if isinstance(markdown, str):
+		markdown = iter_lines(markdown)
+	lines = []
+	quote = unordered = True
+	for line in markdown:
+		if line.endswith("\n"):
+			line = line[:-1]
+		if line == "":
+			if lines:
+				yield "\n".join(lines), classify_block(lines, quote, unordered)
+				lines = []
+				quote = unordered = True
+			continue
+		line = line.strip()
+		if line == "":
+			continue
+		lines.append(line)
+		quote = quote and line.startswith(">")
+		unordered = unordered and line.startswith("- ")
+	if lines:
+		yield "\n".join(lines), classify_block(lines, quote, unordered)
+
+def classify_block(lines, quote, unordered):
+	first = lines[0]
+	if re.match(re_heading, first):
+		return BlockType.HEADING
+	elif first.startswith("```") and lines[-1].endswith("```"):
+		return BlockType.CODE
+	elif quote:
+		return BlockType.QUOTE
+	elif unordered:
+		return BlockType.UNORDERED_LIST
+	elif re.match(re_ordered, first):
+		# identify_block_type only checks the start of the block for ordered lists
+		return BlockType.ORDERED_LIST
+	else:
+		return BlockType.PARAGRAPH
+
 re_heading = r"#{1,6} .+"
 re_ordered = r"\d+\. "
 def identify_block_type(block):
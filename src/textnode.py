@@ -11,6 +11,9 @@ class TextType(Enum):
 	IMAGE = "image"
 
 class TextNode:
+	# text_type holds a reference to the shared TextType member, so slots are all a node needs
+	__slots__ = ("text", "text_type", "url")
+
 	def __init__(self, text, text_type, url=None):
 		self.text = text
 		self.text_type = text_type
@@ -46,53 +49,117 @@ def text_node_to_html_node(text_node):
 		case _:
 			raise Exception("Invalid TextNode type.")
 
+# Inline delimiters, from highest to lowest precedence. A delimiter is only
+# recognised in the plain text left between the spans of the ones before it.
+INLINE_DELIMITERS = (
+	("**", TextType.BOLD),
+	("_", TextType.ITALIC),
+	("`", TextType.CODE),
+)
+
+IMAGE_RE = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+LINK_RE = re.compile(r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+# An image is a link with a leading '!', so one pattern finds both in a single scan
+MEDIA_RE = re.compile(r"(!?)\[([^\[\]]*)\]\(([^\(\)]*)\)")
+
+"""
+Single left-to-right scanner that turns a line of markdown into TextNodes.
+
+At each position it looks at the next occurrence of every delimiter (each
+occurrence is searched for at most once, so the scan is linear) and opens a span
+at the nearest one. The span is closed by the next matching delimiter before the
+next opener of any higher-precedence delimiter; if there is none, the line is
+invalid. Plain text between spans is split into images and links as it is emitted.
+
+parameters:
+text: a line of markdown text
+delimiters: (delimiter, TextType) pairs, highest precedence first
+media: if True, split images and links out of the plain text and drop empty
+	plain nodes the way the original staged pipeline did. If False, plain text
+	is emitted as-is, including empty nodes.
+"""
+def tokenize_inline(text, delimiters=INLINE_DELIMITERS, media=True):
+	nodes = []
+	length = len(text)
+	next_open = [-1] * len(delimiters)
+	position = 0
+	while True:
+		# Refresh the next opener of any delimiter we have scanned past
+		opener = length
+		chosen = None
+		bound = length
+		for index, (delimiter, _) in enumerate(delimiters):
+			if next_open[index] < position:
+				found = text.find(delimiter, position)
+				next_open[index] = found if found != -1 else length
+			if next_open[index] < opener:
+				opener = next_open[index]
+				chosen = index
+				bound = min(next_open[:index], default=length)
+
+		if media:
+			split_media(text, position, opener, nodes)
+		else:
+			nodes.append(TextNode(text[position:opener], TextType.PLAIN))
+		if chosen is None:
+			return nodes
+
+		delimiter, text_type = delimiters[chosen]
+		content_start = opener + len(delimiter)
+		closer = text.find(delimiter, content_start, bound)
+		if closer == -1:
+			raise Exception(f"invalid syntax: {text_type} nodes require 2 '{delimiter}' delimiters")
+		# We will ignore nesting at this stage
+		nodes.append(TextNode(text[content_start:closer], text_type))
+		position = closer + len(delimiter)
+
+"""
+Appends the plain text of text[start:end] to nodes, with any images and links
+split out into their own nodes. Empty plain text is dropped, except directly
+before a link.
+"""
+def split_media(text, start, end, nodes):
+	position = start
+	for match in MEDIA_RE.finditer(text, start, end):
+		before = text[position:match.start()]
+		if match.group(1):
+			if before:
+				nodes.append(TextNode(before, TextType.PLAIN))
+			nodes.append(TextNode(match.group(2), TextType.IMAGE, match.group(3)))
+		else:
+			nodes.append(TextNode(before, TextType.PLAIN))
+			nodes.append(TextNode(match.group(2), TextType.LINK, match.group(3)))
+		position = match.end()
+	if position < end:
+		nodes.append(TextNode(text[position:end], TextType.PLAIN))
+
 """
 Accepts a list of premade TextNode objects, and breaks
-the 'plaintext' nodes into subnodes, based on the first
-appearance of the delimiter
+the 'plaintext' nodes into subnodes, based on the
+appearances of the delimiter.
 
-This is a recursive function. Each apparent PLAIN node will
-be assessed based on the same delimiter, until no further
-sections can be broken out. A calling function will be responsible
-for re-executing this function for each type of delimiter
+Kept for compatibility; convert_line_to_textnodes handles every
+delimiter in one pass with tokenize_inline.
 """
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
 	new_nodes = []
 	for node in old_nodes:
 		if node.text_type == TextType.PLAIN:
-			substrings = node.text.split(delimiter, maxsplit=2)
-			if len(substrings) == 1: # No delimiters, no splits
-				new_nodes.append(TextNode(node.text, TextType.PLAIN))
-			elif len(substrings) == 2:
-				raise Exception(f"invalid syntax: {text_type} nodes require 2 '{delimiter}' delimiters")
-			else: # Found two matching delimeters
-				first_node = TextNode(substrings[0], TextType.PLAIN)
-				new_nodes.extend(split_nodes_delimiter([first_node], delimiter, text_type))
-
-				# We will ignore nesting at this stage
-				new_nodes.append(TextNode(substrings[1], text_type))
-
-				third_node = TextNode(substrings[2], TextType.PLAIN)
-				new_nodes.extend(split_nodes_delimiter([third_node], delimiter, text_type))
+			new_nodes.extend(tokenize_inline(node.text, ((delimiter, text_type),), media=False))
 		else: # ignore nesting
 			new_nodes.append(node)
 	return new_nodes
 
 """
 function for converting a line of markdown text to a list of type-specific TextNodes.
-Currently, the sequence is:
+Delimiters are recognised in this order of precedence:
 1. Bold: '**'
 2. Italic: '_'
 3. Code: '`'
+followed by images and links in the remaining plain text.
 """
 def convert_line_to_textnodes(text):
-	starting_point = [TextNode(text, TextType.PLAIN)]
-	bold_stage = split_nodes_delimiter(starting_point, "**", TextType.BOLD)
-	italic_stage = split_nodes_delimiter(bold_stage, "_", TextType.ITALIC)
-	code_stage = split_nodes_delimiter(italic_stage, "`", TextType.CODE)
-	image_stage = split_nodes_image(code_stage)
-	link_stage = split_nodes_link(image_stage)
-	return link_stage
+	return tokenize_inline(text)
 
 """
 function for identifying images in markdown.
@@ -101,8 +168,7 @@ parameter:
 text: a line of markdown text
 """
 def extract_markdown_images(text):
-	image_expr = r"!\[([^\[\]]*)\]\(([^\(\)]*)\)"
-	return re.findall(image_expr, text)
+	return IMAGE_RE.findall(text)
 	
 """
 function for identifying images in markdown.
@@ -111,46 +177,31 @@ parameter:
 text: a line of markdown text
 """
 def extract_markdown_links(text):
-	link_expr = r"(?<!!)\[([^\[\]]*)\]\(([^\(\)]*)\)"
-	return re.findall(link_expr, text)
+	return LINK_RE.findall(text)
 
 """
 function to (possibly) split a plaintext node into a list of
 plaintext nodes and image nodes.
 """
 def split_nodes_image(old_nodes):
-	new_nodes = []
-	for node in old_nodes:
-		if node.text_type != TextType.PLAIN:
-			new_nodes.append(node)
-			continue
-		images = extract_markdown_images(node.text)
-		remainder = node.text
-		for image in images:
-			delim = f"![{image[0]}]({image[1]})"
-			substrings = remainder.split(delim, maxsplit=1)
-			new_nodes.append(TextNode(substrings[0], TextType.PLAIN))
-			new_nodes.append(TextNode(image[0], TextType.IMAGE, image[1]))
-			remainder = substrings[1]
-		if remainder:
-			new_nodes.append(TextNode(remainder, TextType.PLAIN))
-	return new_nodes
+	return split_nodes_pattern(old_nodes, IMAGE_RE, TextType.IMAGE)
 
 
 def split_nodes_link(old_nodes):
+	return split_nodes_pattern(old_nodes, LINK_RE, TextType.LINK)
+
+
+def split_nodes_pattern(old_nodes, expr, text_type):
 	new_nodes = []
 	for node in old_nodes:
 		if node.text_type != TextType.PLAIN:
 			new_nodes.append(node)
 			continue
-		links = extract_markdown_links(node.text)
-		remainder = node.text
-		for link in links:
-			delim = f"[{link[0]}]({link[1]})"
-			substrings = remainder.split(delim, maxsplit=1)
-			new_nodes.append(TextNode(substrings[0], TextType.PLAIN))
-			new_nodes.append(TextNode(link[0], TextType.LINK, link[1]))
-			remainder = substrings[1]
-		if remainder:
-			new_nodes.append(TextNode(remainder, TextType.PLAIN))
+		position = 0
+		for match in expr.finditer(node.text):
+			new_nodes.append(TextNode(node.text[position:match.start()], TextType.PLAIN))
+			new_nodes.append(TextNode(match.group(1), text_type, match.group(2)))
+			position = match.end()
+		if position < len(node.text):
+			new_nodes.append(TextNode(node.text[position:], TextType.PLAIN))
 	return new_nodes
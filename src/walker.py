@@ -0,0 +1,109 @@
+import json
+import os
+import time
+
+from manifest import temp_path_for
+
+SNAPSHOT_PATH = "./.cache/directories.json"
+# A directory modified this recently might change again within the same mtime tick,
+# so its listing isn't remembered (the same "racy" rule git uses for its index)
+RACY_SECONDS = 2
+
+
+class DirectorySnapshot:
+	"""
+	Docstring for DirectorySnapshot constructor
+	parameters:
+	path: the json file used to persist the snapshot between builds
+	force: if True, the previous snapshot is ignored and every directory is listed again
+
+	Remembers the listing (subdirectory and file names) of every directory walked, along with
+	the directory's modification time. Adding, removing or renaming an entry changes a
+	directory's mtime, so while the mtime is the same the remembered listing can be used
+	instead of reading the directory. Editing a file in place doesn't change its directory,
+	so this only saves finding the files, never checking whether their contents changed.
+	"""
+	def __init__(self, path=SNAPSHOT_PATH, force=False):
+		self.path = path
+		self.previous = {}
+		# Only directories walked by this build are saved, so deleted ones drop out
+		self.directories = {}
+		if not force:
+			self.load()
+
+	def load(self):
+		try:
+			with open(self.path, "r") as file:
+				self.previous = json.load(file)
+		except (FileNotFoundError, json.JSONDecodeError):
+			self.previous = {}
+
+	def save(self):
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		tmp_path = temp_path_for(self.path)
+		with open(tmp_path, "w") as file:
+			json.dump(self.directories, file, sort_keys=True)
+		os.replace(tmp_path, self.path)
+
+	def listing(self, path, mtime_ns):
+		"""Returns the remembered (dirs, files) for path if its mtime is unchanged, otherwise None"""
+		entry = self.directories.get(path) or self.previous.get(path)
+		if entry is None or entry["mtime_ns"] != mtime_ns:
+			return None
+		self.directories[path] = entry
+		return entry["dirs"], entry["files"]
+
+	def remember(self, path, mtime_ns, dirs, files):
+		if time.time_ns() - mtime_ns < RACY_SECONDS * 1_000_000_000:
+			self.directories.pop(path, None)
+			return
+		self.directories[path] = {"mtime_ns": mtime_ns, "dirs": dirs, "files": files}
+
+"""
+Returns (dirs, files): the sorted names of the subdirectories and of everything else in path.
+os.scandir reports whether each entry is a directory from the directory listing itself, so
+no entry has to be stat-ed. With a snapshot, a directory whose mtime hasn't changed isn't
+read at all.
+"""
+def scan_dir(path, snapshot=None):
+	if snapshot is not None:
+		mtime_ns = os.stat(path).st_mtime_ns
+		cached = snapshot.listing(path, mtime_ns)
+		if cached is not None:
+			return cached
+	dirs = []
+	files = []
+	with os.scandir(path) as entries:
+		for entry in entries:
+			if entry.is_dir():
+				dirs.append(entry.name)
+			else:
+				files.append(entry.name)
+	dirs.sort()
+	files.sort()
+	if snapshot is not None:
+		snapshot.remember(path, mtime_ns, dirs, files)
+	return dirs, files
+
+"""
+walk_files()
+inputs
+	root: the directory to walk
+	snapshot: an optional DirectorySnapshot (see scan_dir)
+	dirpath: the directory under root to start from, used when recursing
+outputs
+	yields the path, relative to root, of every file under root, one at a time.
+	Entries are visited in sorted order, with each directory's files yielded where the
+	directory's name sorts, so every walk of the same tree yields the same sequence.
+"""
+def walk_files(root, snapshot=None, dirpath=""):
+	dirs, files = scan_dir(os.path.join(root, dirpath) if dirpath else root, snapshot)
+	subdirs = set(dirs)
+	for name in sorted(dirs + files):
+		rel_path = os.path.join(dirpath, name)
+		if name in subdirs:
+			yield from walk_files(root, snapshot, rel_path)
+		else:
+			yield rel_path
@@ -0,0 +1,67 @@
+import os
+import time
+
+
+class Watcher:
+	"""
+	Docstring for Watcher constructor
+	parameters:
+	paths: the files and directories to watch. Directories are watched recursively.
+
+	Changes are found by polling: every poll stats the watched files and compares their
+	modification time and size with the previous poll. This needs no extra dependencies.
+	"""
+	def __init__(self, paths):
+		self.paths = paths
+		self.state = self.snapshot()
+
+	def snapshot(self):
+		state = {}
+		for path in self.paths:
+			if os.path.isdir(path):
+				for dirpath, _, filenames in os.walk(path):
+					for filename in filenames:
+						self.stat_into(state, os.path.join(dirpath, filename))
+			else:
+				self.stat_into(state, path)
+		return state
+
+	def stat_into(self, state, path):
+		try:
+			stat = os.stat(path)
+		except FileNotFoundError:
+			# Deleted between listing and stat; the next poll reports it as removed
+			return
+		state[path] = (stat.st_mtime_ns, stat.st_size)
+
+	def poll(self):
+		"""
+		Returns (changed, removed): the sets of paths that were added or modified,
+		and the paths that disappeared, since the last poll.
+		"""
+		new_state = self.snapshot()
+		changed = {path for path, signature in new_state.items() if self.state.get(path) != signature}
+		removed = set(self.state) - set(new_state)
+		self.state = new_state
+		return changed, removed
+
+	def changes(self, interval=0.1, debounce=0.1):
+		"""
+		Yields (changed, removed) sorted lists forever. Once a change is seen, polling
+		continues until nothing has changed for `debounce` seconds, so a burst of saves
+		is reported as a single batch.
+		"""
+		while True:
+			changed, removed = self.poll()
+			if not changed and not removed:
+				time.sleep(interval)
+				continue
+			quiet_since = time.monotonic()
+			while time.monotonic() - quiet_since < debounce:
+				time.sleep(interval)
+				more_changed, more_removed = self.poll()
+				if more_changed or more_removed:
+					changed = (changed - more_removed) | more_changed
+					removed = (removed - more_changed) | more_removed
+					quiet_since = time.monotonic()
+			yield sorted(changed), sorted(removed)